@@ -0,0 +1,79 @@
+"""Benchmark the ABACUS CSR -> atomic block decomposition against the dense per-site-pair loop.
+
+Usage:
+    python benchmark/bench_abacus_csr_blocks.py --natoms 8 32 128 512 --nR 4
+"""
+import argparse
+import time
+
+import numpy as np
+from scipy.sparse import random as sparse_random
+
+from dftio.io.abacus.abacus_parser import AbacusParser
+from dftio.io.csr_blocks import CSRBlockExtractor
+from dftio.constants import ABACUS2DFTIO
+
+
+def dense_loop(mat, site_norbits, orbital_types_dict, element):
+    site_norbits_cumsum = np.cumsum(site_norbits)
+    mat = mat.toarray()
+    out = {}
+    for i in range(len(site_norbits)):
+        for j in range(len(site_norbits)):
+            block = mat[site_norbits_cumsum[i] - site_norbits[i]:site_norbits_cumsum[i],
+                        site_norbits_cumsum[j] - site_norbits[j]:site_norbits_cumsum[j]]
+            if abs(block).max() < 1e-10:
+                continue
+            out[f"{i}_{j}_0_0_0"] = AbacusParser.transform(None, block, orbital_types_dict[element[i]],
+                                                           orbital_types_dict[element[j]])
+    return out
+
+
+def make_matrix(natoms, norb, neighbours=16, seed=0):
+    """Random matrix with the sparsity of a supercell: each atom couples to ~neighbours atoms."""
+    rng = np.random.default_rng(seed)
+    rows, cols = [], []
+    for i in range(natoms):
+        for j in rng.choice(natoms, size=min(neighbours, natoms), replace=False):
+            r, c = np.meshgrid(np.arange(norb) + i * norb, np.arange(norb) + j * norb, indexing="ij")
+            rows.append(r.ravel())
+            cols.append(c.ravel())
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    mat = sparse_random(1, len(rows), density=1.0, random_state=seed, dtype=np.float32).toarray().ravel()
+    from scipy.sparse import csr_matrix
+    return csr_matrix((mat, (rows, cols)), shape=(natoms * norb, natoms * norb), dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--natoms", type=int, nargs="+", default=[8, 32, 128, 512])
+    parser.add_argument("--nR", type=int, default=4, help="number of R vectors per structure")
+    parser.add_argument("--skip-dense-above", type=int, default=512, help="skip the dense loop above this atom count")
+    args = parser.parse_args()
+
+    orbital_types_dict = {14: [0, 0, 1, 1, 2]}  # Si 2s2p1d
+    norb = 13
+    print(f"{'natoms':>8} {'dense loop (s)':>16} {'extractor (s)':>15} {'speedup':>9}")
+    for natoms in args.natoms:
+        element = np.full(natoms, 14)
+        site_norbits = np.full(natoms, norb)
+        mats = [make_matrix(natoms, norb, seed=s) for s in range(args.nR)]
+
+        t0 = time.perf_counter()
+        extractor = CSRBlockExtractor(site_norbits, element, orbital_types_dict, ABACUS2DFTIO)
+        for mat in mats:
+            extractor.extract(mat.data, mat.indices, mat.indptr, R=[0, 0, 0])
+        t_new = time.perf_counter() - t0
+
+        if natoms <= args.skip_dense_above:
+            t0 = time.perf_counter()
+            for mat in mats:
+                dense_loop(mat, site_norbits, orbital_types_dict, element)
+            t_old = time.perf_counter() - t0
+            print(f"{natoms:>8} {t_old:>16.3f} {t_new:>15.3f} {t_old / t_new:>8.1f}x")
+        else:
+            print(f"{natoms:>8} {'-':>16} {t_new:>15.3f} {'-':>9}")
+
+
+if __name__ == "__main__":
+    main()
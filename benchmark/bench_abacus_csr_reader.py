@@ -0,0 +1,100 @@
+"""Benchmark decoding of multi-step ABACUS CSR files: line-by-line text parsing vs CSRFileReader.
+
+Usage:
+    python benchmark/bench_abacus_csr_reader.py --nsteps 20 --norbits 1300 --nR 27
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from scipy.sparse import random as sparse_random
+
+from dftio.io.abacus.abacus_csr import CSRFileReader
+
+
+def legacy_read_step(matrix_path, step, spinful=False):
+    """The text parsing previously done in AbacusParser.parse_matrix."""
+    out = []
+    with open(matrix_path, 'r') as f:
+        line = f.readline()
+        if not "Matrix Dimension of" in line:
+            step_found = False
+            while line and not step_found:
+                if "STEP" in line:
+                    stp = int(line.split()[-1])
+                    if stp != step:
+                        line = f.readline()
+                    else:
+                        step_found = True
+                else:
+                    line = f.readline()
+            line = f.readline()
+        f.readline()
+        for line in f:
+            line1 = line.split()
+            if len(line1) == 0 or len(line1) == 2:
+                break
+            if int(line1[3]) != 0:
+                line2 = f.readline().split()
+                line3 = f.readline().split()
+                line4 = f.readline().split()
+                if not spinful:
+                    data = np.array(line2).astype(np.float32)
+                else:
+                    line2 = np.char.replace(line2, '(', '')
+                    line2 = np.char.replace(line2, ')', 'j')
+                    line2 = np.char.replace(line2, ',', '+')
+                    line2 = np.char.replace(line2, '+-', '-')
+                    data = np.array(line2).astype(np.complex64)
+                out.append((data, np.array(line3).astype(int), np.array(line4).astype(np.int32)))
+    return out
+
+
+def write_file(path, nsteps, norbits, nR, density, spinful):
+    with open(path, "w") as f:
+        for step in range(nsteps):
+            f.write(f"STEP: {step}\nMatrix Dimension of H(R): {norbits}\nMatrix number of H(R): {nR}\n")
+            for r in range(nR):
+                mat = sparse_random(norbits, norbits, density=density, format="csr", random_state=step * nR + r)
+                f.write(f"{r} 0 0 {mat.nnz}\n")
+                if spinful:
+                    f.write(" " + " ".join(f"({v:.8e},{-v:.8e})" for v in mat.data) + "\n")
+                else:
+                    f.write(" " + " ".join(f"{v:.8e}" for v in mat.data) + "\n")
+                f.write(" " + " ".join(map(str, mat.indices)) + "\n")
+                f.write(" " + " ".join(map(str, mat.indptr)) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nsteps", type=int, default=10)
+    parser.add_argument("--norbits", type=int, default=1000)
+    parser.add_argument("--nR", type=int, default=9)
+    parser.add_argument("--density", type=float, default=0.02)
+    parser.add_argument("--spinful", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data-HR-sparse_SPIN0.csr")
+        write_file(path, args.nsteps, args.norbits, args.nR, args.density, args.spinful)
+        print(f"file size: {os.path.getsize(path) / 2**20:.1f} MiB, {args.nsteps} steps")
+
+        t0 = time.perf_counter()
+        for step in range(args.nsteps):
+            legacy_read_step(path, step, spinful=args.spinful)
+        t_old = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for step in range(args.nsteps):
+            with CSRFileReader(path, spinful=args.spinful) as reader:
+                reader.read_step(step)
+        t_new = time.perf_counter() - t0
+
+    print(f"line-by-line (all steps): {t_old:.3f} s")
+    print(f"CSRFileReader (all steps): {t_new:.3f} s ({t_old / t_new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Benchmark the discovery of the calculation folders of a large root directory.
+
+Compares the glob previously used by Parser.__init__, the sorted os.scandir search of
+discover_inputs, and the reuse of the index written by a first run. Only a fraction of the
+entries of the root match the prefix, as in a root shared with other outputs.
+
+Usage:
+    python benchmark/bench_discovery.py --nentries 10000 100000 --match 0.5
+"""
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+from dftio.io.discovery import discover_inputs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nentries", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--match", type=float, default=0.5, help="fraction of the entries matching the prefix")
+    args = parser.parse_args()
+
+    print(f"{'nentries':>10s}{'matches':>10s}{'glob (s)':>10s}{'scandir (s)':>13s}{'index (s)':>11s}")
+    for nentries in args.nentries:
+        root = tempfile.mkdtemp()
+        try:
+            nmatch = int(nentries * args.match)
+            for i in range(nentries):
+                open(os.path.join(root, f"frame_{i}" if i < nmatch else f"log_{i}"), "w").close()
+            index_path = os.path.join(tempfile.gettempdir(), f"bench_discovery_{os.getpid()}.txt")
+
+            start = time.perf_counter()
+            globbed = glob.glob(os.path.join(root, "*frame*"))
+            glob_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            scanned = discover_inputs(root, "frame", index_path=index_path)
+            scan_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            indexed = discover_inputs(root, "frame", index_path=index_path)
+            index_time = time.perf_counter() - start
+            os.remove(index_path)
+
+            assert sorted(os.path.abspath(p) for p in globbed) == scanned == indexed
+            print(f"{nentries:>10d}{len(scanned):>10d}{glob_time:>10.3f}{scan_time:>13.3f}{index_time:>11.3f}")
+        finally:
+            shutil.rmtree(root)
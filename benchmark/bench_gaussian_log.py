@@ -0,0 +1,98 @@
+"""Benchmark reading the Fock, overlap and density matrices of a large Gaussian log.
+
+The legacy readers rescan the log from the top for every matrix (twice for the Fock matrix) and
+convert the elements one by one, the indexed readers locate every section in one read of the file
+and decode the 5-column lower-triangular blocks with numpy.
+
+Usage:
+    python benchmark/bench_gaussian_log.py --log test/data/gaussian/example_folder/id_1/gau.log --repeat_log 50
+"""
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from dftio.io.gaussian.gaussian_tools import (
+    get_basic_info, index_gau_log, read_density_from_gau_log, read_fock_from_gau_log, read_int1e_from_gau_log)
+
+
+def legacy_read_lower_triangular(f, nbf):
+    mat = np.zeros((nbf, nbf))
+    n = (nbf + 4) // 5
+    for i in range(n):
+        next(f)
+        k = 5 * i
+        for j in range(k, nbf):
+            line = next(f).split()
+            m = min(5, nbf - k)
+            actual_line_len = len(line[1:m + 1])
+            mat[k:k + actual_line_len, j] = [float(x.replace('D', 'E')) for x in line[1:m + 1]]
+    return mat + mat.T - np.diag(mat.diagonal())
+
+
+def legacy_read(logname, pattern, nbf, last=False):
+    """The readers previously in gaussian_tools: scan from the top, count first to find the last match."""
+    target_pattern = re.compile(pattern)
+    pattern_counts = 1
+    if last:
+        with open(logname, 'r') as f:
+            pattern_counts = sum(1 for line in f if target_pattern.search(line))
+    current_counts = 0
+    with open(logname, 'r') as f:
+        for line in f:
+            if target_pattern.search(line):
+                current_counts += 1
+            if current_counts == pattern_counts:
+                break
+        return legacy_read_lower_triangular(f, nbf)
+
+
+def make_log(src, repeat, path):
+    """Repeat the SCF part of a log so that the matrices of interest are at its end."""
+    with open(src, 'rb') as f:
+        content = f.read()
+    with open(path, 'wb') as f:
+        for _ in range(repeat):
+            f.write(content)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", type=str, default="test/data/gaussian/example_folder/id_1/gau.log")
+    parser.add_argument("--repeat_log", type=int, default=50)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        log = os.path.join(tmpdir, "gau.log")
+        make_log(args.log, args.repeat_log, log)
+        print(f"log size: {os.path.getsize(log) / 2 ** 20:.1f} MB")
+        nbf, _ = get_basic_info(args.log)
+
+        start = time.perf_counter()
+        legacy = [
+            legacy_read(log, r" Fock matrix", nbf, last=True),
+            legacy_read(log, r"\*+\s*Overlap\s*\*+", nbf),
+            legacy_read(log, r" Total density matrix:", nbf),
+        ]
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = index_gau_log(log)
+        index_time = time.perf_counter() - start
+        indexed = [
+            read_fock_from_gau_log(log, nbf, index=index),
+            read_int1e_from_gau_log(log, 0, nbf, index=index),
+            read_density_from_gau_log(log, nbf, index=index),
+        ]
+        indexed_time = time.perf_counter() - start
+
+        assert all(np.array_equal(a, b) for a, b in zip(legacy, indexed))
+        print(f"legacy readers : {legacy_time:.3f} s")
+        print(f"indexed readers: {indexed_time:.3f} s ({index_time:.3f} s to index)")
+    finally:
+        shutil.rmtree(tmpdir)
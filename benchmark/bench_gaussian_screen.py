@@ -0,0 +1,73 @@
+"""Benchmark the validity pre-screen of Gaussian logs.
+
+Compares the previous serial line-by-line regex screen with chk_valid_gau_logs, which stops at
+the first missing section, checks the tail of the log for the termination first, uses a process
+pool and caches the results. Half of the generated logs are truncated before the termination.
+
+Usage:
+    python benchmark/bench_gaussian_screen.py --log test/data/gaussian/example_folder/id_1/gau.log --nlogs 200 --num_workers 4
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from dftio.io.gaussian.gaussian_tools import chk_valid_gau_logs
+
+
+def legacy_chk_valid_gau_log_unit(file_path):
+    """The screen previously in gaussian_tools, with hamiltonian, overlap and density matrix required."""
+    required_patterns = [r"Standard orientation:", r"NBasis=", r'Normal termination of Gaussian', r" Fock matrix",
+                         r"\*+\s*Overlap\s*\*+", r" Total density matrix:", r"Standard basis:",
+                         r"\s*Gross orbital populations:"]
+    patterns = [re.compile(pattern) for pattern in required_patterns]
+    found_patterns = [False] * len(patterns)
+    with open(file_path, 'r') as file:
+        for line in file:
+            for i, pattern in enumerate(patterns):
+                if not found_patterns[i] and pattern.search(line):
+                    found_patterns[i] = True
+    return all(found_patterns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", type=str, default="test/data/gaussian/example_folder/id_1/gau.log")
+    parser.add_argument("--nlogs", type=int, default=200)
+    parser.add_argument("--num_workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with open(args.log, 'rb') as f:
+        content = f.read()
+    truncated = content[:content.index(b"Normal termination")]
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for i in range(args.nlogs):
+            with open(os.path.join(tmpdir, f"mol_{i}.log"), 'wb') as f:
+                f.write(content if i % 2 == 0 else truncated)
+        valid_path, invalid_path = os.path.join(tmpdir, "valid.txt"), os.path.join(tmpdir, "invalid.txt")
+
+        start = time.perf_counter()
+        legacy = sum(legacy_chk_valid_gau_log_unit(p) for p in glob.glob(os.path.join(tmpdir, "*mol*")))
+        print(f"legacy serial screen: {time.perf_counter() - start:.3f} s, {legacy} valid")
+
+        for label, num_workers in [("serial", 1), (f"{args.num_workers} workers", args.num_workers),
+                                   ("cached rerun", args.num_workers)]:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                chk_valid_gau_logs(tmpdir, "mol", hamiltonian=True, overlap=True, density_matrix=True,
+                                   valid_gau_info_path=valid_path, invalid_gau_info_path=invalid_path,
+                                   num_workers=num_workers, cache_path=False if label == "serial" else None)
+            elapsed = time.perf_counter() - start
+            with open(valid_path) as f:
+                nvalid = len(f.read().split())
+            os.remove(valid_path)
+            os.remove(invalid_path)
+            print(f"screen, {label}: {elapsed:.3f} s, {nvalid} valid")
+    finally:
+        shutil.rmtree(tmpdir)
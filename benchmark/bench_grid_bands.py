@@ -0,0 +1,53 @@
+"""Benchmark the scaling with the number of bands of the grid integration used by LDOS.
+
+The legacy path integrates the bands one by one with SingleGridIntegrator.integrate, evaluating the
+basis functions again for every band; integrate_batch tabulates the basis functions once per tile of
+grid points and contracts all the bands with one sparse matrix product.
+
+Usage:
+    python benchmark/bench_grid_bands.py --orb example/data/Si_gga_6au_100Ry_1s1p.orb --grid 40 --nbands 1 8 64 256
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from dftio.datastruct import AtomicBasis
+from dftio.op.grid_int import SingleGridIntegrator
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orb", type=str, default="example/data/Si_gga_6au_100Ry_1s1p.orb")
+    parser.add_argument("--a", type=float, default=5.43, help="lattice constant of the cubic cell in angstrom")
+    parser.add_argument("--grid", type=int, default=40, help="grid points along each axis")
+    parser.add_argument("--nbands", type=int, nargs="+", default=[1, 8, 64, 256])
+    parser.add_argument("--legacy_max_bands", type=int, default=64, help="skip the band by band loop above this count")
+    args = parser.parse_args()
+
+    basis = AtomicBasis.from_orbfile(args.orb)
+    cell = np.eye(3) * args.a
+    frac = np.array([[0, 0, 0], [0, .5, .5], [.5, 0, .5], [.5, .5, 0]])
+    coordinates = np.concatenate([frac, frac + .25]) @ cell
+    axis = (np.arange(args.grid) + 0.5) / args.grid
+    grids = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1).reshape(-1, 3) @ cell
+    sgi = SingleGridIntegrator(atomic_numbers=[14] * 8, pbc=[True, True, True], cell=cell, coordinates=coordinates,
+                               grids=grids, atomic_basis={basis.element: basis}, dtype=torch.float64)
+
+    rng = np.random.default_rng(0)
+    print(f"{'nbands':>8s}{'band loop (s)':>16s}{'batch (s)':>12s}")
+    for nbands in args.nbands:
+        coefficients = torch.from_numpy(rng.normal(size=(nbands, sum(sgi.norbs)))
+                                        + 1j * rng.normal(size=(nbands, sum(sgi.norbs))))
+        start = time.perf_counter()
+        batch = sgi.integrate_batch(coefficients)
+        batch_time = time.perf_counter() - start
+
+        loop_time = float("nan")
+        if nbands <= args.legacy_max_bands:
+            start = time.perf_counter()
+            loop = torch.stack([sgi.integrate(weights=c) for c in coefficients])
+            loop_time = time.perf_counter() - start
+            assert torch.allclose(loop, batch)
+        print(f"{nbands:>8d}{loop_time:>16.3f}{batch_time:>12.3f}")
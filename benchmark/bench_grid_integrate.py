@@ -0,0 +1,62 @@
+"""Measure the time and peak memory of SingleGridIntegrator.integrate for several tile sizes.
+
+Each tile size runs in a fresh process, the peak resident memory is read before and after the
+integration, the difference being the memory taken by the evaluation of the basis functions.
+--chunk_size 0 integrates all the grid points at once, as the integrator did before the tiles.
+
+Usage:
+    python benchmark/bench_grid_integrate.py --orb example/data/Si_gga_6au_100Ry_1s1p.orb --grid 100 --chunk_size 0 4096 16384 65536
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+import numpy as np
+import torch
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(args, chunk_size, queue):
+    from dftio.datastruct import AtomicBasis
+    from dftio.op.grid_int import SingleGridIntegrator
+
+    basis = AtomicBasis.from_orbfile(args.orb)
+    cell = np.eye(3) * args.a
+    # the 8 atoms of the diamond structure
+    frac = np.array([[0, 0, 0], [0, .5, .5], [.5, 0, .5], [.5, .5, 0]])
+    coordinates = np.concatenate([frac, frac + .25]) @ cell
+    axis = (np.arange(args.grid) + 0.5) / args.grid
+    grids = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1).reshape(-1, 3) @ cell
+
+    sgi = SingleGridIntegrator(atomic_numbers=[14] * 8, pbc=[True, True, True], cell=cell, coordinates=coordinates,
+                               grids=grids, atomic_basis={basis.element: basis}, dtype=torch.float64,
+                               chunk_size=chunk_size or None)
+    weights = torch.from_numpy(np.random.default_rng(0).normal(size=sum(sgi.norbs)))
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    result = sgi.integrate(weights=weights)
+    elapsed = time.perf_counter() - start
+    queue.put((len(grids), sgi.index.shape[1], elapsed, before, peak_rss_mb(), float(result.sum())))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orb", type=str, default="example/data/Si_gga_6au_100Ry_1s1p.orb")
+    parser.add_argument("--a", type=float, default=5.43, help="lattice constant of the cubic cell in angstrom")
+    parser.add_argument("--grid", type=int, default=100, help="grid points along each axis")
+    parser.add_argument("--chunk_size", type=int, nargs="+", default=[0, 4096, 16384, 65536])
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'chunk_size':>12s}{'ngrids':>10s}{'pairs':>12s}{'time (s)':>10s}{'peak before (MB)':>18s}{'peak after (MB)':>17s}")
+    for chunk_size in args.chunk_size:
+        queue = ctx.Queue()
+        process = ctx.Process(target=run, args=(args, chunk_size, queue))
+        process.start()
+        ngrids, npairs, elapsed, before, after, checksum = queue.get()
+        process.join()
+        print(f"{chunk_size or 'all':>12}{ngrids:>10d}{npairs:>12d}{elapsed:>10.3f}{before:>18.0f}{after:>17.0f}    sum={checksum:.10g}")
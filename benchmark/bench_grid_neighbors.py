@@ -0,0 +1,80 @@
+"""Benchmark the grid-atom neighbor list of PrimitiveFieldsNeighborList.
+
+The legacy build queries the atom tree once per grid point and periodic image and grows a list of
+arrays per grid point; the current build searches all the grid points of an image with one
+sparse_distance_matrix call and stores the pairs as CSR arrays.
+
+Usage:
+    python benchmark/bench_grid_neighbors.py --natoms 8 --grid 10 20 40 100 --cutoff 4.0
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+from ase.cell import Cell
+from ase.geometry import minkowski_reduce, wrap_positions
+from scipy.spatial import cKDTree
+
+from dftio.datastruct.neighbourlist import PrimitiveFieldsNeighborList
+
+
+def legacy_build(cutoffs, pbc, cell, coordinates, grids):
+    """The per-grid-point loop previously in PrimitiveFieldsNeighborList.build."""
+    cell = Cell(cell)
+    rcmax = cutoffs.max()
+    rcell, op = minkowski_reduce(cell, pbc)
+    positions = wrap_positions(coordinates, rcell, pbc=pbc, eps=0)
+    grid_positions = wrap_positions(grids, rcell, pbc=pbc, eps=0)
+    neighbors = [np.empty(0, int) for _ in range(len(grids))]
+    displacements = [np.empty((0, 3), int) for _ in range(len(grids))]
+    ircell = np.linalg.pinv(rcell)
+    N = [int(2 * rcmax * np.linalg.norm(ircell[:, i])) + 1 if pbc[i] else 0 for i in range(3)]
+    tree = cKDTree(positions, copy_data=True)
+    offsets = cell.scaled_positions(positions - coordinates).round().astype(int)
+    grid_offsets = cell.scaled_positions(grid_positions - grids).round().astype(int)
+    for n1, n2, n3 in itertools.product(*[range(-n, n + 1) for n in N]):
+        displacement = (n1, n2, n3) @ rcell
+        for g in range(len(grids)):
+            indices = tree.query_ball_point(grid_positions[g] - displacement, r=rcmax)
+            if not len(indices):
+                continue
+            indices = np.array(indices)
+            delta = positions[indices] + displacement - grid_positions[g]
+            i = indices[np.linalg.norm(delta, axis=1) < cutoffs[indices]]
+            neighbors[g] = np.concatenate((neighbors[g], i))
+            displacements[g] = np.concatenate((displacements[g], (n1, n2, n3) @ op + offsets[i] - grid_offsets[g]))
+    return neighbors, displacements
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--natoms", type=int, default=8)
+    parser.add_argument("--grid", type=int, nargs="+", default=[10, 20, 40, 100], help="grid points along each axis")
+    parser.add_argument("--cutoff", type=float, default=4.0)
+    parser.add_argument("--legacy_max_grids", type=int, default=10000, help="skip the legacy build above this size")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    cell = np.diag([5.4, 5.4, 5.4])
+    coordinates = rng.random((args.natoms, 3)) @ cell
+    cutoffs = np.full(args.natoms, args.cutoff)
+    pbc = np.array([True, True, True])
+    print(f"{'ngrids':>10s}{'pairs':>12s}{'legacy (s)':>12s}{'csr (s)':>10s}")
+    for n in args.grid:
+        axis = (np.arange(n) + 0.5) / n
+        grids = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1).reshape(-1, 3) @ cell
+
+        start = time.perf_counter()
+        nl = PrimitiveFieldsNeighborList(cutoffs=cutoffs)
+        nl.build(pbc, cell, coordinates, grids)
+        csr_time = time.perf_counter() - start
+
+        legacy_time = float("nan")
+        if len(grids) <= args.legacy_max_grids:
+            start = time.perf_counter()
+            neighbors, displacements = legacy_build(cutoffs, pbc, cell, coordinates, grids)
+            legacy_time = time.perf_counter() - start
+            assert all(np.array_equal(a, b) for a, b in zip(neighbors, nl.neighbors))
+            assert all(np.array_equal(a, b) for a, b in zip(displacements, nl.displacements))
+        print(f"{len(grids):>10d}{nl.nneighbors:>12d}{legacy_time:>12.3f}{csr_time:>10.3f}")
@@ -0,0 +1,60 @@
+"""Benchmark repeated grid integrations with the tabulated basis operator, as in an STM scan over biases.
+
+Without precompute every integration evaluates the basis functions on the grid again; with precompute
+they are tabulated once into a sparse operator, and with a cache directory the operator of a second
+run is loaded from disk instead of being tabulated.
+
+Usage:
+    python benchmark/bench_grid_operator.py --orb example/data/Si_gga_6au_100Ry_1s1p.orb --grid 40 --nbias 20
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from dftio.datastruct import AtomicBasis
+from dftio.op.grid_int import SingleGridIntegrator
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orb", type=str, default="example/data/Si_gga_6au_100Ry_1s1p.orb")
+    parser.add_argument("--a", type=float, default=5.43, help="lattice constant of the cubic cell in angstrom")
+    parser.add_argument("--grid", type=int, default=40, help="grid points along each axis")
+    parser.add_argument("--nbias", type=int, default=20, help="number of integrations, one per bias")
+    parser.add_argument("--nbands", type=int, default=8, help="states integrated per bias")
+    args = parser.parse_args()
+
+    basis = AtomicBasis.from_orbfile(args.orb)
+    cell = np.eye(3) * args.a
+    frac = np.array([[0, 0, 0], [0, .5, .5], [.5, 0, .5], [.5, .5, 0]])
+    coordinates = np.concatenate([frac, frac + .25]) @ cell
+    axis = (np.arange(args.grid) + 0.5) / args.grid
+    grids = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1).reshape(-1, 3) @ cell
+    kwargs = dict(atomic_numbers=[14] * 8, pbc=[True, True, True], cell=cell, coordinates=coordinates,
+                  grids=grids, atomic_basis={basis.element: basis}, dtype=torch.float64)
+    norb = 8 * basis.irreps.dim
+    rng = np.random.default_rng(0)
+    coefficients = [torch.from_numpy(rng.normal(size=(args.nbands, norb))) for _ in range(args.nbias)]
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        reference = None
+        for label, options in [("no precompute", {}), ("precompute", {"precompute": True}),
+                               ("cache, first run", {"cache_dir": cache_dir}),
+                               ("cache, second run", {"cache_dir": cache_dir})]:
+            start = time.perf_counter()
+            sgi = SingleGridIntegrator(**kwargs, **options)
+            setup_time = time.perf_counter() - start
+            start = time.perf_counter()
+            results = [sgi.integrate_batch(c) for c in coefficients]
+            integrate_time = time.perf_counter() - start
+            if reference is None:
+                reference = results
+            assert all(torch.allclose(a, b) for a, b in zip(results, reference))
+            print(f"{label:<20s} setup {setup_time:7.3f} s, {args.nbias} integrations {integrate_time:7.3f} s")
+    finally:
+        shutil.rmtree(cache_dir)
@@ -0,0 +1,50 @@
+"""Benchmark the construction of a parser over many calculation folders, with eager and lazy structure loading.
+
+The legacy VASPParser read the POSCAR of every folder in its constructor, as AbacusParser and
+PyatbParser built every dpdata system; now the structures are read on first access and the last
+cache_size of them are kept, so the constructor only lists the folders.
+
+Usage:
+    python benchmark/bench_lazy_structures.py --poscar test/data/vasp_scf/POSCAR --nfolders 100 1000 5000
+"""
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from ase.io import read
+
+from dftio.io.vasp.vasp_parser import VASPParser
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--poscar", type=str, default="test/data/vasp_scf/POSCAR")
+    parser.add_argument("--nfolders", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--naccess", type=int, default=10, help="structures read after the construction")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    print(f"{'nfolders':>10s}{'eager init (s)':>16s}{'lazy init (s)':>15s}{'lazy init + access (s)':>24s}")
+    for nfolders in args.nfolders:
+        root = tempfile.mkdtemp()
+        try:
+            for i in range(nfolders):
+                os.makedirs(os.path.join(root, f"vasp_{i}"))
+                shutil.copy(args.poscar, os.path.join(root, f"vasp_{i}", "POSCAR"))
+
+            start = time.perf_counter()
+            lazy = VASPParser(root=root, prefix="vasp")
+            lazy_time = time.perf_counter() - start
+            for idx in range(min(args.naccess, nfolders)):
+                lazy.get_structure(idx)
+            access_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            eager = [read(path + "/POSCAR") for path in lazy.raw_datas]
+            eager_time = time.perf_counter() - start + lazy_time
+            print(f"{nfolders:>10d}{eager_time:>16.3f}{lazy_time:>15.4f}{access_time:>24.4f}")
+        finally:
+            shutil.rmtree(root)
@@ -0,0 +1,56 @@
+"""Benchmark the LDOS of an STM bias sweep: one LDOS.get_wbias per bias against one LDOS.bias_sweep.
+
+Every call to get_wbias integrates all the states between the fermi energy and its bias on the grid,
+bias_sweep integrates each state once in order of energy and records the running sum at each bias.
+
+Usage:
+    python benchmark/bench_ldos_bias_sweep.py --orb example/data/Si_gga_6au_100Ry_1s1p.orb --grid 30 --nbiases 40
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+import torch
+
+from dftio.calc.ldos import LDOS
+from dftio.datastruct import AtomicBasis
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orb", type=str, default="example/data/Si_gga_6au_100Ry_1s1p.orb")
+    parser.add_argument("--a", type=float, default=5.43, help="lattice constant of the cubic cell in angstrom")
+    parser.add_argument("--grid", type=int, default=30, help="grid points along each axis")
+    parser.add_argument("--nk", type=int, default=8)
+    parser.add_argument("--nbiases", type=int, default=40)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    basis = AtomicBasis.from_orbfile(args.orb)
+    cell = np.eye(3) * args.a
+    frac = np.array([[0, 0, 0], [0, .5, .5], [.5, 0, .5], [.5, .5, 0]])
+    coordinates = np.concatenate([frac, frac + .25]) @ cell
+    axis = (np.arange(args.grid) + 0.5) / args.grid
+    grids = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1).reshape(-1, 3) @ cell
+    ldos = LDOS(atomicbasis={basis.element: basis}, atomic_numbers=[14] * 8, pbc=[True, True, True], cell=cell,
+                coordinates=coordinates, grids=grids, dtype=torch.float64)
+
+    rng = np.random.default_rng(0)
+    norb = 8 * basis.irreps.dim
+    coefficients = torch.from_numpy(rng.normal(size=(args.nk, norb, norb)) + 1j * rng.normal(size=(args.nk, norb, norb)))
+    eigenvalues = torch.from_numpy(np.sort(rng.uniform(-5, 5, (args.nk, norb)), axis=1))
+    biases = np.linspace(-3, 3, args.nbiases)
+
+    start = time.perf_counter()
+    loop = torch.stack([ldos.get_wbias(coefficients, eigenvalues, bias=bias) for bias in biases])
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sweep = ldos.bias_sweep(coefficients, eigenvalues, biases)
+    sweep_time = time.perf_counter() - start
+
+    assert torch.allclose(loop, sweep, rtol=1e-4, atol=1e-5)
+    print(f"{len(grids)} grid points, {args.nk * norb} states, {args.nbiases} biases")
+    print(f"get_wbias per bias: {loop_time:.3f} s")
+    print(f"bias_sweep        : {sweep_time:.3f} s")
@@ -0,0 +1,58 @@
+"""Benchmark the LDOS at many energies: one LDOS.get per energy against one LDOS.get_many for all of them.
+
+Every call to get integrates the states in its own energy window on the grid again, get_many integrates
+each state in the union of the windows once and applies the gaussian weights of all the energies as
+one matrix.
+
+Usage:
+    python benchmark/bench_ldos_energies.py --orb example/data/Si_gga_6au_100Ry_1s1p.orb --grid 30 --nenergies 50
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+import torch
+
+from dftio.calc.ldos import LDOS
+from dftio.datastruct import AtomicBasis
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orb", type=str, default="example/data/Si_gga_6au_100Ry_1s1p.orb")
+    parser.add_argument("--a", type=float, default=5.43, help="lattice constant of the cubic cell in angstrom")
+    parser.add_argument("--grid", type=int, default=30, help="grid points along each axis")
+    parser.add_argument("--nk", type=int, default=8)
+    parser.add_argument("--nenergies", type=int, default=50)
+    parser.add_argument("--sigma", type=float, default=0.1)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    basis = AtomicBasis.from_orbfile(args.orb)
+    cell = np.eye(3) * args.a
+    frac = np.array([[0, 0, 0], [0, .5, .5], [.5, 0, .5], [.5, .5, 0]])
+    coordinates = np.concatenate([frac, frac + .25]) @ cell
+    axis = (np.arange(args.grid) + 0.5) / args.grid
+    grids = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1).reshape(-1, 3) @ cell
+    ldos = LDOS(atomicbasis={basis.element: basis}, atomic_numbers=[14] * 8, pbc=[True, True, True], cell=cell,
+                coordinates=coordinates, grids=grids, dtype=torch.float64)
+
+    rng = np.random.default_rng(0)
+    norb = 8 * basis.irreps.dim
+    coefficients = torch.from_numpy(rng.normal(size=(args.nk, norb, norb)) + 1j * rng.normal(size=(args.nk, norb, norb)))
+    eigenvalues = torch.from_numpy(np.sort(rng.uniform(-5, 5, (args.nk, norb)), axis=1))
+    energies = np.linspace(-2, 2, args.nenergies)
+
+    start = time.perf_counter()
+    loop = torch.stack([ldos.get(E, coefficients, eigenvalues, sigma=args.sigma) for E in energies])
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stack = ldos.get_many(energies, coefficients, eigenvalues, sigma=args.sigma)
+    many_time = time.perf_counter() - start
+
+    assert torch.allclose(loop, stack, rtol=1e-5, atol=1e-6)
+    print(f"{len(grids)} grid points, {args.nk * norb} states, {args.nenergies} energies")
+    print(f"get per energy: {loop_time:.3f} s")
+    print(f"get_many      : {many_time:.3f} s")
@@ -0,0 +1,92 @@
+"""Benchmark decoding LMDB frames: pickled dicts of blocks vs binary records.
+
+Usage:
+    python benchmark/bench_lmdb_record.py --nframes 200 --nblocks 5000 --norb 13
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+import lmdb
+import numpy as np
+
+from dftio.io.lmdb_writer import LMDBWriter, encode_key
+from dftio.io.lmdb_record import RecordReader, encode_record
+
+
+def make_frame(nblocks, norb, seed):
+    rng = np.random.default_rng(seed)
+    natom = max(int(np.sqrt(nblocks)), 1)
+    keys = {f"{k % natom}_{k // natom % natom}_{k // natom**2}_0_0" for k in range(nblocks)}
+    return {
+        "pos": rng.random((natom, 3), dtype=np.float32),
+        "hamiltonian": {key: rng.random((norb, norb), dtype=np.float32) for key in keys},
+        "overlap": {key: rng.random((norb, norb), dtype=np.float32) for key in keys},
+        "idx": seed,
+        "nf": 0,
+    }
+
+
+def write(path, frames, serialize):
+    with LMDBWriter(path) as writer:
+        for nf, frame in enumerate(frames):
+            writer.put(0, nf, serialize(frame))
+
+
+def read_pickle(path):
+    env = lmdb.open(path, readonly=True, lock=False)
+    with env.begin() as txn:
+        for k in range(env.stat()["entries"]):
+            frame = pickle.loads(txn.get(encode_key(k)))
+            frame["hamiltonian"]["0_0_0_0_0"].sum()
+    env.close()
+
+
+def read_record(path, by_key):
+    with RecordReader(path) as reader:
+        for frame in reader.iter_frames():
+            if by_key:
+                frame["hamiltonian"]["0_0_0_0_0"].sum()
+            else:
+                frame["hamiltonian"].data.sum()
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nframes", type=int, default=100)
+    parser.add_argument("--nblocks", type=int, default=2000)
+    parser.add_argument("--norb", type=int, default=13)
+    args = parser.parse_args()
+
+    distinct = [make_frame(args.nblocks, args.norb, seed) for seed in range(4)]
+    frames = [distinct[k % len(distinct)] for k in range(args.nframes)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path, record_path = os.path.join(tmp, "pickle.lmdb"), os.path.join(tmp, "record.lmdb")
+        write(pickle_path, frames, pickle.dumps)
+        write(record_path, frames, encode_record)
+        print(f"{args.nframes} frames, {len(pickle.dumps(frames[0])) / 2**20:.2f} MiB pickled, "
+              f"{len(encode_record(frames[0])) / 2**20:.2f} MiB as record")
+
+        # warm up the page cache
+        read_pickle(pickle_path)
+        read_record(record_path, False)
+        t_pickle = timed(read_pickle, pickle_path)
+        t_views = timed(read_record, record_path, False)
+        t_keys = timed(read_record, record_path, True)
+
+    print(f"pickle.loads: {args.nframes / t_pickle:.0f} frames/s")
+    print(f"record, payload views: {args.nframes / t_views:.0f} frames/s ({t_pickle / t_views:.1f}x)")
+    print(f"record, lookup by key: {args.nframes / t_keys:.0f} frames/s ({t_pickle / t_keys:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark LMDB write throughput: one transaction and stat() per frame vs batched LMDBWriter vs single writer process.
+
+Usage:
+    python benchmark/bench_lmdb_writer.py --nframes 2000 --nblocks 200 --batch_size 64 --num_workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import pickle
+import tempfile
+import time
+
+import lmdb
+import numpy as np
+
+from dftio.io.lmdb_writer import LMDBWriter, QueueWriter
+
+
+def make_frame(nblocks, norb, seed):
+    rng = np.random.default_rng(seed)
+    return {
+        "hamiltonian": {f"{k}_{k}_0_0_0": rng.random((norb, norb), dtype=np.float32) for k in range(nblocks)},
+        "pos": rng.random((nblocks, 3), dtype=np.float32),
+    }
+
+
+def legacy_write(path, frames):
+    """The write loop previously used by Parser.write_lmdb."""
+    lmdb_env = lmdb.open(path, map_size=1048576000000, lock=True)
+    for data_dict in frames:
+        data_dict = pickle.dumps(data_dict)
+        with lmdb_env.begin(write=True) as txn:
+            entries = lmdb_env.stat()["entries"]
+            txn.put(entries.to_bytes(length=4, byteorder='big'), data_dict)
+    lmdb_env.close()
+
+
+def batched_write(path, frames, batch_size):
+    with LMDBWriter(path, batch_size=batch_size) as writer:
+        for nf, data_dict in enumerate(frames):
+            writer.put(0, nf, pickle.dumps(data_dict))
+
+
+def _produce(queue, idx, frames):
+    writer = QueueWriter(queue)
+    for nf, data_dict in enumerate(frames):
+        writer.put(idx, nf, pickle.dumps(data_dict))
+
+
+def single_writer_write(path, frames, batch_size, num_workers):
+    queue = multiprocessing.Queue(maxsize=4 * num_workers)
+    server = multiprocessing.Process(target=LMDBWriter.serve, args=(queue, path, batch_size))
+    server.start()
+    chunks = np.array_split(np.arange(len(frames)), num_workers)
+    workers = [multiprocessing.Process(target=_produce, args=(queue, i, [frames[k] for k in chunk]))
+               for i, chunk in enumerate(chunks)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    queue.put(None)
+    server.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nframes", type=int, default=1000)
+    parser.add_argument("--nblocks", type=int, default=100)
+    parser.add_argument("--norb", type=int, default=13)
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--num_workers", type=int, default=4)
+    args = parser.parse_args()
+
+    # a handful of distinct frames is enough, pickling dominates over frame generation
+    distinct = [make_frame(args.nblocks, args.norb, seed) for seed in range(8)]
+    frames = [distinct[k % len(distinct)] for k in range(args.nframes)]
+    print(f"{args.nframes} frames of {len(pickle.dumps(distinct[0])) / 2**10:.1f} KiB")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        legacy_write(os.path.join(tmp, "legacy.lmdb"), frames)
+        t_old = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        batched_write(os.path.join(tmp, "batched.lmdb"), frames, args.batch_size)
+        t_batch = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        single_writer_write(os.path.join(tmp, "single.lmdb"), frames, args.batch_size, args.num_workers)
+        t_single = time.perf_counter() - t0
+
+    print(f"per-frame transaction: {args.nframes / t_old:.0f} frames/s")
+    print(f"LMDBWriter (batch {args.batch_size}): {args.nframes / t_batch:.0f} frames/s ({t_old / t_batch:.1f}x)")
+    print(f"single writer ({args.num_workers} producers): {args.nframes / t_single:.0f} frames/s ({t_old / t_single:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
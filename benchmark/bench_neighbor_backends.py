@@ -0,0 +1,53 @@
+"""Benchmark the neighbor search backends of neighbor_list_and_relative_vec.
+
+For every system size the bonds of a random triclinic periodic box of fixed density are searched with
+the ase backend, the vectorized cell list and the cKDTree over periodic images, and the bond sets of
+the native backends are checked against ase.
+
+Usage:
+    python benchmark/bench_neighbor_backends.py --sizes 100 1000 10000 100000 --r_max 6.0
+"""
+import argparse
+import time
+
+import numpy as np
+
+from dftio.data.neighbor_list import get_neighbor_backend, neighbor_backends
+
+
+def bond_keys(i, j, S, natoms):
+    """One integer per bond, to compare the bond sets of the backends."""
+    S = S - S.min() if len(S) else S
+    span = int(S.max()) + 1 if len(S) else 1
+    return np.sort(((i * natoms + j) * span + S[:, 0]) * span ** 2 + S[:, 1] * span + S[:, 2])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--r_max", type=float, default=6.0)
+    parser.add_argument("--density", type=float, default=0.05, help="atoms per cubic angstrom")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    backends = list(neighbor_backends.keys())
+    print(f"{'natoms':>8s}{'bonds':>12s}" + "".join(f"{name + ' (s)':>16s}" for name in backends))
+    for natoms in args.sizes:
+        side = (natoms / args.density) ** (1 / 3)
+        cell = np.array([[side, 0., 0.], [0.3 * side, side, 0.], [0.2 * side, 0.1 * side, side]])
+        pos = rng.random((natoms, 3)) @ cell
+        pbc = np.array([True, True, True])
+
+        times, keys = {}, {}
+        for name in backends:
+            search = get_neighbor_backend(name)
+            elapsed = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                i, j, S = search(pbc, cell, pos, args.r_max)
+                elapsed.append(time.perf_counter() - start)
+            times[name] = min(elapsed)
+            keys[name] = bond_keys(i, j, S, natoms)
+        assert all(np.array_equal(keys[name], keys["ase"]) for name in backends)
+        print(f"{natoms:>8d}{len(keys['ase']):>12d}" + "".join(f"{times[name]:>16.3f}" for name in backends))
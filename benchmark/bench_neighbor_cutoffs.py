@@ -0,0 +1,55 @@
+"""Benchmark AtomicData.from_points with r_max, er_max and oer_max all set.
+
+The graphs were built with one neighbor search per cutoff, they are now built with a single search
+at the largest cutoff whose bonds are selected by length for the smaller ones.
+
+Usage:
+    python benchmark/bench_neighbor_cutoffs.py --natoms 2000 --r_max 6.0 --er_max 7.0 --oer_max 4.0
+"""
+import argparse
+import time
+
+import numpy as np
+
+from dftio.data import AtomicData
+from dftio.data.AtomicData import neighbor_list_and_relative_vec
+
+
+def per_cutoff_search(pos, cell, numbers, cutoffs):
+    """The searches previously run by from_points, one for each cutoff."""
+    return [neighbor_list_and_relative_vec(pos=pos, r_max=r, cell=cell, reduce=False, atomic_numbers=numbers, pbc=True)
+            for r in cutoffs]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--natoms", type=int, default=2000)
+    parser.add_argument("--density", type=float, default=0.05, help="atoms per cubic angstrom")
+    parser.add_argument("--r_max", type=float, default=6.0)
+    parser.add_argument("--er_max", type=float, default=7.0)
+    parser.add_argument("--oer_max", type=float, default=4.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    cell = np.eye(3) * (args.natoms / args.density) ** (1 / 3)
+    pos = rng.random((args.natoms, 3)) @ cell
+    numbers = np.full(args.natoms, 14)
+    cutoffs = [args.r_max, args.er_max, args.oer_max]
+
+    legacy, shared = [], []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        lists = per_cutoff_search(pos, cell, numbers, cutoffs)
+        legacy.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        data = AtomicData.from_points(pos=pos, r_max=args.r_max, er_max=args.er_max, oer_max=args.oer_max,
+                                      cell=cell, pbc=True, atomic_numbers=numbers)
+        shared.append(time.perf_counter() - start)
+
+    for (edge_index, _, _), key in zip(lists, ["edge_index", "env_index", "onsitenv_index"]):
+        assert edge_index.shape == data[key].shape
+    print(f"{args.natoms} atoms, edges: {[lst[0].shape[1] for lst in lists]}")
+    print(f"one search per cutoff: {min(legacy):.3f} s")
+    print(f"from_points, shared search: {min(shared):.3f} s")
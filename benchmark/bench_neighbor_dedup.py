@@ -0,0 +1,71 @@
+"""Benchmark the removal of the duplicate i == j periodic-image bonds in neighbor_list_and_relative_vec.
+
+For every system size the bonds are searched once with ase, then deduplicated with the previous
+string-key dict loop and with the integer-key vectorized version now in AtomicData. The systems are
+random slabs of fixed density with a short period along z, so every atom bonds with its own images.
+
+Usage:
+    python benchmark/bench_neighbor_dedup.py --sizes 10 100 1000 10000 100000 --r_max 6.0 --period 2.5
+"""
+import argparse
+import time
+
+import ase.neighborlist
+import numpy as np
+
+from dftio.data.AtomicData import _periodic_self_edge_mask, neighbor_list_and_relative_vec
+
+
+def legacy_self_edge_mask(first_idex, second_idex, shifts):
+    """The dict loop previously used by neighbor_list_and_relative_vec, on the i <= j bonds."""
+    mask = np.ones((len(first_idex),), dtype=np.bool_)
+    mask[first_idex == second_idex] = False
+    o_first_idex = first_idex[~mask]
+    o_shift = shifts[~mask]
+    o_mask = mask[~mask]
+    rev_dict = {}
+    for i in range(len(o_first_idex)):
+        key = str(o_first_idex[i]) + str(o_shift[i])
+        key_rev = str(o_first_idex[i]) + str(-o_shift[i])
+        rev_dict[key] = True
+        if not (rev_dict.get(key_rev, False) and rev_dict.get(key, False)):
+            o_mask[i] = True
+    mask[~mask] = o_mask
+    return mask
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--r_max", type=float, default=6.0)
+    parser.add_argument("--period", type=float, default=2.5, help="cell length along z in angstrom")
+    parser.add_argument("--density", type=float, default=0.05, help="atoms per cubic angstrom")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'natoms':>8s}{'bonds':>12s}{'i==j':>10s}{'ase (s)':>10s}{'legacy (s)':>12s}{'vectorized (s)':>16s}")
+    for natoms in args.sizes:
+        side = (natoms / args.density / args.period) ** 0.5
+        cell = np.diag([side, side, args.period])
+        pos = rng.random((natoms, 3)) @ cell
+        numbers = np.full(natoms, 14)
+
+        start = time.perf_counter()
+        i, j, S = ase.neighborlist.primitive_neighbor_list("ijS", (True,) * 3, cell, pos, cutoff=args.r_max)
+        ase_time = time.perf_counter() - start
+        keep = i <= j
+        i, j, S = i[keep], j[keep], S[keep]
+
+        start = time.perf_counter()
+        legacy_mask = legacy_self_edge_mask(i, j, S)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        mask = _periodic_self_edge_mask(i, j, S)
+        vectorized_time = time.perf_counter() - start
+        assert np.array_equal(mask, legacy_mask)
+
+        edge_index, shifts, _ = neighbor_list_and_relative_vec(pos, args.r_max, atomic_numbers=numbers, cell=cell, pbc=True)
+        assert np.array_equal(edge_index, np.vstack((i[legacy_mask], j[legacy_mask])))
+        assert np.array_equal(shifts, S[legacy_mask])
+        print(f"{natoms:>8d}{edge_index.shape[1]:>12d}{int((i == j).sum()):>10d}{ase_time:>10.3f}{legacy_time:>12.3f}{vectorized_time:>16.4f}")
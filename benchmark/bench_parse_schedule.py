@@ -0,0 +1,54 @@
+"""Benchmark the scheduling of the parse worker pool on a synthetic workload.
+
+Every task sleeps for a time proportional to its cost, many small structures followed by a few
+large supercells at the end of the directory order. The legacy main submitted range(len(parser))
+to Pool.imap in directory order, now the tasks are grouped by cost_chunks, largest first, and
+dispatched with imap_unordered.
+
+Usage:
+    python benchmark/bench_parse_schedule.py --ntasks 400 --nlarge 4 --workers 4
+"""
+import argparse
+import time
+from multiprocessing.pool import Pool
+
+import numpy as np
+
+from dftio.io.schedule import cost_chunks
+
+
+def work(cost):
+    time.sleep(cost)
+    return cost
+
+
+def work_chunk(costs):
+    return [work(cost) for cost in costs]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ntasks", type=int, default=400)
+    parser.add_argument("--nlarge", type=int, default=4, help="large tasks at the end of the list")
+    parser.add_argument("--small", type=float, default=0.005, help="mean seconds of a small task")
+    parser.add_argument("--large", type=float, default=0.5, help="seconds of a large task")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    costs = list(rng.exponential(args.small, args.ntasks - args.nlarge)) + [args.large] * args.nlarge
+    ideal = max(sum(costs) / args.workers, args.large)
+
+    with Pool(args.workers) as p:
+        start = time.perf_counter()
+        list(p.imap(work, costs))
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        chunks = cost_chunks(costs, costs, args.workers)
+        list(p.imap_unordered(work_chunk, chunks))
+        scheduled_time = time.perf_counter() - start
+
+    print(f"{args.ntasks} tasks, {sum(costs):.2f} s of work on {args.workers} workers, ideal {ideal:.2f} s")
+    print(f"imap in directory order     : {legacy_time:.2f} s")
+    print(f"cost_chunks + imap_unordered: {scheduled_time:.2f} s ({len(chunks)} chunks)")
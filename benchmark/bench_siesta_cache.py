@@ -0,0 +1,79 @@
+"""Count the files opened and time the parsing of SIESTA calculations with and without the per-structure cache.
+
+With --cache_size 0 every getter re-reads the fdf files, the ORB_INDX and the sisl matrices it needs,
+as SiestaParser did before the cache; with the cache each file of a calculation is opened once.
+
+Usage:
+    python benchmark/bench_siesta_cache.py --root test/data/siesta --prefix siesta_out_withband --repeat 3
+"""
+import argparse
+import builtins
+import contextlib
+import io
+import os
+import time
+from collections import Counter
+from unittest import mock
+
+import sisl
+
+from dftio.io.siesta.siesta_parser import SiestaParser
+
+
+@contextlib.contextmanager
+def count_opens():
+    """Count the python open() calls and the sisl matrix reads, by file name."""
+    counts = Counter()
+    _open = builtins.open
+
+    def counting_open(file, *args, **kwargs):
+        counts[os.path.basename(str(file))] += 1
+        return _open(file, *args, **kwargs)
+
+    def counting_read(cls):
+        _read = cls.read
+
+        def read(sile, *args, **kwargs):
+            counts[os.path.basename(str(sile))] += 1
+            return _read(sile, *args, **kwargs)
+        return mock.patch.object(cls, "read", read)
+
+    with mock.patch.object(builtins, "open", counting_open), \
+            counting_read(sisl.Hamiltonian), counting_read(sisl.Overlap), counting_read(sisl.DensityMatrix):
+        yield counts
+
+
+def parse_all(parser, eigenvalue):
+    """The getters called by Parser.write for every structure."""
+    for idx in range(len(parser)):
+        parser.get_structure(idx)
+        parser.get_basis(idx)
+        if eigenvalue:
+            parser.get_eigenvalue(idx)
+        parser.get_blocks(idx, hamiltonian=True, overlap=True, density_matrix=True)
+
+
+def run(args, cache_size):
+    times = []
+    for _ in range(args.repeat):
+        parser = SiestaParser(root=args.root, prefix=args.prefix, cache_size=cache_size)
+        with count_opens() as counts, contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            parse_all(parser, args.eigenvalue)
+            times.append(time.perf_counter() - start)
+    print(f"cache_size={cache_size}: {min(times):.3f} s, {sum(counts.values())} file opens")
+    for name, n in sorted(counts.items()):
+        print(f"    {name:<24s}{n}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", type=str, default="test/data/siesta")
+    parser.add_argument("--prefix", type=str, default="siesta_out_withband")
+    parser.add_argument("--cache_size", type=int, default=8)
+    parser.add_argument("--no_eigenvalue", dest="eigenvalue", action="store_false")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    run(args, cache_size=0)
+    run(args, cache_size=args.cache_size)
@@ -1,13 +1,26 @@
+import os
+import time
+import shutil
 import argparse
 import logging
+import multiprocessing
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Dict, List, Optional
 from dftio import __version__
 from dftio.io.parse import ParserRegister
+from dftio.io.lmdb_writer import LMDBWriter, init_worker, get_worker_writer, prune_lmdb, watch_writer, stop_writer
+from dftio.io.lmdb_record import convert_pickle_lmdb
+from dftio.io.h5_blocks import migrate_h5_blocks
+from dftio.io.hdf5_writer import merge_hdf5, prune_hdf5
+from dftio.io.parse_manifest import ParseManifest, OPTION_KEYS, DONE, input_fingerprint, scan_input
+from dftio.io.schedule import cost_chunks, log_utilization
+from dftio.io.profiling import stage, enable_profiling, pop_records, cprofile_calls, write_profile, format_summary
 from tqdm import tqdm
 from multiprocessing.pool import Pool
 from dftio.logger import set_log_handles
 from dftio.plot.plot_eigs import BandPlot
+log = logging.getLogger(__name__)
 
 def get_ll(log_level: str) -> int:
     """Convert string to python logging level.
@@ -93,7 +106,7 @@ def main_parser() -> argparse.ArgumentParser:
         "--root",
         type=str,
         default="./",
-        help="The root directory of the DFT files.",
+        help="The root directory of the DFT files, or a file listing the DFT files one per line.",
     )
 
     parser_parse.add_argument(
@@ -104,6 +117,54 @@ def main_parser() -> argparse.ArgumentParser:
         help="The prefix of the DFT files under root.",
     )
 
+    parser_parse.add_argument(
+        "-md",
+        "--max_depth",
+        type=int,
+        default=0,
+        help="The number of directory levels below root searched for the DFT files, 0 searches root only.",
+    )
+
+    parser_parse.add_argument(
+        "-idx",
+        "--index_path",
+        type=str,
+        default=None,
+        help="A file of the sorted DFT files found under root, written by the first run and reused instead of searching root.",
+    )
+
+    parser_parse.add_argument(
+        "-fp",
+        "--fingerprint",
+        type=str,
+        default="stat",
+        choices=["stat", "content"],
+        help="How the DFT files are compared with the parse manifest of the previous runs, by the size and modification time or by the content of their files.",
+    )
+
+    parser_parse.add_argument(
+        "-rp",
+        "--reparse",
+        action="store_true",
+        help="Parse all the DFT files again, instead of only the new, changed or failed ones of the parse manifest under outroot.",
+    )
+
+    parser_parse.add_argument(
+        "-prof",
+        "--profile",
+        action="store_true",
+        help="Record the time, bytes read and written and peak memory of every stage of the parsing of every DFT file, "
+             "written into profile.json and profile.csv under outroot and summarized in the log.",
+    )
+
+    parser_parse.add_argument(
+        "-pd",
+        "--profile_dir",
+        type=str,
+        default=None,
+        help="Profile the parsing with cProfile and dump the statistics of every process into parse.{pid}.pstats under this directory.",
+    )
+
     parser_parse.add_argument(
         "-o",
         "--outroot",
@@ -117,7 +178,7 @@ def main_parser() -> argparse.ArgumentParser:
         "--format",
         type=str,
         default="dat",
-        help="The output file format, should be dat, ase or lmdb.",
+        help="The output file format, should be dat, ase, lmdb or hdf5.",
     )
 
     parser_parse.add_argument(
@@ -159,6 +220,35 @@ def main_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Whether to parse the total energy (Etot) from DFT output",
     )
+    parser_parse.add_argument(
+        "-bs",
+        "--lmdb_batch_size",
+        type=int,
+        default=64,
+        help="The number of frames committed in one LMDB write transaction.",
+    )
+    parser_parse.add_argument(
+        "-sw",
+        "--lmdb_single_writer",
+        action="store_true",
+        help="Write all frames into one data.lmdb owned by a single writer process, instead of one data.{pid}.lmdb per worker.",
+    )
+    parser_parse.add_argument(
+        "-lf",
+        "--lmdb_format",
+        type=str,
+        default="pickle",
+        choices=["pickle", "record"],
+        help="The serialization of LMDB frames, pickled dicts or binary records that can be decoded without copies.",
+    )
+    parser_parse.add_argument(
+        "-hl",
+        "--h5_layout",
+        type=str,
+        default="block",
+        choices=["block", "packed"],
+        help="The layout of the blocks in the dat format, one HDF5 dataset per block or one packed array per frame.",
+    )
     
     parser_band = subparsers.add_parser(
         "band",
@@ -196,6 +286,34 @@ def main_parser() -> argparse.ArgumentParser:
         help="The maximum band index to plot.",
     )
 
+    parser_convert = subparsers.add_parser(
+        "convert",
+        parents=[parser_log],
+        help="convert an LMDB database of pickled frames into binary records, or a blocks .h5 file into the packed layout",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser_convert.add_argument(
+        "-i",
+        "--input",
+        type=str,
+        required=True,
+        help="The LMDB database of pickled frames, or a .h5 blocks file such as hamiltonians.h5.",
+    )
+    parser_convert.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default=None,
+        help="The LMDB database to write the binary records into, or the packed .h5 file. The .h5 input is replaced in place if not given.",
+    )
+    parser_convert.add_argument(
+        "-bs",
+        "--lmdb_batch_size",
+        type=int,
+        default=64,
+        help="The number of frames committed in one LMDB write transaction.",
+    )
+
     return parser
 
 def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
@@ -222,16 +340,45 @@ def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
     return parsed_args
 
 class wapper:
-    def __init__(self, args):
+    def __init__(self, args, parser=None, writer=None):
         self.args = args
-        self.parser = ParserRegister(
+        self.parser = parser if parser is not None else ParserRegister(
             **self.args
         )
-        
+        self.writer = writer
+
     def __call__(self, idx):
-        # print(idx)
-        self.parser.write(idx=idx, **self.args)
-        return True
+        enable_profiling(self.args["profile"])
+        # a failed DFT file is reported and recorded in the manifest, the others are still parsed
+        try:
+            output = self.parser.write(idx=idx, writer=self.writer or get_worker_writer(), **self.args)
+        except Exception as e:
+            log.exception(f"Failed to parse {self.parser[idx]}.")
+            return idx, None, None, f"{type(e).__name__}: {e}"
+        # taken after writing, as the parser may unpack files into the calculation folder
+        with stage("fingerprint", idx):
+            fingerprint = input_fingerprint(self.parser[idx], mode=self.args["fingerprint"])
+        return idx, output, fingerprint, None
+
+    def run_chunk(self, chunk):
+        start = time.perf_counter()
+        with cprofile_calls(self.args["profile_dir"]):
+            results = [self(idx) for idx in chunk]
+        # the stage records of the chunk are sent back with its results
+        return results, pop_records(), os.getpid(), time.perf_counter() - start
+
+# the wapper of a pool worker, built once by init_parse_worker so that only the idx of a chunk are sent to it
+_worker = None
+
+def init_parse_worker(args, queue=None):
+    """Pool initializer of the parse command, builds the parser of the worker and shares the queue of the single writer mode."""
+    global _worker
+    if queue is not None:
+        init_worker(queue)
+    _worker = wapper(args)
+
+def run_chunk(chunk):
+    return _worker.run_chunk(chunk)
 
 def main():
     args = parse_args()
@@ -242,17 +389,124 @@ def main():
     dict_args = vars(args)
 
     if args.command == "parse":
+        manifest = ParseManifest(args.outroot, {k: dict_args[k] for k in OPTION_KEYS}, fingerprint=args.fingerprint)
         parser = ParserRegister(
                         **dict_args
                     )
+        # the DFT files of the previous runs keep their idx, and the workers get the list instead of searching root again
+        dict_args["root"] = manifest.order(parser.raw_datas)
+        if dict_args["root"] != list(parser.raw_datas):
+            parser = ParserRegister(**dict_args)
+        single_writer = args.format == "lmdb" and args.lmdb_single_writer
+        if single_writer:
+            os.makedirs(args.outroot, exist_ok=True)
+            lmdb_path = os.path.join(args.outroot, "data.lmdb")
+
+        results = []
+        def record(result):
+            idx, output, fingerprint, error = result
+            if single_writer:
+                # the frames are only committed once the writer is closed
+                results.append((idx, lmdb_path, fingerprint, error))
+            else:
+                manifest.record(parser[idx], idx, output=output, fingerprint=fingerprint, error=error)
+
+        queue = None
+        if args.num_workers > 1 and single_writer:
+            # the workers send serialized frames to one process that owns data.lmdb, started once it is pruned
+            queue = multiprocessing.Queue(maxsize=4 * args.num_workers)
+            server = multiprocessing.Process(target=LMDBWriter.serve, args=(queue, lmdb_path, args.lmdb_batch_size))
+        pool = Pool(args.num_workers, initializer=init_parse_worker, initargs=(dict_args, queue)) if args.num_workers > 1 else nullcontext()
+        with pool as p:
+            # one walk of every DFT file, in the pool if any: the fingerprint of the recorded ones, to find those
+            # that changed, and the bytes of all of them, to schedule the pool
+            modes = [None if args.reparse or not manifest.is_recorded(path) else args.fingerprint for path in parser.raw_datas]
+            if p is not None:
+                scans = p.starmap(scan_input, zip(parser.raw_datas, modes), chunksize=len(modes) // (4 * args.num_workers) + 1)
+            else:
+                scans = [(None, 0) if mode is None else scan_input(path, mode) for path, mode in zip(parser.raw_datas, modes)]
+            fingerprints = [fingerprint for fingerprint, _ in scans]
+            costs = [nbytes for _, nbytes in scans]
+
+            todo = list(range(len(parser))) if args.reparse else manifest.pending(parser.raw_datas, fingerprints)
+            log.info(f"{len(todo)} of {len(parser)} DFT files are parsed, the others are up to date in {manifest.path}.")
+            # the earlier outputs of the DFT files to parse again are removed, so that every structure is found once
+            keep = set(range(len(parser))) - set(todo)
+            if args.format == "hdf5":
+                prune_hdf5(args.outroot, keep=keep)
+            elif args.format == "lmdb":
+                prune_lmdb(args.outroot, keep=keep)
+
+            if p is not None:
+                # the largest DFT files first, so that the run does not wait on a large one started last
+                chunks = cost_chunks(todo, [costs[idx] for idx in todo], args.num_workers)
+                usage = {}
+                records = []
+                if single_writer:
+                    server.start()
+                try:
+                    start = time.perf_counter()
+                    chunk_iter = p.imap_unordered(run_chunk, chunks)
+                    if single_writer:
+                        chunk_iter = watch_writer(chunk_iter, server)
+                    with tqdm(total=len(todo), desc="Parsing the DFT files: ") as pbar:
+                        for chunk_results, chunk_records, pid, busy in chunk_iter:
+                            for result in chunk_results:
+                                record(result)
+                            records.extend(chunk_records)
+                            ntasks, total_busy = usage.get(pid, (0, 0.))
+                            usage[pid] = (ntasks + len(chunk_results), total_busy + busy)
+                            pbar.update(len(chunk_results))
+                    log_utilization(usage, time.perf_counter() - start, args.num_workers)
+                finally:
+                    if single_writer:
+                        exitcode = stop_writer(queue, server)
+                if single_writer and exitcode != 0:
+                    # the frames of the last batches were not committed
+                    log.error(f"The single writer process of {lmdb_path} exited with code {exitcode}.")
+                    results = [(idx, None, fingerprint, error or f"RuntimeError: The single writer process exited with code {exitcode}.")
+                               for idx, _, fingerprint, error in results]
+            else:
+                writer = LMDBWriter(lmdb_path, batch_size=args.lmdb_batch_size) if single_writer else None
+                try:
+                    work = wapper(dict_args, parser=parser, writer=writer)
+                    with cprofile_calls(args.profile_dir):
+                        for i in tqdm(todo, desc="Parsing the DFT files: "):
+                            record(work(i))
+                    records = pop_records()
+                finally:
+                    if writer is not None:
+                        writer.close()
+
+        for idx, output, fingerprint, error in results:
+            manifest.record(parser[idx], idx, output=output, fingerprint=fingerprint, error=error)
+        manifest.compact(parser.raw_datas)
+        if args.format in ["dat", "ase"]:
+            for path in manifest.superseded():
+                log.info(f"Removing {path}, its DFT file was parsed into another folder.")
+                shutil.rmtree(path, ignore_errors=True)
+
+        if args.format == "hdf5":
+            # the workers write data.{pid}.h5, which are linked into one data.h5
+            merge_hdf5(args.outroot)
+
+        if args.profile:
+            summary = write_profile(records, args.outroot)
+            log.info(f"The stages of the parsing, written into {os.path.join(args.outroot, 'profile.json')}:\n" + format_summary(summary))
+
+        failed = [entry["input"] for entry in manifest.entries.values() if entry["status"] != DONE]
+        if len(failed) > 0:
+            raise RuntimeError(f"{len(failed)} of {len(parser)} DFT files failed to parse, e.g. {failed[0]}, "
+                               f"see the errors in {manifest.path}. Rerun the command to parse them again.")
         
-        if args.num_workers > 1:
-            with Pool(args.num_workers) as p:
-                list(tqdm(p.imap(wapper(dict_args), range(len(parser))), total=len(parser), desc="Parsing the DFT files: "))
+    if args.command == "convert":
+        if args.input.endswith(".h5"):
+            migrate_h5_blocks(args.input, args.output)
         else:
-            for i in tqdm(range(len(parser)), desc="Parsing the DFT files: "):
-                parser.write(idx=i, **dict_args)
-        
+            if args.output is None:
+                raise ValueError("The output LMDB database should be given with -o.")
+            convert_pickle_lmdb(args.input, args.output, batch_size=args.lmdb_batch_size)
+
     if args.command == "band":
         bandplot = BandPlot(
             **dict_args
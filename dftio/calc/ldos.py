@@ -2,8 +2,11 @@ from dftio.op import SingleGridIntegrator, make_uniform_grid, make_simple_grid
 from dftio.datastruct import AtomicBasis
 from math import ceil, floor
 from dftio.constants import atomic_numbers_r
+import logging
 import torch
 
+log = logging.getLogger(__name__)
+
 class LDOS:
     def __init__(
             self, 
@@ -19,6 +22,10 @@ class LDOS:
             sorted=False, 
             use_scaled_positions=False,
             dtype=torch.float32,
+            chunk_size=16384,
+            state_batch_size=64,
+            precompute=False,
+            cache_dir=None,
             ):
 
         self.atomic_basis = atomicbasis
@@ -30,6 +37,7 @@ class LDOS:
         self.z_valence = z_valence
         self.nspin = nspin
         self.dtype=dtype
+        self.state_batch_size = state_batch_size
 
         self.sgint = SingleGridIntegrator(
             atomic_numbers=atomic_numbers, 
@@ -41,7 +49,10 @@ class LDOS:
             skin=skin,
             sorted=sorted, 
             use_scaled_positions=use_scaled_positions,
-            dtype=dtype
+            dtype=dtype,
+            chunk_size=chunk_size,
+            precompute=precompute,
+            cache_dir=cache_dir,
         )
 
         self.natoms = len(atomic_numbers)
@@ -49,137 +60,221 @@ class LDOS:
         if z_valence is not None:
             self.n_valbands = sum([z_valence[atomic_numbers_r[i]] for i in self.atomic_numbers]) / self.nspin
         
-    def get(self, E: float, coefficients: torch.Tensor, eigenvalues: torch.Tensor, sigma: float=0.1):
-        """Compute the local density of states at energy E
+    def _density(self, coefficients: torch.Tensor, weights: torch.Tensor):
+        """Sum the densities of the states on the grid, with several sets of weights.
+
+        The states are integrated on the grid by batches of ``state_batch_size``.
 
         Parameters
         ----------
-        E : float
-            _description_
         coefficients : torch.Tensor
-            _description_
-        eigenvalues : torch.Tensor
-            _description_
-        bias : float, optional
-            _description_, by default 0.0
-        sigma : float, optional
-            _description_, by default 0.1
+            The coefficients of the states, shaped [nstates, norbs]
+        weights : torch.Tensor
+            The weights of the states, shaped [nweights, nstates]
 
         Returns
         -------
-        _type_
-            _description_
+        torch.Tensor
+            The weighted densities, shaped [nweights, ngrids]
         """
+        density = torch.zeros(weights.shape[0], self.grids.shape[0])
+        for i, ll in self._state_densities(coefficients):
+            density += weights[:, i:i+len(ll)].to(ll.dtype) @ ll
+        return density
 
-        ldos = torch.zeros(self.grids.shape[0])
-        
-        
+    def _state_densities(self, coefficients: torch.Tensor):
+        """Yield the first state index and the densities on the grid of each batch of ``state_batch_size`` states."""
+        for i in range(0, len(coefficients), self.state_batch_size):
+            ll = self.nspin * self.sgint.integrate_batch(coefficients[i:i+self.state_batch_size])
+            yield i, (ll * ll.conj()).real
 
-        k, n, m = coefficients.shape # [nk, nbands, norbs]
-        # compute E_fermi if self.n_valbands is available
-        if self.n_valbands:
-            neigvalan = k * self.n_valbands
-            eigsort = eigenvalues.reshape(-1).sort().values
-            if ceil(neigvalan) - neigvalan < 1e-6: # int
-                E_fermi = eigsort[floor(neigvalan-1)] + eigsort[ceil(neigvalan+1)]
-                E_fermi /= 2
-            else:
-                E_fermi = eigsort[floor(neigvalan)]
-            
+    def fermi_energy(self, eigenvalues: torch.Tensor):
+        """Compute the fermi energy from the number of valence bands, 0 if it is not available.
+
+        Parameters
+        ----------
+        eigenvalues : torch.Tensor
+            The eigenvalues, shaped [nk, nbands]
+
+        Returns
+        -------
+        float or torch.Tensor
+            The fermi energy
+        """
+        if not self.n_valbands:
+            return 0.
+
+        neigvalan = eigenvalues.shape[0] * self.n_valbands
+        eigsort = eigenvalues.reshape(-1).sort().values
+        if ceil(neigvalan) - neigvalan < 1e-6: # int
+            E_fermi = eigsort[floor(neigvalan-1)] + eigsort[ceil(neigvalan+1)]
+            E_fermi /= 2
         else:
-            E_fermi = 0.
+            E_fermi = eigsort[floor(neigvalan)]
+        log.info(f"Computed fermi energy: {float(E_fermi)}")
 
-        print("Computed fermi energy: ", E_fermi)
-        
+        return E_fermi
+
+    def get_many(self, energies, coefficients: torch.Tensor, eigenvalues: torch.Tensor, sigma: float=0.1):
+        """Compute the local density of states at several energies in one pass over the states.
+
+        The states within 5 sigma of any of the energies are integrated on the grid once, and their
+        densities are summed with the gaussian weights of all the energies at once.
+
+        Parameters
+        ----------
+        energies : float or sequence of float or torch.Tensor
+            The energies E
+        coefficients : torch.Tensor
+            The coefficients of the states, shaped [nk, nbands, norbs]
+        eigenvalues : torch.Tensor
+            The eigenvalues of the states, shaped [nk, nbands]
+        sigma : float, optional
+            The width of the gaussian broadening, by default 0.1
 
-        E_range = [E-5*sigma, E+5*sigma]
+        Returns
+        -------
+        torch.Tensor
+            The local density of states, shaped [nE, ngrids]
+        """
+        k, n, m = coefficients.shape # [nk, nbands, norbs]
         assert n == eigenvalues.shape[1] and k == eigenvalues.shape[0] and len(eigenvalues.shape)==2, "Number of bands and kpoints of coeff must be the same as the number of eigenvalues"
         if self.n_valbands:
             assert n >= self.n_valbands, f"Number of bands must be at least {self.n_valbands}"
-            n = self.n_valbands
+            n = ceil(self.n_valbands)
         else:
-            print("Warning: Number of valence bands not provided. All input coeff and eigenvalues are considered corresponding to valence bands.")
+            log.warning("Number of valence bands not provided. All input coeff and eigenvalues are considered corresponding to valence bands.")
         assert m >= n
 
         coefficients = coefficients[:,:n]
         eigenvalues = eigenvalues[:,:n]
+        energies = torch.as_tensor(energies, dtype=eigenvalues.dtype).reshape(-1)
 
-        mask = torch.logical_and(eigenvalues > E_range[0], eigenvalues < E_range[1])
-        mask = torch.logical_and(mask, coefficients.norm(dim=2) > 1e-6)
+        # the states in the window E-5*sigma < e < E+5*sigma of each energy, shaped [nE, nk, nbands]
+        delta = eigenvalues.unsqueeze(0) - energies.reshape(-1, 1, 1)
+        window = torch.logical_and(delta > -5*sigma, delta < 5*sigma)
+        mask = torch.logical_and(window.any(dim=0), coefficients.norm(dim=2) > 1e-6)
 
-        for ik in range(k):
-            for ib in range(n):
-                if mask[ik, ib]:
-                    ll = self.nspin * self.sgint.integrate(weights=coefficients[ik, ib])
-                    ldos += (ll * ll.conj()).real * torch.exp(-0.5*((eigenvalues[ik, ib] - E) / sigma) ** 2)
+        weights = torch.exp(-0.5*(delta[:, mask] / sigma) ** 2) * window[:, mask]
+        ldos = self._density(coefficients[mask], weights)
 
         return ldos / k
-    
-    def get_wbias(self, coefficients: torch.Tensor, eigenvalues: torch.Tensor, bias: float=0.0):
+
+    def get(self, E: float, coefficients: torch.Tensor, eigenvalues: torch.Tensor, sigma: float=0.1):
         """Compute the local density of states at energy E
 
         Parameters
         ----------
+        E : float
+            The energy
         coefficients : torch.Tensor
-            _description_
+            The coefficients of the states, shaped [nk, nbands, norbs]
         eigenvalues : torch.Tensor
-            _description_
-        bias : float, optional
-            _description_, by default 0.0
+            The eigenvalues of the states, shaped [nk, nbands]
         sigma : float, optional
-            _description_, by default 0.1
+            The width of the gaussian broadening, by default 0.1
 
         Returns
         -------
-        _type_
-            _description_
+        torch.Tensor
+            The local density of states, shaped [ngrids]
         """
-        ldos = torch.zeros(self.grids.shape[0])
-        
-        k, n, m = coefficients.shape
-        # compute E_fermi if self.n_valbands is available
-        if self.n_valbands:
-            neigvalan = k * self.n_valbands
-            eigsort = eigenvalues.reshape(-1).sort().values
-            if ceil(neigvalan) - neigvalan < 1e-6: # int
-                E_fermi = eigsort[floor(neigvalan-1)] + eigsort[ceil(neigvalan+1)]
-                E_fermi /= 2
-            else:
-                E_fermi = eigsort[floor(neigvalan)]
-            
-        else:
-            E_fermi = 0.
-
-        print("Computed fermi energy: ", E_fermi)
-        
-        eigenvalues -= E_fermi
+        return self.get_many([E], coefficients, eigenvalues, sigma=sigma)[0]
+    
+    def get_wbias(self, coefficients: torch.Tensor, eigenvalues: torch.Tensor, bias: float=0.0):
+        """Compute the local density of states integrated between the fermi energy and the bias
 
-        E_range = [min(0.0, bias), max(0.0, bias)]
+        Parameters
+        ----------
+        coefficients : torch.Tensor
+            The coefficients of the states, shaped [nk, nbands, norbs]
+        eigenvalues : torch.Tensor
+            The eigenvalues of the states, shaped [nk, nbands], they are not modified
+        bias : float, optional
+            The bias relative to the fermi energy, by default 0.0
 
+        Returns
+        -------
+        torch.Tensor
+            The integrated local density of states, shaped [ngrids]
+        """
+        k, n, m = coefficients.shape
         assert n == eigenvalues.shape[1] and k == eigenvalues.shape[0] and len(eigenvalues.shape)==2, "Number of bands and kpoints of coeff must be the same as the number of eigenvalues"
-        # if self.n_valbands:
-        #     assert n >= self.n_valbands, f"Number of bands must be at least {self.n_valbands}"
-        #     n = self.n_valbands
-        # else:
-        #     print("Warning: Number of valence bands not provided. All input coeff and eigenvalues are considered corresponding to valence bands.")
         assert m >= n
 
-        # coefficients = coefficients[:,:n]
-        # eigenvalues = eigenvalues[:,:n]
+        eigenvalues = eigenvalues - self.fermi_energy(eigenvalues)
+
+        E_range = [min(0.0, bias), max(0.0, bias)]
 
         mask = torch.logical_and(eigenvalues > E_range[0], eigenvalues < E_range[1])
         mask = torch.logical_and(mask, coefficients.norm(dim=2) > 1e-6)
 
-        for ik in range(k):
-            for ib in range(n):
-                if mask[ik, ib]:
-                    ll = self.nspin * self.sgint.integrate(weights=coefficients[ik, ib])
-                    ldos += (ll * ll.conj()).real
+        ldos = self._density(coefficients[mask], torch.ones(1, int(mask.sum())))[0]
 
         return ldos / k
     
+    def bias_sweep(self, coefficients: torch.Tensor, eigenvalues: torch.Tensor, biases, shape=None):
+        """Compute ``get_wbias`` at many biases in a single pass over the states.
+
+        The windows between the fermi energy and the biases are nested, so the states above (below)
+        the fermi energy are integrated once in increasing (decreasing) order of energy, and the
+        running sum of their densities is recorded each time it reaches a bias.
+
+        Parameters
+        ----------
+        coefficients : torch.Tensor
+            The coefficients of the states, shaped [nk, nbands, norbs]
+        eigenvalues : torch.Tensor
+            The eigenvalues of the states, shaped [nk, nbands], they are not modified
+        biases : sequence of float or torch.Tensor
+            The biases relative to the fermi energy
+        shape : tuple of int, optional
+            The shape of the grid, (nx, ny, nz) as returned by the grid makers, to reshape the
+            results into images that ``scan`` takes directly
+
+        Returns
+        -------
+        torch.Tensor
+            The integrated local density of states of each bias, shaped [nbias, ngrids] or [nbias, *shape]
+        """
+        k, n, m = coefficients.shape
+        assert n == eigenvalues.shape[1] and k == eigenvalues.shape[0] and len(eigenvalues.shape)==2, "Number of bands and kpoints of coeff must be the same as the number of eigenvalues"
+        assert m >= n
+
+        eigenvalues = eigenvalues - self.fermi_energy(eigenvalues)
+        biases = torch.as_tensor(biases, dtype=eigenvalues.dtype).reshape(-1)
+        ldos = torch.zeros(len(biases), self.grids.shape[0])
+        norm_mask = coefficients.norm(dim=2) > 1e-6
+
+        # the states above the fermi energy for the positive biases, and below it for the negative ones,
+        # with the energy distance to the fermi energy in increasing order
+        for sign in [1, -1]:
+            mask = torch.logical_and(sign * eigenvalues > 0, norm_mask)
+            distance, order = (sign * eigenvalues[mask]).sort()
+            states = coefficients[mask][order]
+            ibias = (sign * biases > 0).nonzero().reshape(-1)
+            # the number of states strictly inside the window of each bias
+            counts = torch.searchsorted(distance, sign * biases[ibias], side="left")
+
+            running = torch.zeros(self.grids.shape[0], dtype=torch.float64)
+            for i, ll in self._state_densities(states):
+                cumulative = running + ll.to(running.dtype).cumsum(dim=0)
+                reached = torch.logical_and(counts > i, counts <= i + len(ll))
+                ldos[ibias[reached]] = cumulative[counts[reached] - i - 1].to(ldos.dtype)
+                running = cumulative[-1]
+
+        ldos = ldos / k
+        if shape is not None:
+            ldos = ldos.reshape(len(biases), *shape)
+
+        return ldos
+
     def scan(self, ldos_wbias, current: float):
 
+        if len(ldos_wbias.shape) == 4:
+            # a stack of LDOS images from bias_sweep, one height map per bias
+            return torch.stack([self.scan(ldos, current) for ldos in ldos_wbias])
+
         # here we assert the z axis are perpendicular to x and y direction
         assert len(ldos_wbias.shape) == 3, "scan only works for 3D LDOS"
 
@@ -203,7 +298,7 @@ class LDOS:
             # filter the negative ones
             mask = torch.zeros_like(ldos_wbias_diff[:,:,0], dtype=torch.bool)
             for i in range(1,nz):
-                mask = torch.logical_or(mask, ldos_wbias_diff[:,:,i] < 0)
+                mask = torch.logical_or(mask, ldos_wbias_diff[:,:,i-1] < 0)
                 ldos_wbias[:,:,i][mask] = 100
 
             # min_up = ldos_wbias[:,:,nz-1].min()
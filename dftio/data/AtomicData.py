@@ -20,6 +20,7 @@ from ase.stress import voigt_6_to_full_3x3_stress, full_3x3_to_voigt_6_stress
 from . import AtomicDataDict
 from .data_np import Data
 from ..constants import atomic_num_dict
+from .neighbor_list import get_neighbor_backend
 
 # A type representing ASE-style periodic boundary condtions, which can be partial (the tuple case)
 PBC = Union[bool, Tuple[bool, bool, bool]]
@@ -387,6 +388,7 @@ class AtomicData(Data):
         pbc: Optional[PBC] = None,
         er_max: Optional[float] = None,
         oer_max: Optional[float] = None,
+        neighbor_backend: str = "ase",
         **kwargs,
     ):
         """Build neighbor graph from points, optionally with PBC.
@@ -403,6 +405,8 @@ class AtomicData(Data):
             strict_self_interaction (bool): Whether to include *any* self interaction edges in the graph, even if the
             two instances of the atom are in different periodic images. Defaults to True, should be True for most
             applications.
+            neighbor_backend (str, optional): the neighbor search backend, "ase", "cell_list" or "kdtree". Defaults
+            to ``"ase"``.
             **kwargs (optional): other fields to add. Keys listed in ``AtomicDataDict.*_KEY` will be treated specially.
         """
         if pos is None or r_max is None:
@@ -421,19 +425,22 @@ class AtomicData(Data):
         else:
             assert len(pbc) == 3
 
-        # TODO: We can only compute the edge vector one times with the largest radial distance among [r_max, er_max, oer_max]
-
         pos = np.asarray(pos)
 
-        edge_index, edge_cell_shift, cell = neighbor_list_and_relative_vec(
+        # one neighbor search at the largest radius among [r_max, er_max, oer_max]
+        r_maxs = [r_max] + [r for r in [er_max, oer_max] if r is not None]
+        (edge_indices, edge_cell_shifts), cell = neighbor_lists_and_relative_vecs(
             pos=pos,
-            r_max=r_max,
+            r_maxs=r_maxs,
             self_interaction=self_interaction,
             cell=cell,
             reduce=False,
             atomic_numbers=kwargs.get("atomic_numbers", None),
             pbc=pbc,
+            backend=neighbor_backend,
         )
+        edge_indices, edge_cell_shifts = list(edge_indices), list(edge_cell_shifts)
+        edge_index, edge_cell_shift = edge_indices.pop(0), edge_cell_shifts.pop(0)
 
         # Make torch tensors for data:
         if cell is not None:
@@ -446,15 +453,7 @@ class AtomicData(Data):
 
         # add env index
         if er_max is not None:
-            env_index, env_cell_shift, _ = neighbor_list_and_relative_vec(
-                pos=pos,
-                r_max=er_max,
-                self_interaction=self_interaction,
-                cell=cell,
-                reduce=False,
-                atomic_numbers=kwargs.get("atomic_numbers", None),
-                pbc=pbc,
-            )
+            env_index, env_cell_shift = edge_indices.pop(0), edge_cell_shifts.pop(0)
 
             if cell is not None:
                 kwargs[AtomicDataDict.ENV_CELL_SHIFT_KEY] = env_cell_shift
@@ -462,15 +461,7 @@ class AtomicData(Data):
         
         # add onsitenv index
         if oer_max is not None:
-            onsitenv_index, onsitenv_cell_shift, _ = neighbor_list_and_relative_vec(
-                pos=pos,
-                r_max=oer_max,
-                self_interaction=self_interaction,
-                cell=cell,
-                reduce=False,
-                atomic_numbers=kwargs.get("atomic_numbers", None),
-                pbc=pbc
-            )
+            onsitenv_index, onsitenv_cell_shift = edge_indices.pop(0), edge_cell_shifts.pop(0)
 
             if cell is not None:
                 kwargs[AtomicDataDict.ONSITENV_CELL_SHIFT_KEY] = onsitenv_cell_shift
@@ -864,6 +855,30 @@ assert _ERROR_ON_NO_EDGES in ("true", "false")
 _ERROR_ON_NO_EDGES = _ERROR_ON_NO_EDGES == "true"
 
 
+def _periodic_self_edge_mask(first_idex, second_idex, shifts):
+    """Mask of the bonds to keep among the i i shift bonds, which are the same as the i i -shift ones.
+
+    A bond i i shift is kept if i i -shift is not met before it in the list, shift = 0 being its own
+    reverse is removed. The bonds i != j are all kept.
+    """
+    mask = first_idex != second_idex
+    self_edge = np.nonzero(~mask)[0]
+    if len(self_edge) == 0:
+        return mask
+    o_shift = shifts[self_edge].astype(np.int64)
+    # encode (i, shift) and (i, -shift) into integer keys, the shift being digits in [-m, m] of base 2m+1
+    span = 2 * int(np.abs(o_shift).max()) + 1
+    o_first = first_idex[self_edge].astype(np.int64)
+    key = ((o_first * span + o_shift[:, 0]) * span + o_shift[:, 1]) * span + o_shift[:, 2]
+    key_rev = ((o_first * span - o_shift[:, 0]) * span - o_shift[:, 1]) * span - o_shift[:, 2]
+    # position of the reverse bond in the list of i == j bonds, len(key) if there is none
+    order = np.argsort(key, kind="stable")
+    found = np.minimum(np.searchsorted(key, key_rev, sorter=order), len(key) - 1)
+    rev_position = np.where(key[order[found]] == key_rev, order[found], len(key))
+    mask[self_edge] = rev_position > np.arange(len(key))
+    return mask
+
+
 def neighbor_list_and_relative_vec(
     pos,
     r_max,
@@ -872,6 +887,7 @@ def neighbor_list_and_relative_vec(
     atomic_numbers=None,
     cell=None,
     pbc=False,
+    backend="ase",
 ):
     """Create neighbor list and neighbor vectors based on radial cutoff.
 
@@ -898,6 +914,7 @@ def neighbor_list_and_relative_vec(
         cell (numpy shape [3, 3]): Cell for periodic boundary conditions. Ignored if ``pbc == False``.
         pbc (bool or 3-tuple of bool): Whether the system is periodic in each of the three cell dimensions.
         self_interaction (bool): Whether or not to include same periodic image self-edges in the neighbor list.
+        backend (str): The neighbor search backend, "ase", "cell_list" or "kdtree", see ``dftio.data.neighbor_list``.
         strict_self_interaction (bool): Whether to include *any* self interaction edges in the graph, even if the two
             instances of the atom are in different periodic images. Defaults to True, should be True for most applications.
 
@@ -908,173 +925,162 @@ def neighbor_list_and_relative_vec(
         cell (torch.Tensor [3, 3]): the cell as a tensor on the correct device.
             Returned only if cell is not None.
     """
+    (edge_index, shifts), temp_cell = neighbor_lists_and_relative_vecs(
+        pos=pos,
+        r_maxs=[r_max],
+        self_interaction=self_interaction,
+        reduce=reduce,
+        atomic_numbers=atomic_numbers,
+        cell=cell,
+        pbc=pbc,
+        backend=backend,
+    )
+    edge_index, shifts = edge_index[0], shifts[0]
+
+    return edge_index, shifts, temp_cell
+
+
+def neighbor_lists_and_relative_vecs(
+    pos,
+    r_maxs,
+    self_interaction=False,
+    reduce=True,
+    atomic_numbers=None,
+    cell=None,
+    pbc=False,
+    backend="ase",
+):
+    """Create the neighbor lists of several radial cutoffs with a single neighbor search.
+
+    The bonds are searched once with the largest cutoff, then the bonds of each cutoff are selected
+    by their length, strictly shorter than the cutoff as in ase. The lists have the convention of
+    ``neighbor_list_and_relative_vec``; the edges of a smaller cutoff keep the order they have in the
+    list of the largest one.
+
+    Args:
+        r_maxs (list of float or dict): the radial cutoffs, a dict gives the cutoff of each species.
+        backend (str): the neighbor search backend registered in ``dftio.data.neighbor_list``, "ase",
+            "cell_list" or "kdtree". The backends find the same bonds in different orders.
+        others: see ``neighbor_list_and_relative_vec``.
+
+    Returns:
+        edge_index (tuple of np.ndarray shape [2, num_edges]): the edges of each cutoff.
+        edge_cell_shift (tuple of np.ndarray shape [num_edges, 3]): the cell shifts of each cutoff.
+        cell (np.ndarray [3, 3]): the completed cell.
+    """
     if isinstance(pbc, bool):
         pbc = (pbc,) * 3
 
-    mask_r = False
-    if isinstance(r_max, dict):
-        _r_max = max(r_max.values())
-        if _r_max - min(r_max.values()) > 1e-5:
-            mask_r = True
-        
-        if len(r_max) < len(set(atomic_numbers)):
-            raise ValueError("The number of r_max is less than the number of required atom species.")
-    else:
-        _r_max = r_max
-        assert isinstance(r_max, (float, int))
-
-    # Either the position or the cell may be on the GPU as tensors
-    # if isinstance(pos, torch.Tensor):
-    #     temp_pos = pos.detach().cpu().numpy()
-    #     out_device = pos.device
-    #     out_dtype = pos.dtype
-    # else:
-    #     temp_pos = np.asarray(pos)
-    #     out_device = torch.device("cpu")
-    #     out_dtype = torch.get_default_dtype()
+    cutoffs = []
+    for r_max in r_maxs:
+        if isinstance(r_max, dict):
+            if len(r_max) < len(set(atomic_numbers)):
+                raise ValueError("The number of r_max is less than the number of required atom species.")
+            cutoffs.append(max(r_max.values()))
+        else:
+            assert isinstance(r_max, (float, int))
+            cutoffs.append(r_max)
+    _r_max = max(cutoffs)
 
     temp_pos = np.asarray(pos)
-    # out_device = torch.device("cpu")
-    # out_dtype = torch.get_default_dtype()
-
-    # Right now, GPU tensors require a round trip
-    # if out_device.type != "cpu":
-    #     warnings.warn(
-    #         "Currently, neighborlists require a round trip to the CPU. Please pass CPU tensors if possible."
-    #     )
-
-    # Get a cell on the CPU no matter what
-    # if isinstance(cell, torch.Tensor):
-    #     temp_cell = cell.detach().cpu().numpy()
-    #     cell_tensor = cell.to(device=out_device, dtype=out_dtype)
     if cell is not None:
         temp_cell = np.asarray(cell)
     else:
         temp_cell = np.zeros((3, 3), dtype=temp_pos.dtype)
-    # if cell is not None:
-    #     temp_cell = np.asarray(cell)
-    #     cell_tensor = torch.as_tensor(temp_cell, device=out_device, dtype=out_dtype)
-    # else:
-    #     # ASE will "complete" this correctly.
-    #     temp_cell = np.zeros((3, 3), dtype=temp_pos.dtype)
-    #     cell_tensor = torch.as_tensor(temp_cell, device=out_device, dtype=out_dtype)
 
     # ASE dependent part
     temp_cell = ase.geometry.complete_cell(temp_cell)
 
-    first_idex, second_idex, shifts = ase.neighborlist.primitive_neighbor_list(
-        "ijS",
+    search_cutoff = float(_r_max)
+    if backend != "ase" and len(r_maxs) == 1 and isinstance(r_maxs[0], dict):
+        # the native backends prune the bonds with the cutoffs of the species
+        search_cutoff = np.array([r_maxs[0][ase.data.chemical_symbols[z]] for z in np.asarray(atomic_numbers).tolist()])
+
+    first_idex, second_idex, shifts = get_neighbor_backend(backend)(
         pbc,
         temp_cell,
         temp_pos,
-        cutoff=float(_r_max),
+        search_cutoff,
         self_interaction=self_interaction,  # we want edges from atom to itself in different periodic images!
-        use_scaled_positions=False,
     )
 
-    # Eliminate true self-edges that don't cross periodic boundaries
-    # if not self_interaction:
-    #     bad_edge = first_idex == second_idex
-    #     bad_edge &= np.all(shifts == 0, axis=1)
-    #     keep_edge = ~bad_edge
-    #     if _ERROR_ON_NO_EDGES and (not np.any(keep_edge)):
-    #         raise ValueError(
-    #             f"Every single atom has no neighbors within the cutoff r_max={r_max} (after eliminating self edges, no edges remain in this system)"
-    #         )
-    #     first_idex = first_idex[keep_edge]
-    #     second_idex = second_idex[keep_edge]
-    #     shifts = shifts[keep_edge]
-
     """
     bond list is: i, j, shift; but i j shift and j i -shift are the same bond. so we need to remove the duplicate bonds.s
     first for i != j; we only keep i < j; then the j i -shift will be removed.
     then, for i == j; we only keep i i shift and remove i i -shift.
+    The two bonds of a pair have the same length, so the pairs are either both in or both out of
+    the list of a smaller cutoff, and the duplicates are removed once for all the cutoffs.
     """
     # 1. for i != j, keep i < j
     assert atomic_numbers is not None
-    # atomic_numbers = torch.as_tensor(atomic_numbers, dtype=torch.long)
 
     mask = first_idex <= second_idex
     first_idex = first_idex[mask]
     second_idex = second_idex[mask]
     shifts = shifts[mask]
 
-    # 2. for i == j
-    
-    mask = np.ones((len(first_idex),), dtype=np.bool_)
-    mask[first_idex == second_idex] = False
-    # get index bool type ~mask  for i == j.
-    o_first_idex = first_idex[~mask]
-    o_second_idex = second_idex[~mask]
-    o_shift = shifts[~mask]
-    o_mask = mask[~mask]  # this is all False, with length being the number all  the bonds with i == j.
-
-    
-    # using the dict key to remove the duplicate bonds, because it is O(1) to check if a key is in the dict.
-    rev_dict = {}
-    for i in range(len(o_first_idex)):
-        key = str(o_first_idex[i])+str(o_shift[i])
-        key_rev = str(o_first_idex[i])+str(-o_shift[i])
-        rev_dict[key] = True
-        # key_rev is the reverse key of key, if key_rev is in the dict, then the bond is duplicate.
-        # so， only when key_rev is not in the dict, we keep the bond. that is when rev_dict.get(key_rev, False) is False, we set o_mast = True.
-        if not (rev_dict.get(key_rev, False) and rev_dict.get(key, False)):
-            o_mask[i] = True
-    
-    del rev_dict
-    del o_first_idex
-    del o_second_idex
-    del o_shift
-    mask[~mask] = o_mask
-    del o_mask
-    
-    # first_idex = torch.LongTensor(first_idex[mask], device=out_device)
-    # second_idex = torch.LongTensor(second_idex[mask], device=out_device)
-    # shifts = torch.as_tensor(shifts[mask], dtype=out_dtype, device=out_device)
+    # 2. for i == j, keep the bond i i shift only if i i -shift is not met before it.
+    mask = _periodic_self_edge_mask(first_idex, second_idex, shifts)
 
     first_idex = first_idex[mask]
     second_idex = second_idex[mask]
     shifts = shifts[mask]
-    
-    if not reduce:
-        first_idex, second_idex = np.concatenate((first_idex, second_idex), axis=0), np.concatenate((second_idex, first_idex), axis=0)
-        shifts = np.concatenate((shifts, -shifts), axis=0)
-    
-    # Build output:
-    edge_index = np.vstack(
-        (first_idex, second_idex)
-    )
 
-    
+    edge_length = None
+    if len(r_maxs) > 1:
+        # the bond lengths computed as in ase.neighborlist.primitive_neighbor_list
+        edge_vec = temp_pos[second_idex] - temp_pos[first_idex] + shifts.dot(temp_cell)
+        edge_length = np.sqrt(np.sum(edge_vec * edge_vec, axis=1))
+        del edge_vec
 
-    # TODO: mask the edges that is larger than r_max
-    if mask_r:
-        edge_vec = pos[edge_index[1]] - pos[edge_index[0]]
-        if cell is not None:
-            edge_vec = edge_vec + np.einsum(
-                "ni,ij->nj",
-                shifts,
-                temp_cell.reshape(3,3),  # remove batch dimension
-            )
+    edge_indices, edge_shifts = [], []
+    for r_max, cutoff in zip(r_maxs, cutoffs):
+        if edge_length is not None and cutoff < _r_max:
+            r_mask = edge_length < cutoff
+            r_first_idex, r_second_idex, r_shifts = first_idex[r_mask], second_idex[r_mask], shifts[r_mask]
+        else:
+            r_first_idex, r_second_idex, r_shifts = first_idex, second_idex, shifts
 
-        edge_length = np.linalg.norm(edge_vec, axis=-1)
-
-        atom_species_num = [atomic_num_dict[k] for k in r_max.keys()]
-        for i in set(atomic_numbers):
-            assert i in atom_species_num
-        r_map = np.zeros(max(atom_species_num))
-        for k, v in r_max.items():
-            r_map[atomic_num_dict[k]-1] = v
-        edge_length_max = 0.5 * (r_map[atomic_numbers[edge_index[0]]-1] + r_map[atomic_numbers[edge_index[1]]-1])
-        r_mask = edge_length <= edge_length_max
-        if any(~r_mask):
-            edge_index = edge_index[:, r_mask]
-            shifts = shifts[r_mask]
-        
-        del edge_length
-        del edge_vec
-        del r_map
-        del edge_length_max
-        del r_mask
+        if not reduce:
+            r_first_idex, r_second_idex = np.concatenate((r_first_idex, r_second_idex), axis=0), np.concatenate((r_second_idex, r_first_idex), axis=0)
+            r_shifts = np.concatenate((r_shifts, -r_shifts), axis=0)
 
-    return edge_index, shifts, temp_cell
+        # Build output:
+        edge_index = np.vstack(
+            (r_first_idex, r_second_idex)
+        )
+
+        if isinstance(r_max, dict) and max(r_max.values()) - min(r_max.values()) > 1e-5:
+            edge_index, r_shifts = _mask_species_r_max(pos, edge_index, r_shifts, cell, temp_cell, r_max, atomic_numbers)
+
+        edge_indices.append(edge_index)
+        edge_shifts.append(r_shifts)
+
+    return (tuple(edge_indices), tuple(edge_shifts)), temp_cell
+
+
+def _mask_species_r_max(pos, edge_index, shifts, cell, temp_cell, r_max, atomic_numbers):
+    """Keep the edges shorter than the mean of the cutoffs of the two species."""
+    edge_vec = pos[edge_index[1]] - pos[edge_index[0]]
+    if cell is not None:
+        edge_vec = edge_vec + np.einsum(
+            "ni,ij->nj",
+            shifts,
+            temp_cell.reshape(3,3),  # remove batch dimension
+        )
+
+    edge_length = np.linalg.norm(edge_vec, axis=-1)
+
+    atom_species_num = [atomic_num_dict[k] for k in r_max.keys()]
+    for i in set(atomic_numbers):
+        assert i in atom_species_num
+    r_map = np.zeros(max(atom_species_num))
+    for k, v in r_max.items():
+        r_map[atomic_num_dict[k]-1] = v
+    edge_length_max = 0.5 * (r_map[atomic_numbers[edge_index[0]]-1] + r_map[atomic_numbers[edge_index[1]]-1])
+    r_mask = edge_length <= edge_length_max
+    if any(~r_mask):
+        edge_index = edge_index[:, r_mask]
+        shifts = shifts[r_mask]
+
+    return edge_index, shifts
@@ -0,0 +1,178 @@
+"""Neighbor search backends of ``neighbor_list_and_relative_vec``.
+
+A backend is called as ``backend(pbc, cell, positions, cutoff, self_interaction)`` and returns the
+``(i, j, S)`` arrays of ``ase.neighborlist.primitive_neighbor_list(quantities="ijS")``: the bonds
+with ``|positions[j] - positions[i] + S @ cell| < cutoff``, in both directions. The bond lengths are
+computed with the same expression as ase, so all the backends return the same set of bonds; only
+their order differs.
+
+The cell list and cKDTree backends also accept a per-atom ``cutoff`` array, a bond then being kept
+if it is shorter than the largest cutoff and not longer than the mean cutoff of its two atoms.
+"""
+import itertools
+
+import ase.neighborlist
+import numpy as np
+from scipy.spatial import cKDTree
+
+from dftio.register import Register
+
+neighbor_backends = Register()
+
+
+def get_neighbor_backend(name):
+    if name not in neighbor_backends:
+        raise ValueError(f"Neighbor search backend {name} is not registered, "
+                         f"available: {list(neighbor_backends.keys())}.")
+    return neighbor_backends[name]
+
+
+@neighbor_backends.register("ase")
+def ase_neighbor_list(pbc, cell, positions, cutoff, self_interaction=False):
+    return ase.neighborlist.primitive_neighbor_list(
+        "ijS",
+        pbc,
+        cell,
+        positions,
+        cutoff=float(cutoff),
+        self_interaction=self_interaction,
+        use_scaled_positions=False,
+    )
+
+
+def _split_cutoff(cutoff, natoms):
+    """The largest cutoff and the per-atom cutoffs, None for a single cutoff."""
+    if np.ndim(cutoff) == 0:
+        return float(cutoff), None
+    radii = np.asarray(cutoff, dtype=np.float64).reshape(natoms)
+    return float(radii.max()) if natoms > 0 else 0., radii
+
+
+def _wrap(pbc, cell, positions):
+    """Fractional coordinates wrapped into the cell along the periodic directions.
+
+    Returns the wrapped fractional coordinates, the integer shifts removed by the wrapping and the
+    heights of the cell, i.e. the distances between its opposite faces.
+    """
+    frac = np.linalg.solve(cell.T, positions.T).T
+    shift0 = np.zeros(frac.shape, dtype=np.int64)
+    for c in range(3):
+        if pbc[c]:
+            shift0[:, c] = np.floor(frac[:, c]).astype(np.int64)
+            frac[:, c] -= shift0[:, c]
+    volume = abs(np.linalg.det(cell))
+    heights = np.array([volume / np.linalg.norm(np.cross(cell[(c + 1) % 3], cell[(c + 2) % 3])) for c in range(3)])
+    return frac, shift0, heights
+
+
+def _finalize(pbc, cell, positions, i, j, S, shift0, rc, radii, self_interaction):
+    """Turn the shifts of the wrapped atoms into shifts of the input positions, and select the bonds by length."""
+    S = S + shift0[i] - shift0[j]
+    if not self_interaction:
+        keep = (i != j) | np.any(S != 0, axis=1)
+        i, j, S = i[keep], j[keep], S[keep]
+    # the bond lengths as computed by ase.neighborlist.primitive_neighbor_list
+    distance_vector = positions[j] - positions[i] + S.dot(cell)
+    distance = np.sqrt(np.sum(distance_vector * distance_vector, axis=1))
+    keep = distance < rc
+    if radii is not None:
+        keep &= distance <= 0.5 * (radii[i] + radii[j])
+    i, j, S = i[keep], j[keep], S[keep]
+    order = np.lexsort((S[:, 2], S[:, 1], S[:, 0], j, i))
+    return i[order], j[order], S[order]
+
+
+@neighbor_backends.register("cell_list")
+def cell_list_neighbor_list(pbc, cell, positions, cutoff, self_interaction=False):
+    """Vectorized cell list (binning) neighbor search, for orthogonal and triclinic cells.
+
+    The atoms are binned along the fractional coordinates with bins not thinner than the cutoff, and
+    each bin is paired with the bins, or periodic images of bins, within reach of the cutoff. The loop
+    runs over the few bin offsets, the pairs of all the atoms are built at once for each offset.
+    """
+    positions = np.asarray(positions)
+    cell = np.asarray(cell, dtype=np.float64)
+    natoms = len(positions)
+    rc, radii = _split_cutoff(cutoff, natoms)
+    if natoms == 0 or rc <= 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros((0, 3), dtype=int)
+    frac, shift0, heights = _wrap(pbc, cell, positions.astype(np.float64))
+
+    # bins of the fractional coordinates, and the reach of the cutoff in bins
+    nbins = np.ones(3, dtype=np.int64)
+    origin = np.zeros(3)
+    reach = np.zeros(3, dtype=np.int64)
+    for c in range(3):
+        if pbc[c]:
+            nbins[c] = max(1, int(heights[c] // rc))
+            reach[c] = int(np.ceil(rc * nbins[c] / heights[c]))
+        else:
+            width = rc / heights[c]
+            origin[c] = frac[:, c].min()
+            nbins[c] = int((frac[:, c].max() - origin[c]) // width) + 1
+            reach[c] = 1 if nbins[c] > 1 else 0
+    scale = np.where(pbc, nbins, heights / rc)
+    bin_ic = np.floor((frac - origin) * scale).astype(np.int64)
+    bin_ic = np.clip(bin_ic, 0, nbins - 1)
+    bin_i = (bin_ic[:, 0] * nbins[1] + bin_ic[:, 1]) * nbins[2] + bin_ic[:, 2]
+
+    order = np.argsort(bin_i, kind="stable")
+    counts = np.bincount(bin_i, minlength=int(np.prod(nbins)))
+    starts = np.cumsum(counts) - counts
+
+    pairs_i, pairs_j, pairs_S = [], [], []
+    atoms = np.arange(natoms)
+    for offset in itertools.product(*[range(-r, r + 1) for r in reach]):
+        neighbor_ic = bin_ic + np.asarray(offset)
+        S = np.zeros((natoms, 3), dtype=np.int64)
+        valid = np.ones(natoms, dtype=bool)
+        for c in range(3):
+            if pbc[c]:
+                S[:, c], neighbor_ic[:, c] = np.divmod(neighbor_ic[:, c], nbins[c])
+            else:
+                valid &= (neighbor_ic[:, c] >= 0) & (neighbor_ic[:, c] < nbins[c])
+        centers = atoms[valid]
+        neighbor_i = (neighbor_ic[valid, 0] * nbins[1] + neighbor_ic[valid, 1]) * nbins[2] + neighbor_ic[valid, 2]
+        ncandidates = counts[neighbor_i]
+        total = int(ncandidates.sum())
+        if total == 0:
+            continue
+        local = np.arange(total) - np.repeat(np.cumsum(ncandidates) - ncandidates, ncandidates)
+        i = np.repeat(centers, ncandidates)
+        j = order[np.repeat(starts[neighbor_i], ncandidates) + local]
+        S = np.repeat(S[valid], ncandidates, axis=0)
+        # prune with the wrapped coordinates before the exact test of _finalize
+        distance_vector = (frac[j] + S - frac[i]).dot(cell)
+        keep = np.einsum("ij,ij->i", distance_vector, distance_vector) < (rc * (1 + 1e-8)) ** 2
+        pairs_i.append(i[keep])
+        pairs_j.append(j[keep])
+        pairs_S.append(S[keep])
+
+    if not pairs_i:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros((0, 3), dtype=int)
+    return _finalize(pbc, cell, positions, np.concatenate(pairs_i), np.concatenate(pairs_j),
+                     np.concatenate(pairs_S), shift0, rc, radii, self_interaction)
+
+
+@neighbor_backends.register("kdtree")
+def kdtree_neighbor_list(pbc, cell, positions, cutoff, self_interaction=False):
+    """cKDTree neighbor search over the periodic images of the atoms within reach of the cutoff."""
+    positions = np.asarray(positions)
+    cell = np.asarray(cell, dtype=np.float64)
+    natoms = len(positions)
+    rc, radii = _split_cutoff(cutoff, natoms)
+    if natoms == 0 or rc <= 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros((0, 3), dtype=int)
+    frac, shift0, heights = _wrap(pbc, cell, positions.astype(np.float64))
+    wrapped = frac.dot(cell)
+
+    reach = [int(np.ceil(rc / heights[c])) if pbc[c] else 0 for c in range(3)]
+    image_shifts = np.array(list(itertools.product(*[range(-r, r + 1) for r in reach])), dtype=np.int64)
+    images = (wrapped[None, :, :] + image_shifts.dot(cell)[:, None, :]).reshape(-1, 3)
+
+    pairs = cKDTree(wrapped).sparse_distance_matrix(
+        cKDTree(images), rc * (1 + 1e-8), output_type="ndarray")
+    i = pairs["i"].astype(np.int64)
+    j = pairs["j"] % natoms
+    S = image_shifts[pairs["j"] // natoms]
+    return _finalize(pbc, cell, positions, i, j, S, shift0, rc, radii, self_interaction)
@@ -29,6 +29,11 @@ class PrimitiveFieldsNeighborList:
     ----------
     nupdates : int
         Number of updated times.
+    indptr, indices, offsets : np.ndarray
+        The neighbors in CSR format, the atom indices and cell offsets of grid g are
+        indices[indptr[g]:indptr[g+1]] and offsets[indptr[g]:indptr[g+1]].
+    neighbors, displacements : list of np.ndarray
+        The same neighbors as per-grid lists, built from the CSR arrays when accessed.
     """
 
     def __init__(self, cutoffs, skin=0.0, sorted=False, use_scaled_positions=False):
@@ -98,8 +103,11 @@ class PrimitiveFieldsNeighborList:
 
         self.nneighbors = 0
         self.npbcneighbors = 0
-        self.neighbors = [np.empty(0, int) for _ in range(ngrids)]
-        self.displacements = [np.empty((0, 3), int) for _ in range(ngrids)]
+        # the neighbors in CSR format: the atoms of grid g are indices[indptr[g]:indptr[g+1]]
+        # and their cell offsets are offsets[indptr[g]:indptr[g+1]]
+        self.indptr = np.zeros(ngrids + 1, dtype=int)
+        self.indices = np.empty(0, dtype=int)
+        self.offsets = np.empty((0, 3), dtype=int)
         self.nupdates += 1
         if ngrids == 0 or natoms == 0:
             return
@@ -115,59 +123,59 @@ class PrimitiveFieldsNeighborList:
                 n = 0
             N.append(n)
 
-        tree = cKDTree(positions, copy_data=True)
+        grid_tree = cKDTree(grid_positions, copy_data=True)
         offsets = cell.scaled_positions(positions - positions0)
         offsets = offsets.round().astype(int)
 
         grid_offsets = cell.scaled_positions(grid_positions - grids0)
         grid_offsets = grid_offsets.round().astype(int)
 
-        for n1, n2, n3 in itertools.product(range(-N[0], N[0] + 1),
-                                            range(-N[1], N[1] + 1),
-                                            range(-N[2], N[2] + 1)):
+        grid_index, atom_index, image_index, disps = [], [], [], []
+        for image, (n1, n2, n3) in enumerate(itertools.product(range(-N[0], N[0] + 1),
+                                                               range(-N[1], N[1] + 1),
+                                                               range(-N[2], N[2] + 1))):
             # if n1 == 0 and (n2 < 0 or n2 == 0 and n3 < 0):
             #     continue
 
             displacement = (n1, n2, n3) @ rcell
-            for g in range(ngrids):
-
-                indices = tree.query_ball_point(grid_positions[g] - displacement,
-                                                r=rcmax)
-                if not len(indices):
-                    continue
-
-                indices = np.array(indices)
-                delta = positions[indices] + displacement - grid_positions[g]
-                cutoffs = self.cutoffs[indices]
-                
-                i = indices[np.linalg.norm(delta, axis=1) < cutoffs]
-
-                self.nneighbors += len(i)
-                self.neighbors[g] = np.concatenate((self.neighbors[g], i))
-
-                disp = (n1, n2, n3) @ op + offsets[i] - grid_offsets[g]
-                self.npbcneighbors += disp.any(1).sum()
-                self.displacements[g] = np.concatenate((self.displacements[g],
-                                                        disp))
-                # rel_pos = positions[i] - self.grids[g] + disp @ cell.array
-                # print(np.linalg.norm(rel_pos, axis=-1), np.linalg.norm(delta, axis=1))
+            # all the (atom, grid) pairs of this image at once, the tolerance keeps the pairs at the
+            # cutoff that the kd-tree may round away, they are tested below as in the per-grid search
+            pairs = cKDTree(positions + displacement).sparse_distance_matrix(
+                grid_tree, rcmax * (1 + 1e-8), output_type="ndarray")
+            if not len(pairs):
+                continue
+
+            i, g = pairs["i"].astype(int), pairs["j"].astype(int)
+            delta = positions[i] + displacement - grid_positions[g]
+            mask = np.linalg.norm(delta, axis=1) < self.cutoffs[i]
+            i, g = i[mask], g[mask]
+
+            grid_index.append(g)
+            atom_index.append(i)
+            image_index.append(np.full(len(i), image))
+            disps.append((n1, n2, n3) @ op + offsets[i] - grid_offsets[g])
+
+        if not grid_index:
+            return
 
+        grid_index = np.concatenate(grid_index)
+        atom_index = np.concatenate(atom_index)
+        disps = np.concatenate(disps).astype(int)
         if self.sorted:
-            for g in range(ngrids):
-                # sort first by neighbors and then offsets
-                keys = (
-                    self.displacements[g][:, 2],
-                    self.displacements[g][:, 1],
-                    self.displacements[g][:, 0],
-                    self.neighbors[g],
-                )
-                mask = np.lexsort(keys)
-                self.neighbors[g] = self.neighbors[g][mask]
-                self.displacements[g] = self.displacements[g][mask]
+            # sort first by neighbors and then offsets
+            order = np.lexsort((disps[:, 2], disps[:, 1], disps[:, 0], atom_index, grid_index))
+        else:
+            # the neighbors of each grid image by image, then by atom index
+            order = np.lexsort((atom_index, np.concatenate(image_index), grid_index))
+        self.indices = atom_index[order]
+        self.offsets = disps[order]
+        self.indptr[1:] = np.cumsum(np.bincount(grid_index, minlength=ngrids))
+        self.nneighbors = len(atom_index)
+        self.npbcneighbors = int(disps.any(1).sum())
 
 
     def get_neighbors(self, g):
-        """Return neighbors of atom number a.
+        """Return neighbors of grid number g.
 
         A list of indices and offsets to neighboring atoms is
         returned.  The positions of the neighbor atoms can be
@@ -191,4 +199,20 @@ class PrimitiveFieldsNeighborList:
         then get_neighbors(b) will not return a as a neighbor - unless
         bothways=True was used."""
 
-        return self.neighbors[g], self.displacements[g]
\ No newline at end of file
+        return (self.indices[self.indptr[g]:self.indptr[g + 1]],
+                self.offsets[self.indptr[g]:self.indptr[g + 1]])
+
+    @property
+    def neighbors(self):
+        """The atom indices of the neighbors of every grid, a list of arrays built from the CSR arrays."""
+        return np.split(self.indices, self.indptr[1:-1])
+
+    @property
+    def displacements(self):
+        """The cell offsets of the neighbors of every grid, a list of (n, 3) arrays built from the CSR arrays."""
+        return np.split(self.offsets, self.indptr[1:-1])
+
+    def get_pairs(self):
+        """Return the grid index, the atom index and the offsets of all the (grid, atom) pairs, grid by grid."""
+        grid_index = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        return grid_index, self.indices, self.offsets
\ No newline at end of file
@@ -0,0 +1,120 @@
+import os
+import mmap
+import functools
+import numpy as np
+
+_DIMENSION_TAG = b"Matrix Dimension of"
+_COMPLEX_TABLE = bytes.maketrans(b"(,)", b"   ")
+
+
+@functools.lru_cache(maxsize=64)
+def _index_csr_file(path, size, mtime):
+    """Map every STEP of an ABACUS CSR file to the byte offset of its "Matrix Dimension" header.
+
+    The (size, mtime) arguments are only part of the cache key, so that a file is indexed
+    once however many times it is opened, and re-indexed when it changes.
+    """
+    offsets = {}
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = mm.find(_DIMENSION_TAG)
+        while pos != -1:
+            # the header is preceded by "STEP: k" since ABACUS 3.0, older files hold a single step
+            prev_start = mm.rfind(b"\n", 0, max(pos - 1, 0)) + 1
+            prev_line = mm[prev_start:pos].strip() if pos > 0 else b""
+            if prev_line.startswith(b"STEP"):
+                step = int(prev_line.split()[-1])
+            else:
+                step = 0
+            if step in offsets:
+                raise ValueError(f"STEP {step} appears more than once in {path}")
+            offsets[step] = pos
+            pos = mm.find(_DIMENSION_TAG, pos + len(_DIMENSION_TAG))
+    return offsets
+
+
+class CSRFileReader:
+    """Memory-mapped reader of ABACUS ``data-*R-sparse_SPIN*.csr`` files.
+
+    The STEP headers are indexed in one pass when the file is opened, so that the matrices
+    of any step can be decoded directly. The value, column and row pointer lines are
+    decoded in bulk from their split tokens, complex values written as "(re,im)" are read as
+    float pairs and viewed as complex numbers.
+
+    Examples
+    --------
+    >>> with CSRFileReader("OUT.ABACUS/data-HR-sparse_SPIN0.csr") as reader:
+    ...     norbits, matrices = reader.read_step(0)
+    ...     for R, data, indices, indptr in matrices:
+    ...         pass
+    """
+
+    def __init__(self, path, spinful=False):
+        self.path = path
+        self.spinful = spinful
+        stat = os.stat(path)
+        self._offsets = _index_csr_file(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = None
+
+    @property
+    def steps(self):
+        return sorted(self._offsets.keys())
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __iter__(self):
+        for step in self.steps:
+            yield step, self.read_step(step)
+
+    def read_step(self, step=0):
+        """Decode all the matrices of one step.
+
+        Returns
+        -------
+        norbits : int
+            The dimension of the matrices.
+        matrices : list
+            A list of (R, data, indices, indptr) tuples, one for each R with nonzero elements.
+        """
+        if step not in self._offsets:
+            raise ValueError(f"STEP {step} is not found in {self.path}")
+        mm = self._mm
+        mm.seek(self._offsets[step])
+        norbits = int(mm.readline().split()[-1]) # "Matrix Dimension of ..."
+        nR = int(mm.readline().split()[-1]) # "Matrix number of ..."
+
+        matrices = []
+        for _ in range(nR):
+            line = mm.readline().split()
+            R, nnz = np.array(line[:3], dtype=int), int(line[3])
+            if nnz == 0:
+                continue
+            data = self._decode_values(mm.readline())
+            indices = np.array(mm.readline().split(), dtype=np.int64)
+            indptr = np.array(mm.readline().split(), dtype=np.int64)
+            if len(data) != nnz or len(indices) != nnz or len(indptr) != norbits + 1:
+                raise ValueError(f"Corrupted CSR record of R = {R.tolist()} at STEP {step} in {self.path}")
+            matrices.append((R, data, indices, indptr))
+
+        return norbits, matrices
+
+    def _decode_values(self, line):
+        if not self.spinful:
+            return np.array(line.split(), dtype=np.float64).astype(np.float32)
+        pairs = np.array(line.translate(_COMPLEX_TABLE).split(), dtype=np.float64)
+        if len(pairs) % 2 != 0:
+            raise ValueError(f"Corrupted complex values in {self.path}: {len(pairs)} is not a number of (re,im) pairs.")
+        return pairs.view(np.complex128).astype(np.complex64)
@@ -10,8 +10,11 @@ import dpdata
 import os
 import numpy as np
 from dftio.io.parse import Parser, ParserRegister, find_target_line
+from dftio.io.abacus.abacus_csr import CSRFileReader
+from dftio.io.csr_blocks import CSRBlockExtractor
 from dftio.data import _keys
 from dftio.register import Register
+from dftio.utils import LazyList
 import lmdb
 import logging
 import glob
@@ -27,14 +30,19 @@ class AbacusParser(Parser):
             self,
             root,
             prefix,
+            cache_size: int = 8,
             **kwargs
             ):
-        super(AbacusParser, self).__init__(root, prefix)
-        mode = self.get_mode(idx=0)
-        if mode in ['nscf', "scf"]:
-            self.raw_sys = [dpdata.System(read(os.path.join(self._get_output_dir(idx), "STRU.cif")), fmt="ase/structure") for idx in range(len(self.raw_datas))]
+        super(AbacusParser, self).__init__(root, prefix, **kwargs)
+        self.mode = self.get_mode(idx=0)
+        # the systems are read when first needed, and the last cache_size of them are kept.
+        self.raw_sys = LazyList(self._read_sys, len(self.raw_datas), maxsize=cache_size)
+
+    def _read_sys(self, idx):
+        if self.mode in ['nscf', "scf"]:
+            return dpdata.System(read(os.path.join(self._get_output_dir(idx), "STRU.cif")), fmt="ase/structure")
         else:
-            self.raw_sys = [dpdata.LabeledSystem(self.raw_datas[idx], fmt='abacus/'+self.get_mode(idx)) for idx in range(len(self.raw_datas))]
+            return dpdata.LabeledSystem(self.raw_datas[idx], fmt='abacus/'+self.get_mode(idx))
 
     def _get_output_dir(self, idx):
         """
@@ -182,11 +190,28 @@ class AbacusParser(Parser):
     
     # essential
     def get_blocks(self, idx, hamiltonian=True, overlap=False, density_matrix=False):
+        hamiltonian_dict = [] if hamiltonian else None
+        overlap_dict = [] if overlap else None
+        density_matrix_dict = [] if density_matrix else None
+        for ham, ovp, dm in self.iter_blocks(idx, hamiltonian, overlap, density_matrix):
+            if hamiltonian:
+                hamiltonian_dict.append(ham)
+            if overlap:
+                overlap_dict.append(ovp)
+            if density_matrix:
+                density_matrix_dict.append(dm)
+
+        return hamiltonian_dict, overlap_dict, density_matrix_dict
+
+    def iter_blocks(self, idx, hamiltonian=True, overlap=False, density_matrix=False):
+        """Yield the (hamiltonian, overlap, density_matrix) block dicts frame by frame.
+
+        For MD trajectories dumped into a single CSR file, each of the HR, SR and DMR files
+        is opened once and its STEP headers are indexed once, so that the frames are decoded
+        sequentially instead of rescanning the file from the top for every frame.
+        """
         mode = self.get_mode(idx)
-        logfile = "running_"+mode+".log"
-        hamiltonian_dict, overlap_dict, density_matrix_dict = None, None, None
         sys = self.raw_sys[idx]
-        nsites = sys.data["atom_types"].shape[0]
         output_dir = self._get_output_dir(idx)
         if os.path.exists(os.path.join(output_dir, "hscsr.tgz")):
             # os.system(f"tar -xzf {os.path.join(output_dir, 'hscsr.tgz')} -C {os.path.join(self.raw_datas[idx])}")
@@ -194,6 +219,68 @@ class AbacusParser(Parser):
                 ["tar", "-xzf", os.path.join(output_dir, 'hscsr.tgz'), "-C", os.path.join(self.raw_datas[idx])],
                 check=True
             )
+        site_norbits, orbital_types_dict, element, spinful = self._get_site_orbitals(idx, hamiltonian, overlap)
+        extractor = CSRBlockExtractor(
+            site_norbits=site_norbits,
+            element=element,
+            orbital_types_dict=orbital_types_dict,
+            orbital_transform=ABACUS2DFTIO,
+            spinful=spinful
+            )
+
+        if mode in ["scf", "nscf"]:
+            nframes = 1
+            per_frame_files = False
+        elif mode == "md":
+            nframes = sys.get_nframes()
+            per_frame_files = os.path.exists(os.path.join(output_dir, "matrix/"))
+        else:
+            raise NotImplementedError("mode {} is not supported.".format(mode))
+
+        matrices = [
+            ("HR", hamiltonian, 13.605698), # Ryd2eV
+            ("SR", overlap, 1),
+            ("DMR", density_matrix, 1)
+        ]
+        readers = {}
+        try:
+            if not per_frame_files:
+                for name, required, _ in matrices:
+                    if required:
+                        readers[name] = CSRFileReader(os.path.join(output_dir, f"data-{name}-sparse_SPIN0.csr"), spinful=spinful)
+
+            for i in range(nframes):
+                frame = []
+                for name, required, factor in matrices:
+                    if not required:
+                        frame.append(None)
+                        continue
+                    if per_frame_files:
+                        with CSRFileReader(os.path.join(output_dir, f"matrix/{i}_data-{name}-sparse_SPIN0.csr"), spinful=spinful) as reader:
+                            norbits, csr = reader.read_step(0)
+                    else:
+                        norbits, csr = readers[name].read_step(i if mode == "md" else 0)
+                    assert norbits == int(np.sum(site_norbits)) * (1 + spinful)
+
+                    blocks = {}
+                    for R_cur, values, indices, indptr in csr:
+                        extractor.extract(data=values, indices=indices, indptr=indptr, R=R_cur, factor=factor, out=blocks)
+                    if name == "SR" and spinful:
+                        blocks = {k: v[:v.shape[0] // 2, :v.shape[1] // 2].real for k, v in blocks.items()}
+                    frame.append(blocks)
+
+                yield tuple(frame)
+        finally:
+            for reader in readers.values():
+                reader.close()
+
+    def _get_site_orbitals(self, idx, hamiltonian=True, overlap=False):
+        """Read the orbitals of each site and the spin setting from the ABACUS log file."""
+        mode = self.get_mode(idx)
+        logfile = "running_"+mode+".log"
+        sys = self.raw_sys[idx]
+        nsites = sys.data["atom_types"].shape[0]
+        output_dir = self._get_output_dir(idx)
         with open(os.path.join(output_dir, logfile), 'r') as f:
             site_norbits_dict = {}
             orbital_types_dict = {}
@@ -254,213 +341,28 @@ class AbacusParser(Parser):
                 else:
                     raise ValueError(f'{line} is not supported')
 
-        if mode in ["scf", "nscf"]:
-            if hamiltonian:
-                hamiltonian_dict, tmp = self.parse_matrix(
-                    matrix_path=os.path.join(output_dir, "data-HR-sparse_SPIN0.csr"), 
-                    nsites=nsites,
-                    site_norbits=site_norbits,
-                    orbital_types_dict=orbital_types_dict,
-                    element=element,
-                    factor=13.605698, # Ryd2eV
-                    spinful=spinful
-                    )
-                assert tmp == int(np.sum(site_norbits)) * (1 + spinful)
-                hamiltonian_dict = [hamiltonian_dict]
-            
-            if overlap:
-                overlap_dict, tmp = self.parse_matrix(
-                    matrix_path=os.path.join(output_dir, "data-SR-sparse_SPIN0.csr"), 
-                    nsites=nsites,
-                    site_norbits=site_norbits,
-                    orbital_types_dict=orbital_types_dict,
-                    element=element,
-                    factor=1,
-                    spinful=spinful
-                    )
-                assert tmp == int(np.sum(site_norbits)) * (1 + spinful)
-
-                if spinful:
-                    overlap_dict_spinless = {}
-                    for k, v in overlap_dict.items():
-                        overlap_dict_spinless[k] = v[:v.shape[0] // 2, :v.shape[1] // 2].real
-                    overlap_dict_spinless, overlap_dict = overlap_dict, overlap_dict_spinless
-
-                overlap_dict = [overlap_dict]
-
-            if density_matrix:
-                density_matrix_dict, tmp = self.parse_matrix(
-                    matrix_path=os.path.join(output_dir, "data-DMR-sparse_SPIN0.csr"), 
-                    nsites=nsites,
-                    site_norbits=site_norbits,
-                    orbital_types_dict=orbital_types_dict,
-                    element=element,
-                    factor=1,
-                    spinful=spinful
-                    )
-                assert tmp == int(np.sum(site_norbits)) * (1 + spinful)
-
-                density_matrix_dict = [density_matrix_dict]
-
-        elif mode == "md":
-            if hamiltonian:
-                hamiltonian_dict = []
-                for i in range(sys.get_nframes()):
-                    if os.path.exists(os.path.join(output_dir, "matrix/")):
-                        hamil, tmp = self.parse_matrix(
-                            matrix_path=os.path.join(output_dir, "matrix/"+str(i)+"_data-HR-sparse_SPIN0.csr"), 
-                            nsites=nsites,
-                            site_norbits=site_norbits,
-                            orbital_types_dict=orbital_types_dict,
-                            element=element,
-                            factor=13.605698, # Ryd2eV
-                            spinful=spinful
-                            )
-                    else:
-                        hamil, tmp = self.parse_matrix(
-                            matrix_path=os.path.join(output_dir, "data-HR-sparse_SPIN0.csr"), 
-                            nsites=nsites,
-                            site_norbits=site_norbits,
-                            orbital_types_dict=orbital_types_dict,
-                            element=element,
-                            factor=13.605698, # Ryd2eV
-                            spinful=spinful,
-                            step=i
-                            )
-                    assert tmp == int(np.sum(site_norbits)) * (1 + spinful)
-                    hamiltonian_dict.append(hamil)
-
-            if overlap:
-                overlap_dict = []
-                for i in range(sys.get_nframes()):
-                    if os.path.exists(os.path.join(output_dir, "matrix/")):
-                        ovp, tmp = self.parse_matrix(
-                            matrix_path=os.path.join(output_dir, "matrix/"+str(i)+"_data-SR-sparse_SPIN0.csr"), 
-                            nsites=nsites,
-                            site_norbits=site_norbits,
-                            orbital_types_dict=orbital_types_dict,
-                            element=element,
-                            factor=1,
-                            spinful=spinful
-                            )
-                    else:
-                        ovp, tmp = self.parse_matrix(
-                            matrix_path=os.path.join(output_dir, "data-SR-sparse_SPIN0.csr"), 
-                            nsites=nsites,
-                            site_norbits=site_norbits,
-                            orbital_types_dict=orbital_types_dict,
-                            element=element,
-                            factor=1,
-                            spinful=spinful,
-                            step=i
-                            )
-                    assert tmp == int(np.sum(site_norbits)) * (1 + spinful)
-
-                    if spinful:
-                        ovp_spinless = {}
-                        for k, v in ovp.items():
-                            ovp_spinless[k] = v[:v.shape[0] // 2, :v.shape[1] // 2].real
-
-                        ovp_spinless, ovp = ovp, ovp_spinless
-                    overlap_dict.append(ovp)
-            
-            if density_matrix:
-                density_matrix_dict = []
-                for i in range(sys.get_nframes()):
-                    if os.path.exists(os.path.join(output_dir, "matrix/")):
-                        dm, tmp = self.parse_matrix(
-                            matrix_path=os.path.join(output_dir, "matrix/"+str(i)+"_data-DMR-sparse_SPIN0.csr"), 
-                            nsites=nsites,
-                            site_norbits=site_norbits,
-                            orbital_types_dict=orbital_types_dict,
-                            element=element,
-                            factor=1,
-                            spinful=spinful
-                            )
-                    else:
-                        dm, tmp = self.parse_matrix(
-                            matrix_path=os.path.join(output_dir, "data-DMR-sparse_SPIN0.csr"), 
-                            nsites=nsites,
-                            site_norbits=site_norbits,
-                            orbital_types_dict=orbital_types_dict,
-                            element=element,
-                            factor=1,
-                            spinful=spinful,
-                            step=i
-                            )
-
-                    assert tmp == int(np.sum(site_norbits)) * (1 + spinful)
-                    density_matrix_dict.append(dm)
-        else:
-            raise NotImplementedError("mode {} is not supported.".format(mode))
-        
-        return hamiltonian_dict, overlap_dict, density_matrix_dict
+        return site_norbits, orbital_types_dict, element, spinful
 
     def parse_matrix(self, matrix_path, nsites, site_norbits, orbital_types_dict, element, factor, spinful=False, step=0):
-        site_norbits_cumsum = np.cumsum(site_norbits)
-        norbits = int(np.sum(site_norbits))
         matrix_dict = dict()
-        with open(matrix_path, 'r') as f:
-            line = f.readline() # read "Matrix Dimension of ..."
-            if not "Matrix Dimension of" in line:
-                """In this case, the starting of the file is STEP 0"""
-                # find the correct step
-                step_found = False
-                while line and not step_found:
-                    if "STEP" in line:
-                        stp = int(line.split()[-1])
-                        if stp != step:
-                            line = f.readline()
-                        else:
-                            step_found = True
-                    else:
-                        line = f.readline()
-                line = f.readline() # ABACUS >= 3.0
-                assert "Matrix Dimension of" in line
-            else:
-                assert step == 0
-            f.readline() # read "Matrix number of ..."
-            norbits = int(line.split()[-1])
-            for line in f:
-                line1 = line.split()
-                if len(line1) == 0 or len(line1) == 2:
-                    break
-                num_element = int(line1[3])
-                if num_element != 0:
-                    R_cur = np.array(line1[:3]).astype(int)
-                    line2 = f.readline().split()
-                    line3 = f.readline().split()
-                    line4 = f.readline().split()
-                    if not spinful:
-                        hamiltonian_cur = csr_matrix((np.array(line2).astype(np.float32), np.array(line3).astype(int),
-                                                        np.array(line4).astype(np.int32)), shape=(norbits, norbits), dtype=np.float32).toarray()
-                    else:
-                        line2 = np.char.replace(line2, '(', '')
-                        line2 = np.char.replace(line2, ')', 'j')
-                        line2 = np.char.replace(line2, ',', '+')
-                        line2 = np.char.replace(line2, '+-', '-')
-                        hamiltonian_cur = csr_matrix((np.array(line2).astype(np.complex64), np.array(line3).astype(int),
-                                                    np.array(line4).astype(np.int32)), shape=(norbits, norbits), dtype=np.complex64).toarray()
-                    for index_site_i in range(nsites):
-                        for index_site_j in range(nsites):
-                            key_str = f"{index_site_i}_{index_site_j}_{R_cur[0]}_{R_cur[1]}_{R_cur[2]}"
-                            mat = hamiltonian_cur[(site_norbits_cumsum[index_site_i]
-                                                    - site_norbits[index_site_i]) * (1 + spinful):
-                                                    site_norbits_cumsum[index_site_i] * (1 + spinful),
-                                    (site_norbits_cumsum[index_site_j] - site_norbits[index_site_j]) * (1 + spinful):
-                                    site_norbits_cumsum[index_site_j] * (1 + spinful)]
-                            if abs(mat).max() < 1e-10:
-                                continue
-                            if not spinful:
-                                mat = self.transform(mat, orbital_types_dict[element[index_site_i]],
-                                                            orbital_types_dict[element[index_site_j]])
-                            else:
-                                mat = mat.reshape((site_norbits[index_site_i], 2, site_norbits[index_site_j], 2))
-                                mat = mat.transpose((1, 0, 3, 2)).reshape((2 * site_norbits[index_site_i],
-                                                                        2 * site_norbits[index_site_j]))
-                                mat = self.transform(mat, orbital_types_dict[element[index_site_i]] * 2,
-                                                        orbital_types_dict[element[index_site_j]] * 2)
-                            matrix_dict[key_str] = mat * factor
+        extractor = CSRBlockExtractor(
+            site_norbits=site_norbits,
+            element=element,
+            orbital_types_dict=orbital_types_dict,
+            orbital_transform=ABACUS2DFTIO,
+            spinful=spinful
+            )
+        with CSRFileReader(matrix_path, spinful=spinful) as reader:
+            norbits, matrices = reader.read_step(step)
+        for R_cur, values, indices, indptr in matrices:
+            extractor.extract(
+                data=values,
+                indices=indices,
+                indptr=indptr,
+                R=R_cur,
+                factor=factor,
+                out=matrix_dict
+                )
         return matrix_dict, norbits
     
     def transform(self, mat, l_lefts, l_rights):
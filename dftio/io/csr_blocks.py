@@ -0,0 +1,169 @@
+import numpy as np
+from scipy.linalg import block_diag
+from dftio.io.profiling import profiled
+
+
+class CSRBlockExtractor:
+    """Decompose sparse orbital matrices into atomic blocks.
+
+    Instead of densifying the matrix of every R vector and slicing all (i, j) site pairs,
+    the nonzeros of the sparse structure are mapped to their (site_i, site_j, R) block with
+    the ``site_norbits_cumsum`` offsets, scattered into one dense buffer per species pair,
+    and rotated into the dftio orbital convention with one batched matmul. Memory scales
+    with the number of nonzeros and of nonzero blocks.
+
+    Parameters
+    ----------
+    site_norbits : np.ndarray
+        Number of (spinless) orbitals of each site, shape (nsites,).
+    element : np.ndarray
+        Integer species of each site, e.g. the atomic number, shape (nsites,).
+    orbital_types_dict : dict
+        Angular momentum list of each species, e.g. {14: [0, 0, 1, 1, 2]}.
+    orbital_transform : dict
+        The {l: (2l+1, 2l+1) matrix} rotating the orbitals of the code into the dftio convention,
+        e.g. ABACUS2DFTIO or SIESTA2DFTIO in dftio.constants.
+    spinful : bool
+        Whether the matrices carry the spin degree of freedom (orbital-major, spin-minor).
+    threshold : float
+        Blocks whose largest absolute element is below threshold are dropped.
+    """
+
+    def __init__(self, site_norbits, element, orbital_types_dict, orbital_transform, spinful=False, threshold=1e-10):
+        self.site_norbits = np.asarray(site_norbits, dtype=int)
+        self.element = np.asarray(element, dtype=int)
+        self.orbital_types_dict = orbital_types_dict
+        self.spinful = spinful
+        self.threshold = threshold
+        self.nsites = len(self.site_norbits)
+        self._type_stride = int(self.element.max()) + 1
+
+        nspin = 1 + spinful
+        site_dim = self.site_norbits * nspin
+        site_start = np.cumsum(site_dim) - site_dim
+        self.norbits = int(site_dim.sum())
+        # orbital -> (site, local orbital index)
+        self.orbital_site = np.repeat(np.arange(self.nsites), site_dim)
+        self.orbital_local = np.arange(self.norbits) - site_start[self.orbital_site]
+
+        self.rotations = {}
+        for atom_type in np.unique(self.element):
+            l_list = orbital_types_dict[atom_type]
+            if max(l_list) > 5:
+                raise NotImplementedError("Only support l = s, p, d, f, g, h.")
+            if spinful:
+                l_list = l_list * 2
+            self.rotations[atom_type] = block_diag(*[orbital_transform[l] for l in l_list])
+
+    def extract(self, data, indices, indptr, R, factor=1., out=None):
+        """Extract the atomic blocks of the matrix at one R vector.
+
+        Parameters
+        ----------
+        data, indices, indptr : np.ndarray
+            The CSR arrays of the (norbits, norbits) matrix.
+        R : array-like of int
+            The lattice vector of the matrix.
+        factor : float
+            Unit conversion factor applied to every block.
+        out : dict, optional
+            The dict to be updated with the blocks, a new one is created if not provided.
+
+        Returns
+        -------
+        dict
+            Blocks with key "i_j_Rx_Ry_Rz", ordered by (i, j).
+        """
+        indptr = np.asarray(indptr, dtype=np.int64)
+        rows = np.repeat(np.arange(self.norbits), np.diff(indptr))
+        return self.extract_coo(data, rows, indices, cells=None, R_list=[R], factor=factor, out=out)
+
+    @profiled("transform")
+    def extract_coo(self, data, rows, cols, cells, R_list, factor=1., out=None):
+        """Extract the atomic blocks of the nonzeros of several R vectors at once.
+
+        The calls are the stage "transform" of dftio.io.profiling.
+
+        Parameters
+        ----------
+        data, rows, cols : np.ndarray
+            The values and the (row, column) orbital indices of the nonzeros, the columns are
+            orbital indices within the cell of R, i.e. in [0, norbits).
+        cells : np.ndarray or None
+            The position in R_list of the cell of each nonzero, None if all of them are in R_list[0].
+        R_list : array-like of int
+            The lattice vectors, shape (nR, 3).
+        factor : float
+            Unit conversion factor applied to every block.
+        out : dict, optional
+            The dict to be updated with the blocks, a new one is created if not provided.
+
+        Returns
+        -------
+        dict
+            Blocks with key "i_j_Rx_Ry_Rz", ordered by (i, j, position of R in R_list).
+        """
+        if out is None:
+            out = {}
+        data = np.asarray(data)
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        R_list = np.asarray(R_list, dtype=np.int64).reshape(-1, 3)
+        if len(data) == 0:
+            return out
+
+        nR = len(R_list)
+        pair = (self.orbital_site[rows] * self.nsites + self.orbital_site[cols]) * nR
+        if cells is not None:
+            pair += np.asarray(cells, dtype=np.int64)
+
+        # Within one CSR row the columns of a site are contiguous, so the pair ids are
+        # first collapsed into runs before sorting, which shrinks the sort by ~norb.
+        run_start = np.ones(len(pair), dtype=bool)
+        run_start[1:] = pair[1:] != pair[:-1]
+        pairs, run_inverse = np.unique(pair[run_start], return_inverse=True)
+        block_id = run_inverse[np.cumsum(run_start) - 1]
+
+        # a block is kept if any of its elements reaches the threshold
+        significant = np.zeros(len(pairs), dtype=bool)
+        significant[block_id[np.abs(data) >= self.threshold]] = True
+        if not significant.any():
+            return out
+        if not significant.all():
+            nz_mask = significant[block_id]
+            rows, cols, data = rows[nz_mask], cols[nz_mask], data[nz_mask]
+            block_id = (np.cumsum(significant) - 1)[block_id[nz_mask]]
+        kept_pairs = pairs[significant]
+
+        kept_cell = kept_pairs % nR
+        kept_i = kept_pairs // nR // self.nsites
+        kept_j = kept_pairs // nR % self.nsites
+        blocks = [None] * len(kept_pairs)
+        species_pair = self.element[kept_i] * self._type_stride + self.element[kept_j]
+        for sp in np.unique(species_pair):
+            sp_blocks = np.nonzero(species_pair == sp)[0]
+            ei, ej = self.element[kept_i[sp_blocks[0]]], self.element[kept_j[sp_blocks[0]]]
+            ni, nj = self.rotations[ei].shape[0], self.rotations[ej].shape[0]
+
+            local_block = -np.ones(len(kept_pairs), dtype=np.int64)
+            local_block[sp_blocks] = np.arange(len(sp_blocks))
+            sp_mask = local_block[block_id] >= 0
+            buffer = np.zeros((len(sp_blocks), ni, nj), dtype=data.dtype)
+            buffer[local_block[block_id[sp_mask]], self.orbital_local[rows[sp_mask]],
+                   self.orbital_local[cols[sp_mask]]] = data[sp_mask]
+
+            if self.spinful:
+                # (orbital, spin) ordering -> (spin, orbital) ordering
+                buffer = buffer.reshape(len(sp_blocks), ni // 2, 2, nj // 2, 2)
+                buffer = buffer.transpose(0, 2, 1, 4, 3).reshape(len(sp_blocks), ni, nj)
+
+            buffer = np.matmul(np.matmul(self.rotations[ei], buffer), self.rotations[ej].T)
+            buffer *= factor
+            for k, b in zip(sp_blocks, buffer):
+                blocks[k] = b
+
+        R_kept = R_list[kept_cell].tolist()
+        for i, j, (Rx, Ry, Rz), b in zip(kept_i.tolist(), kept_j.tolist(), R_kept, blocks):
+            out[f"{i}_{j}_{Rx}_{Ry}_{Rz}"] = b
+
+        return out
@@ -0,0 +1,103 @@
+import os
+import glob
+import fnmatch
+import re
+import logging
+log = logging.getLogger(__name__)
+
+
+def _matcher(prefix):
+    """Whether a directory entry matches the '*' + prefix + '*' pattern, hidden entries excluded as by glob."""
+    if any(c in prefix for c in '*?['):
+        pattern = re.compile(fnmatch.translate('*' + prefix + '*'))
+        return lambda name: not name.startswith('.') and pattern.match(name) is not None
+    return lambda name: prefix in name and not name.startswith('.')
+
+
+def scan_inputs(root, prefix, max_depth: int=0):
+    """Yield the paths under root whose name matches '*' + prefix + '*', streaming os.scandir.
+
+    Unlike glob, the entries of a directory are not listed into memory at once. The directories
+    that do not match are searched down to max_depth levels below root, the matching ones are
+    calculation folders and are not searched. The paths are yielded in directory order.
+
+    Parameters
+    ----------
+    root : str
+        The directory to search.
+    prefix : str
+        The prefix of the DFT calculation folders or files.
+    max_depth : int
+        The number of directory levels below root that are searched, 0 searches root only.
+    """
+    matches = _matcher(prefix)
+    with os.scandir(root) as entries:
+        subdirs = []
+        for entry in entries:
+            if matches(entry.name):
+                yield os.path.join(root, entry.name)
+            elif max_depth > 0 and not entry.name.startswith('.') and entry.is_dir():
+                subdirs.append(entry.path)
+    for subdir in subdirs:
+        yield from scan_inputs(subdir, prefix, max_depth=max_depth - 1)
+
+
+def read_file_list(path):
+    """Read the inputs listed in a file, one path per line, relative paths being relative to the file.
+
+    Empty lines and lines starting with '#' are skipped.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, 'r') as f:
+        paths = [line.strip() for line in f]
+    return [p if os.path.isabs(p) else os.path.join(base, p) for p in paths if p and not p.startswith('#')]
+
+
+def write_file_list(path, paths):
+    """Write the inputs one per line, through a temporary file so that readers never see a partial list."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        for p in paths:
+            f.write(p + '\n')
+    os.replace(tmp_path, path)
+
+
+def discover_inputs(root, prefix, max_depth: int=0, index_path=None):
+    """Find the DFT calculation inputs under root, sorted so that the index of every input is reproducible.
+
+    Parameters
+    ----------
+    root : str or list of str
+        A directory to search, a file listing the inputs one per line, or the list of inputs.
+    prefix : str
+        The prefix of the DFT calculation folders or files.
+    max_depth : int
+        The number of directory levels below root that are searched, 0 searches root only.
+    index_path : str, optional
+        A file holding the sorted inputs as absolute paths. It is read instead of searching root
+        when it exists, and written after the search otherwise, so that later runs and the workers
+        reuse it.
+
+    Returns
+    -------
+    list of str
+        The inputs, in the order given for a list or a file list, and sorted otherwise.
+    """
+    if isinstance(root, (list, tuple)):
+        return list(root)
+    if index_path is not None and os.path.exists(index_path):
+        log.info(f"Reading the inputs from the index {index_path}.")
+        return read_file_list(index_path)
+
+    if os.path.isfile(root):
+        paths = read_file_list(root)
+    elif '/' in prefix:
+        # a prefix holding a path spans several directory levels, which only glob matches
+        paths = sorted(glob.glob(os.path.join(root, '*' + prefix + '*')))
+    else:
+        paths = sorted(scan_inputs(root, prefix, max_depth=max_depth))
+
+    if index_path is not None:
+        paths = [os.path.abspath(p) for p in paths]
+        write_file_list(index_path, paths)
+    return paths
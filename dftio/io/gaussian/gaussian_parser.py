@@ -13,7 +13,7 @@ from dftio.io.gaussian.gaussian_conventions import orbital_sign_map
 @ParserRegister.register("gaussian")
 class GaussianParser(Parser):
     def __init__(self, root, prefix, convention_file=None, valid_gau_info_path=None, add_phase_transfer=False, **kwargs):
-        super(GaussianParser, self).__init__(root, prefix)
+        super(GaussianParser, self).__init__(root, prefix, **kwargs)
         self.add_phase_transfer = add_phase_transfer
         self.is_fixed_convention = False
         self.on_the_fly_convention_done = False
@@ -23,6 +23,8 @@ class GaussianParser(Parser):
                 self.convention = json.load(f)
         self.atomic_symbols = {}
         self.nbasis = {}
+        # byte offsets of the sections of each log, see index_gau_log
+        self.log_index = {}
         if valid_gau_info_path:
             self.raw_datas = get_gau_logs(valid_gau_info_path)
         else:
@@ -30,9 +32,14 @@ class GaussianParser(Parser):
                 for a_raw_datapath in self.raw_datas:
                     f.write(a_raw_datapath + '\n')
 
+    def get_log_index(self, idx):
+        if idx not in self.log_index:
+            self.log_index[idx] = index_gau_log(self.raw_datas[idx])
+        return self.log_index[idx]
+
     def get_structure(self, idx):
         file_path = self.raw_datas[idx]
-        nbasis, atoms = get_basic_info(file_path)
+        nbasis, atoms = get_basic_info(file_path, self.get_log_index(idx))
         self.atomic_symbols[idx] = atoms.symbols
         self.nbasis[idx] = nbasis
         structure = {
@@ -49,7 +56,7 @@ class GaussianParser(Parser):
     def get_basis(self, idx):
         if not self.is_fixed_convention:
             file_path = self.raw_datas[idx]
-            self.convention = get_convention(file_path)
+            self.convention = get_convention(file_path, index=self.get_log_index(idx))
             self.on_the_fly_convention_done = True
         return self.convention['atom_to_dftio_orbitals']
 
@@ -58,14 +65,14 @@ class GaussianParser(Parser):
 
         # Cache basic info
         if idx not in self.nbasis.keys():
-            self.nbasis[idx], atoms = get_basic_info(file_path)
+            self.nbasis[idx], atoms = get_basic_info(file_path, self.get_log_index(idx))
             self.atomic_symbols[idx] = atoms.symbols
         nbasis = self.nbasis[idx]
         atomic_symbols = self.atomic_symbols[idx]
 
         # Get convention if needed
         if not self.is_fixed_convention and not self.on_the_fly_convention_done:
-            self.convention = get_convention(file_path)
+            self.convention = get_convention(file_path, index=self.get_log_index(idx))
 
         # Generate indices
         molecule_transform_indices, atom_in_mo_indices = generate_molecule_transform_indices(
@@ -83,6 +90,7 @@ class GaussianParser(Parser):
                 orbital_sign_map=orbital_sign_map
             )
 
+        index = self.get_log_index(idx)
         results = []
         for matrix_type, should_compute in [
             ('ham', hamiltonian),
@@ -91,11 +99,11 @@ class GaussianParser(Parser):
         ]:
             if should_compute:
                 if matrix_type == 'ham':
-                    matrix = read_fock_from_gau_log(file_path, nbf=nbasis)
+                    matrix = read_fock_from_gau_log(file_path, nbf=nbasis, index=index)
                 elif matrix_type == 'overlap':
-                    matrix = read_int1e_from_gau_log(file_path, matrix_type=0, nbf=nbasis)
+                    matrix = read_int1e_from_gau_log(file_path, matrix_type=0, nbf=nbasis, index=index)
                 else:
-                    matrix = read_density_from_gau_log(file_path, nbf=nbasis)
+                    matrix = read_density_from_gau_log(file_path, nbf=nbasis, index=index)
 
                 matrix = transform_matrix(matrix=matrix, transform_indices=molecule_transform_indices)
 
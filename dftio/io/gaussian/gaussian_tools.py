@@ -1,5 +1,8 @@
 import glob
+import itertools
 import json
+import mmap
+import multiprocessing
 import os
 import re
 import shutil
@@ -12,51 +15,212 @@ from ase import Atoms, Atom
 
 from dftio.io.gaussian.gaussian_conventions import orbital_idx_map
 
+# The sections of a Gaussian log located by index_gau_log, as
+# name: (literal searched in the file, pattern the line of the literal must match).
+GAU_LOG_SECTIONS = {
+    'orientation': (b"Standard orientation:", None),
+    'nbasis': (b"NBasis", re.compile(rb"^\s*NBasis")),
+    'basis': (b"Standard basis:", re.compile(rb"^\s*Standard basis:")),
+    'overlap': (b"Overlap", re.compile(rb"\*+\s*Overlap\s*\*+")),
+    'kinetic': (b"Kinetic Energy", re.compile(rb"\*+\s*Kinetic Energy\s*\*+")),
+    'potential': (b"Potential Energy", re.compile(rb"\*+\s*Potential Energy\s*\*+")),
+    'fock': (b" Fock matrix", None),
+    'density': (b" Total density matrix:", None),
+    'populations': (b"Gross orbital populations:", None),
+    'termination': (b"Normal termination of Gaussian", None),
+}
+
+
+# The bytes at the end of a log searched first for the normal termination message.
+GAU_LOG_TAIL_SIZE = 4096
+
+
+def _find_section(buffer, name, start=0, first_only=False):
+    """The offsets of the header lines of section name in the mapped log from start."""
+    literal, pattern = GAU_LOG_SECTIONS[name]
+    offsets = []
+    pos = buffer.find(literal, start)
+    while pos >= 0:
+        line_start = buffer.rfind(b'\n', 0, pos) + 1
+        line_end = buffer.find(b'\n', pos)
+        line_end = len(buffer) if line_end < 0 else line_end
+        if pattern is None or pattern.search(buffer[line_start:line_end]):
+            offsets.append(line_start)
+            if first_only:
+                break
+        pos = buffer.find(literal, line_end)
+    return offsets
 
-def chk_valid_gau_log_unit(file_path, hamiltonian=False, overlap=False, density_matrix=False,
-                           is_fixed_convention=False):
-    required_patterns = [
-        r"Standard orientation:",
-        r"NBasis=",
-        r'Normal termination of Gaussian'
-    ]
+
+def index_gau_log(file_path):
+    """Locate the sections of interest of a Gaussian log, opened and memory mapped once.
+
+    The literal of every section is searched in the mapped file with bytes.find, one scan per
+    section of GAU_LOG_SECTIONS, so the hundreds of MB of a log are never split into python lines.
+    These scans are faster than a single one with a regex alternation of the literals, which
+    sre matches character by character.
+
+    Returns
+    -------
+    dict
+        {section name: byte offsets of the header lines of the section, in file order}
+    """
+    index = {name: [] for name in GAU_LOG_SECTIONS}
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return index
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for name in GAU_LOG_SECTIONS:
+                index[name] = _find_section(buffer, name)
+    return index
+
+
+def read_section_lines(file_path, offset, nlines=None):
+    """Read nlines lines from offset, the header line included, all the rest of the file if nlines is None."""
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        return [line.decode() for line in itertools.islice(f, nlines)]
+
+
+def read_lower_triangular(file_path, offset, nbf):
+    """Decode the symmetric matrix printed in 5-column lower-triangular blocks after the header line at offset.
+
+    The tokens of the whole section are parsed at once by numpy, the position of each matrix element
+    in the token stream being fixed by nbf.
+    """
+    n = (nbf + 4) // 5  # Equivalent to ceiling division
+    nlines = n + sum(nbf - 5 * i for i in range(n))
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        f.readline()
+        text = b''.join(itertools.islice(f, nlines))
+    tokens = text.replace(b'D', b'E').replace(b'd', b'e').split()
+
+    # Block i starts with the m column numbers, then each row j >= 5 * i holds its number
+    # and the min(j - 5 * i + 1, m) elements of the columns 5 * i, ... of the block.
+    rows, cols, positions = [], [], []
+    start = 0
+    for i in range(n):
+        k = 5 * i
+        m = min(5, nbf - k)
+        j = np.arange(k, nbf)
+        width = np.minimum(j - k + 1, m)
+        row_start = start + m + np.concatenate([[0], np.cumsum(width + 1)[:-1]]) + 1
+        row = np.repeat(j, width)
+        local = np.arange(width.sum()) - np.repeat(np.cumsum(width) - width, width)
+        rows.append(row)
+        cols.append(k + local)
+        positions.append(np.repeat(row_start, width) + local)
+        start += m + int((width + 1).sum())
+    if len(tokens) != start:
+        raise ValueError(f"Expect {start} numbers in the {nbf} x {nbf} matrix at offset {offset} of {file_path}, "
+                         f"found {len(tokens)}.")
+    try:
+        values = np.array(tokens, dtype=np.float64)
+    except ValueError as e:
+        raise ValueError(f"Invalid number in the {nbf} x {nbf} matrix at offset {offset} of {file_path}: {e}") from e
+    mat = np.zeros((nbf, nbf))
+    mat[np.concatenate(cols), np.concatenate(rows)] = values[np.concatenate(positions)]
+    # Mirror the upper triangle to the lower triangle
+    mat = mat + mat.T - np.diag(mat.diagonal())
+    return mat
+
+
+def required_gau_log_sections(hamiltonian=False, overlap=False, density_matrix=False, is_fixed_convention=False):
+    """The sections a log must contain to be parsed with the given options."""
+    # the termination is the most frequent reason of an invalid log, check it first
+    required_sections = ['termination', 'orientation', 'nbasis']
 
     if hamiltonian:
-        required_patterns.append(r" Fock matrix")
+        required_sections.append('fock')
     if overlap:
-        required_patterns.append(r"\*+\s*Overlap\s*\*+")
+        required_sections.append('overlap')
     if density_matrix:
-        required_patterns.append(r" Total density matrix:")
+        required_sections.append('density')
 
     if not is_fixed_convention:
-        required_patterns.extend([
-            r"Standard basis:",
-            r"\s*Gross orbital populations:"
-        ])
-
-    patterns = [re.compile(pattern) for pattern in required_patterns]
-    found_patterns = [False] * len(patterns)
-
-    with open(file_path, 'r') as file:
-        for line in file:
-            for i, pattern in enumerate(patterns):
-                if not found_patterns[i] and pattern.search(line):
-                    found_patterns[i] = True
-    if all(found_patterns):
-        return True
-    else:
-        return False
+        required_sections.extend(['basis', 'populations'])
+    return required_sections
+
+
+def chk_valid_gau_log_unit(file_path, hamiltonian=False, overlap=False, density_matrix=False,
+                           is_fixed_convention=False, index=None):
+    required_sections = required_gau_log_sections(hamiltonian, overlap, density_matrix, is_fixed_convention)
+    if index is not None:
+        return all(index[section] for section in required_sections)
+
+    # Without an index, stop at the first occurrence of each section and at the first missing one.
+    # The normal termination message is searched in the tail of the log before the whole file.
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for section in required_sections:
+                if section == 'termination' and _find_section(buffer, section, max(0, size - GAU_LOG_TAIL_SIZE), True):
+                    continue
+                if not _find_section(buffer, section, first_only=True):
+                    return False
+    return True
+
+
+def _screen_gau_log(args):
+    file_path, required_flags = args
+    return chk_valid_gau_log_unit(file_path, *required_flags)
 
 
 def chk_valid_gau_logs(root, prefix, hamiltonian=False, overlap=False, density_matrix=False, is_fixed_convention=False,
                        valid_gau_info_path=r'./valid_gaussian_logs.txt',
-                       invalid_gau_info_path=r'./invalid_gau_info_path.txt'):
+                       invalid_gau_info_path=r'./invalid_gau_info_path.txt',
+                       num_workers=None, cache_path=None):
+    """Screen the Gaussian logs root/*prefix* and append their paths to the valid and invalid list files.
+
+    The logs are checked by a pool of num_workers processes (all the cpus by default). If cache_path is
+    given, the results are kept in that json file, keyed by the absolute path, size and modification
+    time of each log and by the required sections, so a rerun only opens the new or changed logs.
+    """
     file_paths = glob.glob(root + '/*' + prefix + '*')
+    required_flags = (hamiltonian, overlap, density_matrix, is_fixed_convention)
+    required_key = ",".join(required_gau_log_sections(*required_flags))
+    cache = {}
+    if cache_path is not None and os.path.exists(cache_path):
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+    stamps = {}
+    results = {}
+    for a_file in file_paths:
+        stat = os.stat(a_file)
+        stamps[a_file] = [stat.st_size, stat.st_mtime_ns]
+        entry = cache.get(os.path.abspath(a_file))
+        if entry is not None and entry[:2] == stamps[a_file] and required_key in entry[2]:
+            results[a_file] = entry[2][required_key]
+    to_check = [a_file for a_file in file_paths if a_file not in results]
+
+    num_workers = num_workers or os.cpu_count()
+    tasks = [(a_file, required_flags) for a_file in to_check]
+    if num_workers > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(num_workers, len(tasks))) as pool:
+            checked = pool.map(_screen_gau_log, tasks, chunksize=max(1, len(tasks) // (4 * num_workers)))
+    else:
+        checked = [_screen_gau_log(task) for task in tasks]
+    results.update(zip(to_check, checked))
+
+    if cache_path is not None:
+        for a_file in to_check:
+            key = os.path.abspath(a_file)
+            entry = cache.get(key)
+            if entry is None or entry[:2] != stamps[a_file]:
+                entry = cache[key] = stamps[a_file] + [{}]
+            entry[2][required_key] = results[a_file]
+        with open(cache_path + '.tmp', 'w') as f:
+            json.dump(cache, f)
+        os.replace(cache_path + '.tmp', cache_path)
+
     valid_count = 0
     invalid_count = 0
     with open(valid_gau_info_path, 'a') as valid_file, open(invalid_gau_info_path, 'a') as invalid_file:
         for a_file in file_paths:
-            if chk_valid_gau_log_unit(a_file, hamiltonian, overlap, density_matrix, is_fixed_convention):
+            if results[a_file]:
                 valid_file.write(f"{a_file}\n")
                 valid_count += 1
             else:
@@ -66,6 +230,8 @@ def chk_valid_gau_logs(root, prefix, hamiltonian=False, overlap=False, density_m
     print(f"Invalid Gaussian log files: {invalid_count}")
     print(f"Valid file paths written to: {valid_gau_info_path}")
     print(f"Invalid file paths written to: {invalid_gau_info_path}")
+    if cache_path is not None and len(to_check) < len(file_paths):
+        print(f"{len(file_paths) - len(to_check)} results were found in the cache {cache_path}.")
 
 
 def split_files_by_atoms(file_list_path, output_train_path, output_valid_path, output_test_path):
@@ -131,63 +297,83 @@ def cut_matrix(full_matrix, atom_in_mo_indices, threshold=1e-8):
     return partitioned_blocks
 
 
-def get_nbasis(file_path):
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
+def get_nbasis(file_path, index=None):
+    if index is None:
+        index = index_gau_log(file_path)
     nbasis = None
-    for line in lines:
+    if index['nbasis']:
         # Extract NBasis
-        if line.strip().startswith("NBasis"):
-            nbasis = int(line.split()[2])
-            break
+        nbasis = int(read_section_lines(file_path, index['nbasis'][0], 1)[0].split()[2])
     if nbasis is None:
         print("NBasis keyword not found in the log file.")
     return nbasis
 
 
-def get_basic_info(file_path):
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
-    in_standard_orientation = False
+def read_standard_orientation(file_path, index=None):
+    """Read the atoms of the first standard orientation.
+
+    Returns
+    -------
+    atoms : ase.Atoms
+    end : int
+        The byte offset of the line closing the orientation table, the file size if there is none.
+    """
+    if index is None:
+        index = index_gau_log(file_path)
     atoms = Atoms()
-    for idx, line in enumerate(lines):
-        # Extract atomic coordinates in standard orientation
-        if "Standard orientation:" in line:
-            in_standard_orientation = True
-            atom_data = []  # Reset atom data for the latest standard orientation
-        elif in_standard_orientation and "---" in line:
-            if len(atoms) > 0:
-                break
-        elif in_standard_orientation:
-            parts = line.split()
-            if len(parts) == 6:  # We expect 6 parts in a valid atom data line
-                try:
-                    atomic_number = int(parts[1])
-                    x = float(parts[3])
-                    y = float(parts[4])
-                    z = float(parts[5])
-                    atoms.append(Atom(symbol=atomic_number, position=(x, y, z)))
-                except ValueError:
-                    continue
+    if not index['orientation']:
+        return atoms, os.path.getsize(file_path)
+    end = index['orientation'][0]
+    with open(file_path, 'rb') as file:
+        file.seek(end)
+        file.readline()
+        end = file.tell()
+        for line in iter(file.readline, b''):
+            line = line.decode()
+            if "---" in line:
+                if len(atoms) > 0:
+                    break
+            else:
+                parts = line.split()
+                if len(parts) == 6:  # We expect 6 parts in a valid atom data line
+                    try:
+                        atomic_number = int(parts[1])
+                        x = float(parts[3])
+                        y = float(parts[4])
+                        z = float(parts[5])
+                        atoms.append(Atom(symbol=atomic_number, position=(x, y, z)))
+                    except ValueError:
+                        pass
+            end = file.tell()
+    return atoms, end
+
+
+def get_basic_info(file_path, index=None):
+    if index is None:
+        index = index_gau_log(file_path)
+    # Extract atomic coordinates in standard orientation
+    atoms, end = read_standard_orientation(file_path, index)
     nbasis = None
-    for line in lines[idx:]:
+    for offset in index['nbasis']:
         # Extract NBasis
-        if line.strip().startswith("NBasis"):
-            match = re.search(r"\b\d+\b", line)
-            if match:
-                nbasis = int(match.group(0))
-                break
+        if offset < end:
+            continue
+        match = re.search(r"\b\d+\b", read_section_lines(file_path, offset, 1)[0])
+        if match:
+            nbasis = int(match.group(0))
+            break
     if nbasis is None:
         raise RuntimeError("NBasis keyword not found in the log file.")
     return nbasis, atoms
 
 
-def find_basis_set(file_path):
+def find_basis_set(file_path, index=None):
     target_line = 'Standard basis:'
-    with open(file_path, 'r') as file:
-        for line in file:
-            if line.strip().startswith(target_line):
-                return line.strip()[len(target_line):].strip()
+    if index is None:
+        index = index_gau_log(file_path)
+    if index['basis']:
+        line = read_section_lines(file_path, index['basis'][0], 1)[0]
+        return line.strip()[len(target_line):].strip()
     return None
 
 
@@ -246,46 +432,44 @@ def process_atomic_orbitals(orbital_list, orbital_idx_map):
 
 
 # Key word Pop=Full is required
-def parse_orbital_populations(filename, nbf, orbital_idx_map):
-    target_pattern = re.compile(r'\s*Gross orbital populations:')
-    with open(filename, 'r') as f:
-        # Search for the target pattern
-        for line in f:
-            if target_pattern.search(line):
-                break
+def parse_orbital_populations(filename, nbf, orbital_idx_map, index=None):
+    if index is None:
+        index = index_gau_log(filename)
+    if not index['populations']:
+        raise ValueError(f"No match for orbital population block found in file {filename}")
+    f = iter(read_section_lines(filename, index['populations'][0], nbf + 2))
+    next(f)  # Skip the header line
+    orbitals = []
+    atoms_list = []
+    next(f)  # Skip the line with column numbers
+    for i in range(nbf):
+        parts = next(f).split()
+        if len(parts) >= 5:
+            an_orbital = parts[3][:2].lower()
+            atoms_list.append(parts[2])
         else:
-            raise ValueError(f"No match for orbital population block found in file {filename}")
-        orbitals = []
-        atoms_list = []
-        next(f)  # Skip the line with column numbers
-        for i in range(nbf):
-            parts = next(f).split()
-            if len(parts) >= 5:
-                an_orbital = parts[3][:2].lower()
-                atoms_list.append(parts[2])
-            else:
-                an_orbital = parts[1][:2].lower()
-            orbitals.append(an_orbital)
-        atom_to_orbitals = {}
-        atom_to_simplified_orbitals = {}
-        atom_to_dftio_orbitals = {}
-        atom_to_transform_indices = {}
-        orbital_index = 1
-        for atom in atoms_list:
-            # Get the corresponding orbitals for the current atom
-            unit_orbitals = ['1s']
-            while orbital_index < len(orbitals):
-                orbital = orbitals[orbital_index]
-                orbital_index += 1
-                if orbital == '1s':
-                    break
-                unit_orbitals.append(orbital)
-            if not atom in atom_to_orbitals.keys():
-                atom_to_orbitals[atom] = unit_orbitals
-                transform_indices, sorted_orbital_str = process_atomic_orbitals(unit_orbitals, orbital_idx_map)
-                atom_to_dftio_orbitals[atom] = sorted_orbital_str
-                atom_to_transform_indices[atom] = transform_indices
-                atom_to_simplified_orbitals[atom] = simplify_orbitals(unit_orbitals)
+            an_orbital = parts[1][:2].lower()
+        orbitals.append(an_orbital)
+    atom_to_orbitals = {}
+    atom_to_simplified_orbitals = {}
+    atom_to_dftio_orbitals = {}
+    atom_to_transform_indices = {}
+    orbital_index = 1
+    for atom in atoms_list:
+        # Get the corresponding orbitals for the current atom
+        unit_orbitals = ['1s']
+        while orbital_index < len(orbitals):
+            orbital = orbitals[orbital_index]
+            orbital_index += 1
+            if orbital == '1s':
+                break
+            unit_orbitals.append(orbital)
+        if not atom in atom_to_orbitals.keys():
+            atom_to_orbitals[atom] = unit_orbitals
+            transform_indices, sorted_orbital_str = process_atomic_orbitals(unit_orbitals, orbital_idx_map)
+            atom_to_dftio_orbitals[atom] = sorted_orbital_str
+            atom_to_transform_indices[atom] = transform_indices
+            atom_to_simplified_orbitals[atom] = simplify_orbitals(unit_orbitals)
     return orbitals, atom_to_orbitals, atom_to_simplified_orbitals, atom_to_dftio_orbitals, atom_to_transform_indices
 
 
@@ -387,133 +571,60 @@ def matrix_to_image(matrix, filename='matrix_image.png', orbital_labels=None):
 # modified from Mokit,
 # see https://github.com/1234zou/MOKIT/blob/7499356b1ff0f9d8b9efbb846395059867dbba4c/src/rwwfn.f90#L895
 # Key word IOp(3/33=1) is required
-def read_int1e_from_gau_log(logname, matrix_type, nbf):
+def read_int1e_from_gau_log(logname, matrix_type, nbf, index=None):
     matrix_types = {
-        0: r"Overlap",
-        1: r"Kinetic Energy",
-        2: r"Potential Energy",
+        0: ('overlap', r"Overlap"),
+        1: ('kinetic', r"Kinetic Energy"),
+        2: ('potential', r"Potential Energy"),
     }
 
     if matrix_type not in matrix_types:
         raise ValueError(
             f"Invalid matrix_type = {matrix_type}. Allowed values are 0/1/2 for Overlap/Kinetic/Potential.")
-    target_pattern = re.compile(rf"\*+\s*{matrix_types[matrix_type]}\s*\*+")
-    mat = np.zeros((nbf, nbf))
-    with open(logname, 'r') as f:
-        # Search for the target pattern
-        for line in f:
-            if target_pattern.search(line):
-                break
-        else:
-            raise ValueError(f"No match for '{matrix_types[matrix_type]}' found in file {logname}")
-
-        # Read the matrix data
-        n = (nbf + 4) // 5  # Equivalent to ceiling division
-        for i in range(n):
-            next(f)  # Skip the line with column numbers
-            k = 5 * i
-            for j in range(k, nbf):
-                line = next(f).split()
-                m = min(5, nbf - k)
-                actual_line_len = len(line[1:m + 1])
-                mat[k:k + actual_line_len, j] = [float(x.replace('D', 'E')) for x in line[1:m + 1]]
-    # Mirror the upper triangle to the lower triangle
-    mat = mat + mat.T - np.diag(mat.diagonal())
-    return mat
+    section, name = matrix_types[matrix_type]
+    if index is None:
+        index = index_gau_log(logname)
+    if not index[section]:
+        raise ValueError(f"No match for '{name}' found in file {logname}")
+    return read_lower_triangular(logname, index[section][0], nbf)
 
 
 # modified from Mokit,
 # see https://github.com/1234zou/MOKIT/blob/7499356b1ff0f9d8b9efbb846395059867dbba4c/src/rwwfn.f90#L895
 # Key word IOp(5/33=3, 3/33=1) is required
-def read_fock_from_gau_log(logname, nbf):
-    target_pattern = re.compile(rf" Fock matrix")
-    pattern_counts = 0
-    with open(logname, 'r') as f:
-        for line in f:
-            if target_pattern.search(line):
-                pattern_counts = pattern_counts + 1
-    current_counts = 0
-    mat = np.zeros((nbf, nbf))
-    with open(logname, 'r') as f:
-        for line in f:
-            if target_pattern.search(line):
-                current_counts = current_counts + 1
-            if current_counts == pattern_counts:
-                break
-        # Read the matrix data
-        n = (nbf + 4) // 5  # Equivalent to ceiling division
-        for i in range(n):
-            next(f)  # Skip the line with column numbers
-            k = 5 * i
-            for j in range(k, nbf):
-                line = next(f).split()
-                m = min(5, nbf - k)
-                actual_line_len = len(line[1:m + 1])
-                mat[k:k + actual_line_len, j] = [float(x.replace('D', 'E')) for x in line[1:m + 1]]
-    # Mirror the upper triangle to the lower triangle
-    mat = mat + mat.T - np.diag(mat.diagonal())
-    return mat
+def read_fock_from_gau_log(logname, nbf, index=None):
+    if index is None:
+        index = index_gau_log(logname)
+    if not index['fock']:
+        raise ValueError(f"No match for 'Fock matrix' found in file {logname}")
+    # the Fock matrix of the last SCF cycle
+    return read_lower_triangular(logname, index['fock'][-1], nbf)
 
 
 # modified from Mokit,
 # see https://github.com/1234zou/MOKIT/blob/7499356b1ff0f9d8b9efbb846395059867dbba4c/src/rwwfn.f90#L3405
 # Key word IOp(5/33=3, 3/33=1) is required
-def read_density_from_gau_log(logname, nbf):
-    target_pattern = re.compile(rf" Total density matrix:")
-    mat = np.zeros((nbf, nbf))
-    with open(logname, 'r') as f:
-        for line in f:
-            if target_pattern.search(line):
-                break
-        # Read the matrix data
-        n = (nbf + 4) // 5  # Equivalent to ceiling division
-        for i in range(n):
-            next(f)  # Skip the line with column numbers
-            k = 5 * i
-            for j in range(k, nbf):
-                line = next(f).split()
-                m = min(5, nbf - k)
-                actual_line_len = len(line[1:m + 1])
-                mat[k:k + actual_line_len, j] = [float(x.replace('D', 'E')) for x in line[1:m + 1]]
-    # Mirror the upper triangle to the lower triangle
-    mat = mat + mat.T - np.diag(mat.diagonal())
-    return mat
+def read_density_from_gau_log(logname, nbf, index=None):
+    if index is None:
+        index = index_gau_log(logname)
+    if not index['density']:
+        raise ValueError(f"No match for 'Total density matrix' found in file {logname}")
+    return read_lower_triangular(logname, index['density'][0], nbf)
 
 
-def get_atoms(file_path):
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
-    in_standard_orientation = False
-    atoms = Atoms()
-
-    for idx, line in enumerate(lines):
-        # Extract atomic coordinates in standard orientation
-        if "Standard orientation:" in line:
-            in_standard_orientation = True
-            atom_data = []  # Reset atom data for the latest standard orientation
-        elif in_standard_orientation and "---" in line:
-            if len(atoms) > 0:
-                break
-        elif in_standard_orientation:
-            parts = line.split()
-            if len(parts) == 6:  # We expect 6 parts in a valid atom data line
-                try:
-                    atomic_number = int(parts[1])
-                    x = float(parts[3])
-                    y = float(parts[4])
-                    z = float(parts[5])
-                    atoms.append(Atom(symbol=atomic_number, position=(x, y, z)))
-                except ValueError:
-                    continue
+def get_atoms(file_path, index=None):
+    atoms, _ = read_standard_orientation(file_path, index)
     return atoms
 
 
 # Key word Pop=Full is required
-def get_convention(filename, dump_file=None, orbital_idx_map=orbital_idx_map):
-    nbasis = get_nbasis(filename)
-    basis_name = find_basis_set(filename)
+def get_convention(filename, dump_file=None, orbital_idx_map=orbital_idx_map, index=None):
+    if index is None:
+        index = index_gau_log(filename)
+    nbasis = get_nbasis(filename, index)
+    basis_name = find_basis_set(filename, index)
     orbitals, atom_to_orbitals, atom_to_simplified_orbitals, atom_to_dftio_orbitals, atom_to_transform_indices = parse_orbital_populations(
-        filename, nbasis, orbital_idx_map)
+        filename, nbasis, orbital_idx_map, index)
     convention = {
         'atom_to_simplified_orbitals': atom_to_simplified_orbitals,
         'atom_to_dftio_orbitals': atom_to_dftio_orbitals,
@@ -539,11 +650,12 @@ def check_eigenvalue_consistency(matrix, manipulated_matrix):
 
 def check_transform(filepath):
     convention = get_convention(filename='gau.log')
-    nbasis, atoms = get_basic_info(filepath)
+    index = index_gau_log(filepath)
+    nbasis, atoms = get_basic_info(filepath, index)
     molecule_transform_indices, _ = generate_molecule_transform_indices(atom_types=atoms.symbols,
                                                                         atom_to_transform_indices=convention[
                                                                             'atom_to_transform_indices'])
-    hamiltonian_matrix = read_int1e_from_gau_log(filepath, matrix_type=3, nbf=nbasis)
+    hamiltonian_matrix = read_int1e_from_gau_log(filepath, matrix_type=3, nbf=nbasis, index=index)
     new_hamiltonian_matrix = transform_matrix(hamiltonian_matrix, molecule_transform_indices)
     consistent_flag = check_eigenvalue_consistency(hamiltonian_matrix, new_hamiltonian_matrix)
     if consistent_flag:
@@ -551,7 +663,7 @@ def check_transform(filepath):
     else:
         print('Hamiltonian matrix transform is non-consistent for eigenvalues.')
 
-    overlap_matrix = read_int1e_from_gau_log(filepath, matrix_type=0, nbf=nbasis)
+    overlap_matrix = read_int1e_from_gau_log(filepath, matrix_type=0, nbf=nbasis, index=index)
     new_overlap_matrix = transform_matrix(overlap_matrix, molecule_transform_indices)
     consistent_flag = check_eigenvalue_consistency(overlap_matrix, new_overlap_matrix)
     if consistent_flag:
@@ -559,7 +671,7 @@ def check_transform(filepath):
     else:
         print('Overlap matrix transform is non-consistent for eigenvalues.')
 
-    density_matrix = read_density_from_gau_log(filepath, nbf=nbasis)
+    density_matrix = read_density_from_gau_log(filepath, nbf=nbasis, index=index)
     new_density_matrix = transform_matrix(density_matrix, molecule_transform_indices)
     consistent_flag = check_eigenvalue_consistency(density_matrix, new_density_matrix)
     if consistent_flag:
@@ -0,0 +1,83 @@
+import os
+import h5py
+import numpy as np
+from dftio.io.packed_blocks import PackedBlocks, pack_blocks
+import logging
+log = logging.getLogger(__name__)
+
+PACKED_LAYOUT = "packed"
+_PACKED_FIELDS = ("index", "shape", "offsets", "data")
+
+
+def write_packed_frame(group, blocks, **dataset_kwargs):
+    """Write the blocks of one frame into an HDF5 group with the packed layout.
+
+    Instead of one dataset per block, the group holds four datasets: "index" (nblock, 5) int32
+    of (i, j, Rx, Ry, Rz), "shape" (nblock, 2), "offsets" (nblock + 1,) and the flat "data".
+    dataset_kwargs, e.g. compression="gzip", are passed to create_dataset of non-empty arrays.
+    """
+    for field, array in zip(_PACKED_FIELDS, pack_blocks(blocks)):
+        group.create_dataset(field, data=array, **(dataset_kwargs if array.size > 0 else {}))
+    group.attrs["layout"] = PACKED_LAYOUT
+
+
+def is_packed(group):
+    return group.attrs.get("layout") == PACKED_LAYOUT
+
+
+def read_packed_frame(group, lazy: bool=False):
+    """Read a frame written by write_packed_frame as PackedBlocks.
+
+    Parameters
+    ----------
+    group : h5py.Group
+        The frame group.
+    lazy : bool
+        If True, each block is read from the file when it is accessed, the file must be kept open.
+        Otherwise the whole payload is read at once, which is the fastest way to read all blocks.
+    """
+    index, shape, offsets = (group[field][:] for field in _PACKED_FIELDS[:3])
+    data = group["data"] if lazy else group["data"][:]
+    return PackedBlocks(index, shape, offsets, data)
+
+
+def open_blocks(group, lazy: bool=False):
+    """Return the blocks of a frame group of hamiltonians.h5, overlaps.h5 or density_matrices.h5.
+
+    Packed groups are returned as PackedBlocks, groups of the per-block layout are returned as is.
+    Both can be passed to block_to_feature.
+    """
+    if is_packed(group):
+        return read_packed_frame(group, lazy=lazy)
+    return group
+
+
+def migrate_h5_blocks(src, dst=None):
+    """Convert a blocks file of the per-block layout, e.g. hamiltonians.h5, into the packed layout.
+
+    Parameters
+    ----------
+    src : str
+        The file to convert, frames already in the packed layout are copied.
+    dst : str, optional
+        The output file, src is replaced if not provided.
+
+    Returns
+    -------
+    int
+        The number of frames in the file.
+    """
+    out = dst if dst is not None else src + ".packed.tmp"
+    with h5py.File(src, 'r') as fsrc, h5py.File(out, 'w') as fdst:
+        for frame in fsrc.keys():
+            if is_packed(fsrc[frame]):
+                fsrc.copy(fsrc[frame], fdst, name=frame)
+            else:
+                blocks = {key: dataset[()] for key, dataset in fsrc[frame].items()}
+                write_packed_frame(fdst.create_group(frame), blocks)
+        nframes = len(fsrc.keys())
+    if dst is None:
+        os.replace(out, src)
+    log.info(f"{nframes} frames of {src} are converted into the packed layout.")
+
+    return nframes
@@ -0,0 +1,127 @@
+import os
+import glob
+import h5py
+import numpy as np
+import logging
+log = logging.getLogger(__name__)
+
+INDEX_NAME = "index"
+INDEX_COLUMNS = ("idx", "nf", "natoms")
+MERGED_NAME = "data.h5"
+
+
+def append_index(fid, rows):
+    """Append (idx, nf, natoms) rows to the global index table of an HDF5 file."""
+    rows = np.asarray(rows, dtype=np.int64).reshape(-1, len(INDEX_COLUMNS))
+    if INDEX_NAME not in fid:
+        table = fid.create_dataset(INDEX_NAME, shape=(0, len(INDEX_COLUMNS)), maxshape=(None, len(INDEX_COLUMNS)),
+                                   dtype=np.int64, chunks=(1024, len(INDEX_COLUMNS)))
+        table.attrs["columns"] = list(INDEX_COLUMNS)
+    table = fid[INDEX_NAME]
+    start = table.shape[0]
+    table.resize(start + rows.shape[0], axis=0)
+    table[start:] = rows
+
+
+def merge_hdf5(outroot, sources=None, name: str=MERGED_NAME):
+    """Merge the per-worker files data.{pid}.h5 into one entry file.
+
+    The structure groups are not copied: the merged file holds an external link to the group of
+    every structure and a virtual dataset that concatenates the index tables of the sources, so
+    it is opened as a single file while the workers never write into the same file.
+    The sources are referred to relative to outroot, which can be moved as a whole.
+
+    Parameters
+    ----------
+    outroot : str
+        The directory of the per-worker files.
+    sources : list of str, optional
+        The files to merge, defaults to all data.*.h5 under outroot.
+    name : str
+        The name of the merged file under outroot.
+
+    Returns
+    -------
+    int
+        The number of frames in the merged index table.
+    """
+    target = os.path.join(outroot, name)
+    if sources is None:
+        sources = sorted(glob.glob(os.path.join(outroot, "data.*.h5")))
+    sources = [s for s in sources if os.path.abspath(s) != os.path.abspath(target)]
+
+    layouts = []
+    with h5py.File(target, 'w') as fout:
+        for source in sources:
+            relpath = os.path.relpath(source, outroot)
+            with h5py.File(source, 'r') as fsrc:
+                for group in fsrc.keys():
+                    if group == INDEX_NAME:
+                        continue
+                    if group in fout:
+                        raise ValueError(f"Structure {group} is written into more than one file, "
+                                         f"found again in {source}.")
+                    fout[group] = h5py.ExternalLink(relpath, "/" + group)
+                if INDEX_NAME in fsrc:
+                    layouts.append((relpath, fsrc[INDEX_NAME].shape[0]))
+
+        nrows = sum(n for _, n in layouts)
+        layout = h5py.VirtualLayout(shape=(nrows, len(INDEX_COLUMNS)), dtype=np.int64)
+        start = 0
+        for relpath, n in layouts:
+            layout[start:start + n] = h5py.VirtualSource(relpath, INDEX_NAME, shape=(n, len(INDEX_COLUMNS)))
+            start += n
+        table = fout.create_virtual_dataset(INDEX_NAME, layout, fillvalue=-1)
+        table.attrs["columns"] = list(INDEX_COLUMNS)
+    log.info(f"{len(sources)} files with {nrows} frames are merged into {target}.")
+
+    return nrows
+
+
+def prune_hdf5(outroot, keep, name: str=MERGED_NAME):
+    """Delete from the per-worker files data.{pid}.h5 the structures whose idx is not in keep.
+
+    A rerun of the parse command writes the structures it parses again into a new per-worker file,
+    so their earlier groups, complete or left by a killed run, are deleted first and merge_hdf5 finds
+    every structure once. The files left without structures are removed. HDF5 does not reclaim the
+    space of the deleted groups, h5repack compacts the files if needed.
+
+    Parameters
+    ----------
+    outroot : str
+        The directory of the per-worker files.
+    keep : set of int
+        The idx of the structures to keep.
+    name : str
+        The name of the merged file under outroot, which is not pruned.
+
+    Returns
+    -------
+    int
+        The number of deleted structures.
+    """
+    target = os.path.join(outroot, name)
+    keep_idx = np.fromiter(keep, dtype=np.int64)
+    removed = 0
+    for source in sorted(glob.glob(os.path.join(outroot, "data.*.h5"))):
+        if os.path.abspath(source) == os.path.abspath(target):
+            continue
+        with h5py.File(source, 'a') as fid:
+            stale = [group for group in fid.keys() if group != INDEX_NAME and int(group) not in keep]
+            for group in stale:
+                del fid[group]
+            if len(stale) > 0 and INDEX_NAME in fid:
+                table = fid[INDEX_NAME]
+                rows = table[:]
+                rows = rows[np.isin(rows[:, 0], keep_idx)]
+                table.resize(rows.shape[0], axis=0)
+                if rows.shape[0] > 0:
+                    table[:] = rows
+            empty = all(group == INDEX_NAME for group in fid.keys())
+        if empty:
+            os.remove(source)
+        removed += len(stale)
+    if removed > 0:
+        log.info(f"{removed} structures to parse again are deleted from the files under {outroot}.")
+
+    return removed
@@ -0,0 +1,196 @@
+import json
+import pickle
+import struct
+import lmdb
+import numpy as np
+from dftio.io.lmdb_writer import LMDBWriter, encode_key
+from dftio.io.packed_blocks import PackedBlocks, pack_blocks
+import logging
+log = logging.getLogger(__name__)
+
+RECORD_MAGIC = b"DFTIOREC"
+RECORD_VERSION = 1
+_PREAMBLE = struct.Struct("<8sII") # magic, version, header length
+_ALIGN = 16
+_BLOCK_FIELDS = ("index", "shape", "offsets", "data")
+
+
+def _aligned(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def encode_record(data_dict):
+    """Serialize a frame dict into the binary record format, without pickle.
+
+    The record is a fixed preamble (magic, version, header length), a JSON header and the raw
+    bytes of every array, each aligned to 16 bytes. A dict of "i_j_Rx_Ry_Rz" blocks, e.g. the
+    hamiltonian, is stored as the four arrays of pack_blocks: an int32 (nblock, 5) key table,
+    the block shapes, the offsets and one contiguous payload, so that readers can take
+    np.frombuffer views of the whole frame without allocating one array per block.
+    Python int/float/bool/str values are kept in the header.
+    """
+    arrays = {}
+    blocks = []
+    scalars = {}
+    for name, value in data_dict.items():
+        if isinstance(value, (dict, PackedBlocks)):
+            blocks.append(name)
+            if isinstance(value, PackedBlocks):
+                packed = (value.index, value.shape, value.offsets, value.data)
+            else:
+                packed = pack_blocks(value)
+            for field, array in zip(_BLOCK_FIELDS, packed):
+                arrays[f"{name}.{field}"] = np.asarray(array)
+        elif isinstance(value, (np.ndarray, np.generic)):
+            arrays[name] = np.asarray(value)
+        elif value is None or isinstance(value, (bool, int, float, str)):
+            scalars[name] = value
+        else:
+            raise TypeError(f"Can not encode {name} of type {type(value)} into a record.")
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        if array.dtype.hasobject:
+            raise TypeError(f"Can not encode {name} of dtype object into a record.")
+        layout[name] = [array.dtype.str, list(array.shape), offset]
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({"arrays": layout, "blocks": blocks, "scalars": scalars}).encode("utf-8")
+    start = _aligned(_PREAMBLE.size + len(header))
+
+    buffer = bytearray(start + offset)
+    _PREAMBLE.pack_into(buffer, 0, RECORD_MAGIC, RECORD_VERSION, len(header))
+    buffer[_PREAMBLE.size:_PREAMBLE.size + len(header)] = header
+    for name, array in arrays.items():
+        begin = start + layout[name][2]
+        buffer[begin:begin + array.nbytes] = np.ascontiguousarray(array).tobytes()
+
+    return bytes(buffer)
+
+
+def is_record(buffer):
+    return bytes(buffer[:len(RECORD_MAGIC)]) == RECORD_MAGIC
+
+
+def decode_record(buffer, copy: bool=False):
+    """Decode a record written by encode_record.
+
+    Parameters
+    ----------
+    buffer : bytes-like
+        The record, e.g. the memoryview returned by a ``buffers=True`` LMDB transaction.
+    copy : bool
+        If False, the arrays are read-only np.frombuffer views of buffer, which are only valid
+        as long as buffer is, i.e. until the LMDB transaction ends.
+
+    Returns
+    -------
+    dict
+        The frame dict, blocks are returned as PackedBlocks.
+    """
+    buffer = memoryview(buffer)
+    magic, version, header_len = _PREAMBLE.unpack_from(buffer, 0)
+    if magic != RECORD_MAGIC:
+        raise ValueError("The buffer is not a dftio record.")
+    if version > RECORD_VERSION:
+        raise ValueError(f"Record version {version} is newer than the supported version {RECORD_VERSION}.")
+    header = json.loads(bytes(buffer[_PREAMBLE.size:_PREAMBLE.size + header_len]))
+    start = _aligned(_PREAMBLE.size + header_len)
+
+    arrays = {}
+    for name, (dtype, shape, offset) in header["arrays"].items():
+        array = np.frombuffer(buffer, dtype=dtype, count=int(np.prod(shape)), offset=start + offset).reshape(shape)
+        arrays[name] = array.copy() if copy else array
+
+    data_dict = {}
+    for name in header["blocks"]:
+        data_dict[name] = PackedBlocks(*[arrays.pop(f"{name}.{field}") for field in _BLOCK_FIELDS])
+    for name, array in arrays.items():
+        # 0-d arrays are stored numpy scalars, e.g. the total energy
+        data_dict[name] = array[()] if array.ndim == 0 else array
+    data_dict.update(header["scalars"])
+
+    return data_dict
+
+
+def load_frame(buffer, copy: bool=True):
+    """Decode an LMDB value written either as a record or as a pickled dict."""
+    if is_record(buffer):
+        return decode_record(buffer, copy=copy)
+    return pickle.loads(buffer)
+
+
+class RecordReader:
+    """Read frames from a dftio LMDB database.
+
+    Both binary records and pickled frames are supported. Indexing returns frames that own
+    their memory, iter_frames decodes a range of frames inside one ``buffers=True`` read
+    transaction and yields zero-copy views, which are only valid until the next frame is
+    requested.
+
+    Examples
+    --------
+    >>> with RecordReader("data.lmdb") as reader:
+    ...     for frame in reader.iter_frames():
+    ...         ham = frame["hamiltonian"]
+    ...         index, data = ham.index, ham.data
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.env = lmdb.open(path, readonly=True, lock=False, readahead=False, meminit=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.env is not None:
+            self.env.close()
+            self.env = None
+
+    def __len__(self):
+        return self.env.stat()["entries"]
+
+    def __getitem__(self, key):
+        with self.env.begin(buffers=True) as txn:
+            buffer = txn.get(encode_key(key))
+            if buffer is None:
+                raise KeyError(key)
+            return load_frame(buffer, copy=True)
+
+    def iter_frames(self, keys=None):
+        if keys is None:
+            keys = range(len(self))
+        with self.env.begin(buffers=True) as txn:
+            for key in keys:
+                buffer = txn.get(encode_key(key))
+                if buffer is None:
+                    raise KeyError(key)
+                yield load_frame(buffer, copy=False)
+
+
+def convert_pickle_lmdb(src, dst, batch_size: int=64):
+    """Convert a database of pickled frames into binary records, keeping the key order.
+
+    Returns the number of converted frames.
+    """
+    src_env = lmdb.open(src, readonly=True, lock=False)
+    nframes = 0
+    try:
+        with src_env.begin(buffers=True) as txn, LMDBWriter(dst, batch_size=batch_size) as writer:
+            if writer.next_key != 0:
+                raise ValueError(f"The destination {dst} is not empty.")
+            for key, value in txn.cursor():
+                if bytes(key) != encode_key(nframes):
+                    raise ValueError(f"The keys of {src} are not contiguous at entry {nframes}.")
+                data_dict = load_frame(value)
+                writer.put(data_dict.get("idx", -1), data_dict.get("nf", -1), encode_record(data_dict))
+                nframes += 1
+    finally:
+        src_env.close()
+    log.info(f"{nframes} frames are converted from {src} to {dst}.")
+
+    return nframes
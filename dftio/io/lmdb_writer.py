@@ -0,0 +1,281 @@
+import os
+import glob
+import queue
+import lmdb
+import logging
+import multiprocessing
+log = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.dat"
+# the frame queue of the single writer, set in the pool workers by init_worker
+_frame_queue = None
+
+
+def encode_key(key):
+    return key.to_bytes(length=4, byteorder='big')
+
+
+class LMDBWriter:
+    """Buffer serialized frames and commit them to an LMDB database in batches.
+
+    Frames are stored under contiguous 4-byte big-endian keys, starting after the entries already
+    in the database, so that readers can index them with ``range(env.stat()["entries"])``.
+    The (idx, nf) -> key mapping of every committed frame is appended to ``manifest.dat`` in the
+    database directory. The frames of a structure that failed to be written are removed with discard.
+
+    Parameters
+    ----------
+    path : str
+        The LMDB directory.
+    batch_size : int
+        Number of frames buffered before they are committed in one write transaction.
+    map_size : int
+        The maximum size of the database in bytes.
+
+    Examples
+    --------
+    >>> with LMDBWriter("data.lmdb", batch_size=64) as writer:
+    ...     writer.put(idx=0, nf=0, data=pickle.dumps(data_dict))
+    """
+
+    def __init__(self, path, batch_size: int=64, map_size: int=1048576000000):
+        if batch_size < 1:
+            raise ValueError(f"batch_size should be a positive integer, got {batch_size}.")
+        self.path = path
+        self.batch_size = batch_size
+        self.env = lmdb.open(path, map_size=map_size, lock=True)
+        self.next_key = self.env.stat()["entries"]
+        self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def put(self, idx, nf, data: bytes):
+        self._buffer.append((idx, nf, data))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if len(self._buffer) == 0:
+            return
+        items = [(encode_key(self.next_key + k), data) for k, (_, _, data) in enumerate(self._buffer)]
+        with self.env.begin(write=True) as txn:
+            consumed, added = txn.cursor().putmulti(items, overwrite=False)
+        if added != len(items):
+            raise RuntimeError(f"Only {added} of {len(items)} frames are written into {self.path}, "
+                               "the key space is not contiguous.")
+
+        with open(os.path.join(self.path, MANIFEST_NAME), 'a') as f:
+            for k, (idx, nf, _) in enumerate(self._buffer):
+                f.write(f"{idx} {nf} {self.next_key + k}\n")
+        self.next_key += len(items)
+        self._buffer = []
+
+    def discard(self, idx):
+        """Remove the frames of structure idx, buffered or already committed, e.g. when it failed partway."""
+        self._buffer = [item for item in self._buffer if item[0] != idx]
+        self.flush()
+        remove_frames(self.env, self.path, {idx})
+        self.next_key = self.env.stat()["entries"]
+
+    def close(self):
+        if self.env is not None:
+            self.flush()
+            self.env.close()
+            self.env = None
+
+    @staticmethod
+    def serve(queue, path, batch_size: int=64, map_size: int=1048576000000):
+        """Drain (idx, nf, data) frames from the queue into one database until None is received.
+
+        This is the target of the single writer process, the pool workers send their frames
+        with a QueueWriter.
+        """
+        with LMDBWriter(path, batch_size=batch_size, map_size=map_size) as writer:
+            while True:
+                item = queue.get()
+                if item is None:
+                    break
+                idx, nf, data = item
+                if data is None:
+                    writer.discard(idx)
+                else:
+                    writer.put(idx, nf, data)
+        log.info(f"{writer.next_key} frames are written into {path}.")
+
+
+class QueueWriter:
+    """Send serialized frames to the single writer process, with the same interface as LMDBWriter."""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def put(self, idx, nf, data: bytes):
+        self.queue.put((idx, nf, data))
+
+    def discard(self, idx):
+        self.queue.put((idx, None, None))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def init_worker(frame_queue):
+    """Pool initializer of the single writer mode, multiprocessing queues can only be shared by inheritance."""
+    global _frame_queue
+    _frame_queue = frame_queue
+
+
+def watch_writer(results, server, timeout: float=1.):
+    """Yield the results of Pool.imap_unordered while checking that the single writer process is alive.
+
+    The workers block on the bounded frame queue once the writer is gone, so the pool would wait forever.
+
+    Raises
+    ------
+    RuntimeError
+        If the writer process exited before all the results were received.
+    """
+    while True:
+        try:
+            result = results.next(timeout=timeout)
+        except StopIteration:
+            return
+        except multiprocessing.TimeoutError:
+            if not server.is_alive():
+                raise RuntimeError(f"The single writer process exited with code {server.exitcode} "
+                                   "before all the DFT files were parsed.")
+            continue
+        yield result
+
+
+def stop_writer(frame_queue, server, timeout: float=1.):
+    """Send None to the single writer process, wait for it to commit its frames and return its exit code."""
+    while server.is_alive():
+        try:
+            frame_queue.put(None, timeout=timeout)
+            break
+        except queue.Full:
+            continue
+    else:
+        # nothing drains the queue anymore, do not wait for the frames in flight at exit
+        frame_queue.cancel_join_thread()
+    server.join()
+    return server.exitcode
+
+
+def get_worker_writer():
+    """Return a QueueWriter to the single writer process if init_worker was called in this process, else None."""
+    if _frame_queue is None:
+        return None
+    return QueueWriter(_frame_queue)
+
+
+def read_manifest(path):
+    """Read the manifest of an LMDB directory as a {(idx, nf): key} dict."""
+    manifest = {}
+    with open(os.path.join(path, MANIFEST_NAME), 'r') as f:
+        for line in f:
+            idx, nf, key = line.split()
+            manifest[(int(idx), int(nf))] = int(key)
+    return manifest
+
+
+def _read_keys(path):
+    """Read the manifest of an LMDB directory as a {key: (idx, nf)} dict."""
+    keys = {}
+    with open(os.path.join(path, MANIFEST_NAME), 'r') as f:
+        for line in f:
+            idx, nf, key = line.split()
+            keys[int(key)] = (int(idx), int(nf))
+    return keys
+
+
+def remove_frames(env, path, idxs):
+    """Remove the frames of the structures idxs from an open LMDB database, keeping its keys contiguous.
+
+    The last frames of the database are moved into the keys of the removed ones, in the same write
+    transaction as the deletions, and manifest.dat is rewritten with the new keys, so that readers
+    still index the frames with ``range(env.stat()["entries"])``.
+
+    Returns
+    -------
+    int
+        The number of removed frames.
+    """
+    if not os.path.exists(os.path.join(path, MANIFEST_NAME)):
+        # nothing was committed yet
+        return 0
+    keys = _read_keys(path)
+    entries = env.stat()["entries"]
+    removed = sorted(key for key, (idx, _) in keys.items() if idx in idxs and key < entries)
+    if len(removed) == 0:
+        return 0
+    nkept = entries - len(removed)
+    removed_keys = set(removed)
+    holes = [key for key in removed if key < nkept]
+    moved = [key for key in range(nkept, entries) if key not in removed_keys]
+    with env.begin(write=True) as txn:
+        for hole, key in zip(holes, moved):
+            txn.put(encode_key(hole), txn.get(encode_key(key)))
+            keys[hole] = keys[key]
+        for key in range(nkept, entries):
+            txn.delete(encode_key(key))
+
+    tmp_path = os.path.join(path, f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        for key in range(nkept):
+            idx, nf = keys[key]
+            f.write(f"{idx} {nf} {key}\n")
+    os.replace(tmp_path, os.path.join(path, MANIFEST_NAME))
+    return len(removed)
+
+
+def prune_lmdb(outroot, keep):
+    """Remove from the databases data.lmdb and data.{pid}.lmdb the frames of the structures whose idx is not in keep.
+
+    A rerun of the parse command writes the structures it parses again into its own databases, so
+    their earlier frames, complete or left by a killed run, are removed first and readers find
+    every frame once. See remove_frames.
+
+    Parameters
+    ----------
+    outroot : str
+        The directory of the databases.
+    keep : set of int
+        The idx of the structures to keep.
+
+    Returns
+    -------
+    int
+        The number of removed frames.
+    """
+    removed = 0
+    paths = sorted(glob.glob(os.path.join(outroot, "data.lmdb")) + glob.glob(os.path.join(outroot, "data.*.lmdb")))
+    for path in paths:
+        if not os.path.exists(os.path.join(path, MANIFEST_NAME)):
+            continue
+        stale = {idx for idx, _ in _read_keys(path).values() if idx not in keep}
+        if len(stale) == 0:
+            continue
+        env = lmdb.open(path, map_size=1048576000000, lock=True)
+        try:
+            removed += remove_frames(env, path, stale)
+        finally:
+            env.close()
+    if removed > 0:
+        log.info(f"{removed} frames of the structures to parse again are removed from the databases under {outroot}.")
+
+    return removed
@@ -0,0 +1,93 @@
+import numpy as np
+from collections.abc import Mapping
+
+
+def parse_block_key(key):
+    """Split a block key "i_j_Rx_Ry_Rz" into its five integers."""
+    return [int(x) for x in key.split("_")]
+
+
+def pack_blocks(blocks, dtype=None):
+    """Pack a dict of "i_j_Rx_Ry_Rz" blocks into flat arrays.
+
+    Parameters
+    ----------
+    blocks : dict
+        Blocks with key "i_j_Rx_Ry_Rz" and 2D np.ndarray values.
+    dtype : np.dtype, optional
+        The dtype of the payload, defaults to the common dtype of the blocks.
+
+    Returns
+    -------
+    index : np.ndarray
+        int32 array of shape (nblock, 5), the (i, j, Rx, Ry, Rz) of each block.
+    shape : np.ndarray
+        int32 array of shape (nblock, 2), the shape of each block.
+    offsets : np.ndarray
+        int64 array of shape (nblock + 1,), block k is data[offsets[k]:offsets[k+1]].
+    data : np.ndarray
+        1D array of all the blocks raveled in C order and concatenated.
+    """
+    nblock = len(blocks)
+    index = np.zeros((nblock, 5), dtype=np.int32)
+    shape = np.zeros((nblock, 2), dtype=np.int32)
+    values = []
+    for k, (key, block) in enumerate(blocks.items()):
+        index[k] = parse_block_key(key)
+        block = np.asarray(block)
+        shape[k] = block.shape
+        values.append(block.ravel())
+    offsets = np.zeros(nblock + 1, dtype=np.int64)
+    np.cumsum(shape[:, 0].astype(np.int64) * shape[:, 1], out=offsets[1:])
+    if dtype is None:
+        dtype = np.result_type(*values) if nblock > 0 else np.float32
+    data = np.concatenate(values).astype(dtype, copy=False) if nblock > 0 else np.zeros(0, dtype=dtype)
+
+    return index, shape, offsets, data
+
+
+class PackedBlocks(Mapping):
+    """Read-only dict-like view of blocks packed by pack_blocks.
+
+    The blocks are returned as views into data, so nothing is copied when data is itself a view,
+    e.g. of an LMDB buffer or of an in-memory HDF5 dataset. It can be passed to block_to_feature
+    in place of a dict of blocks. Vectorized consumers can use the index, shape, offsets and data
+    arrays directly instead of going through the string keys.
+    """
+
+    def __init__(self, index, shape, offsets, data):
+        self.index = index
+        self.shape = shape
+        self.offsets = offsets
+        self.data = data
+        self._positions = None
+
+    @classmethod
+    def from_dict(cls, blocks, dtype=None):
+        return cls(*pack_blocks(blocks, dtype=dtype))
+
+    def _key_positions(self):
+        if self._positions is None:
+            self._positions = {f"{i}_{j}_{rx}_{ry}_{rz}": k for k, (i, j, rx, ry, rz) in enumerate(self.index.tolist())}
+        return self._positions
+
+    def block(self, k):
+        """Return the k-th block."""
+        start, end = self.offsets[k], self.offsets[k + 1]
+        return self.data[start:end].reshape(self.shape[k])
+
+    def __getitem__(self, key):
+        return self.block(self._key_positions()[key])
+
+    def __contains__(self, key):
+        return key in self._key_positions()
+
+    def __iter__(self):
+        return iter(self._key_positions())
+
+    def __len__(self):
+        return len(self.index)
+
+    def to_dict(self, copy=True):
+        """Return a plain dict of blocks, copied out of data by default."""
+        return {key: (self.block(k).copy() if copy else self.block(k)) for key, k in self._key_positions().items()}
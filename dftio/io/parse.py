@@ -1,5 +1,5 @@
 import os
-import glob
+import itertools
 
 from abc import ABC, abstractmethod
 import numpy as np
@@ -7,8 +7,13 @@ from pathlib import Path
 import h5py
 import ase
 import pickle
-import lmdb
 from dftio.data import _keys
+from dftio.io.lmdb_writer import LMDBWriter
+from dftio.io.lmdb_record import encode_record
+from dftio.io.h5_blocks import write_packed_frame
+from dftio.io.hdf5_writer import append_index
+from dftio.io.discovery import discover_inputs
+from dftio.io.profiling import stage, profile_iter
 from dftio.utils import j_must_have
 from dftio.register import Register
 from ase.io.trajectory import Trajectory
@@ -25,6 +30,21 @@ def find_target_line(f, target):
     return None
 
 
+def check_nframes(idx, frame_blocks, n_frames):
+    """Yield the frames of frame_blocks, raising a ValueError if there are not n_frames of them.
+
+    The writers consume the blocks with this generator, so that e.g. a truncated CSR trajectory
+    fails instead of being written with fewer frames than the structure.
+    """
+    nf = -1
+    for nf, frame in enumerate(frame_blocks):
+        if nf >= n_frames:
+            raise ValueError(f"Structure {idx} has {n_frames} frames, but more frames of blocks are found.")
+        yield frame
+    if nf + 1 != n_frames:
+        raise ValueError(f"Structure {idx} has {n_frames} frames, but the blocks of {nf + 1} frames are found.")
+
+
 class ParserRegister:
     _register = Register()
 
@@ -42,6 +62,8 @@ class Parser(ABC):
             self,
             root,
             prefix,
+            max_depth: int=0,
+            index_path=None,
             **kwargs
             ):
         """All DFT parser need to inherit this class and implement the abstract methods.
@@ -50,9 +72,14 @@ class Parser(ABC):
 
         Parameters
         ----------
-        root : The root of the DFT calculation output files
+        root : The root of the DFT calculation output files, a file listing the calculations one per line,
+            or the list of the calculations
         prefix : str
             The prefix of the DFT calculation folders or files
+        max_depth : int
+            The number of directory levels below root searched for the calculations, 0 searches root only
+        index_path : str, optional
+            The file of the sorted calculations, reused instead of searching root when it exists
         """
 
         self.root = root
@@ -64,7 +91,8 @@ class Parser(ABC):
         if isinstance(root, list) and all(isinstance(item, str) for item in root):
             self.raw_datas = root
         else:
-            self.raw_datas = glob.glob(os.path.join(root, '*' + prefix + '*'))
+            # sorted, so that the index of every calculation is the same between runs
+            self.raw_datas = discover_inputs(root, prefix, max_depth=max_depth, index_path=index_path)
 
         assert(len(self.raw_datas) != 0, 'There are no folders that meet the requirements in the directory!')
     
@@ -147,6 +175,22 @@ class Parser(ABC):
     def get_blocks(self, idx, hamiltonian: bool=False, overlap: bool=False, density_matrix: bool=False):
         pass # return a list of hamiltonian, overlap, density_matrix dict, with i_j_Rx_Ry_Rz as key, and the block as value
 
+    def iter_blocks(self, idx, hamiltonian: bool=False, overlap: bool=False, density_matrix: bool=False):
+        """Yield the (hamiltonian, overlap, density_matrix) block dicts of each frame.
+
+        The writers consume blocks through this generator. The default implementation falls back
+        to get_blocks, parsers that can decode frames one at a time should override it so that
+        only one frame is held in memory.
+        """
+        ham, ovp, dm = self.get_blocks(idx, hamiltonian, overlap, density_matrix)
+        nframes = len(next(b for b, required in [(ham, hamiltonian), (ovp, overlap), (dm, density_matrix)] if required))
+        for nf in range(nframes):
+            yield (
+                ham[nf] if hamiltonian else None,
+                ovp[nf] if overlap else None,
+                dm[nf] if density_matrix else None
+            )
+
     # @abstractmethod
     # def get_field():
     #     pass
@@ -211,18 +255,90 @@ class Parser(ABC):
 
         return True
     
-    def write(self, idx, outroot, format, eigenvalue, hamiltonian, overlap, density_matrix, band_index_min, energy=False, **kwargs):
+    def write(self, idx, outroot, format, eigenvalue, hamiltonian, overlap, density_matrix, band_index_min, energy=False, writer=None, lmdb_batch_size=64, lmdb_format='pickle', h5_layout='block', **kwargs):
+        """Write one structure in the given format and return where it is written, see write_hdf5,
+        write_dat and write_lmdb. The time not spent in the other stages of dftio.io.profiling is
+        recorded as the stage "other"."""
+        with stage("other", idx):
+            return self._write(idx, outroot, format, eigenvalue, hamiltonian, overlap, density_matrix, band_index_min, energy=energy, writer=writer, lmdb_batch_size=lmdb_batch_size, lmdb_format=lmdb_format, h5_layout=h5_layout)
+
+    def _write(self, idx, outroot, format, eigenvalue, hamiltonian, overlap, density_matrix, band_index_min, energy=False, writer=None, lmdb_batch_size=64, lmdb_format='pickle', h5_layout='block'):
         if format == "hdf5":
-            self.write_hdf5(idx=idx, outroot=outroot, eigenvalue=eigenvalue, hamiltonian=hamiltonian, overlap=overlap, density_matrix=density_matrix,band_index_min=band_index_min, energy=energy)
+            return self.write_hdf5(idx=idx, outroot=outroot, eigenvalue=eigenvalue, hamiltonian=hamiltonian, overlap=overlap, density_matrix=density_matrix,band_index_min=band_index_min, energy=energy)
         elif format in ["dat", "ase"]:
-            self.write_dat(idx=idx, outroot=outroot, fmt=format, eigenvalue=eigenvalue, hamiltonian=hamiltonian, overlap=overlap, density_matrix=density_matrix,band_index_min=band_index_min, energy=energy)
+            return self.write_dat(idx=idx, outroot=outroot, fmt=format, eigenvalue=eigenvalue, hamiltonian=hamiltonian, overlap=overlap, density_matrix=density_matrix,band_index_min=band_index_min, energy=energy, h5_layout=h5_layout)
         elif format == "lmdb":
-            self.write_lmdb(idx=idx, outroot=outroot, eigenvalue=eigenvalue, hamiltonian=hamiltonian, overlap=overlap, density_matrix=density_matrix,band_index_min=band_index_min, energy=energy)
+            return self.write_lmdb(idx=idx, outroot=outroot, eigenvalue=eigenvalue, hamiltonian=hamiltonian, overlap=overlap, density_matrix=density_matrix,band_index_min=band_index_min, energy=energy, writer=writer, batch_size=lmdb_batch_size, lmdb_format=lmdb_format)
         else:
             raise NotImplementedError(f"Format: {format} is not implemented!")
         
-    def write_hdf5(self, idx, outroot, eigenvalue: bool=False, hamiltonian: bool=False, overlap: bool=False, density_matrix: bool=False, band_index_min=0):
-        pass
+    def write_hdf5(self, idx, outroot, eigenvalue: bool=False, hamiltonian: bool=False, overlap: bool=False, density_matrix: bool=False, band_index_min=0, energy: bool=False, compression="gzip"):
+        """Write one structure into the per-process file ``data.{pid}.h5`` under outroot.
+
+        The structure is stored in the group "/{idx}": the atomic numbers and pbc, the chunked and
+        compressed cell and pos of all frames, eigenvalues, kpoints and total energy if requested,
+        and the blocks of frame nf in "/{idx}/hamiltonian/{nf}" (and overlap, density_matrix) with
+        the packed layout of dftio.io.h5_blocks. One (idx, nf, natoms) row per frame is appended to
+        the global "/index" table. The per-process files are merged into data.h5 by
+        dftio.io.hdf5_writer.merge_hdf5 once all structures are written. Returns the path of the
+        per-process file.
+        """
+        os.makedirs(outroot, exist_ok=True)
+        with stage("get_structure"):
+            structure = self.get_structure(idx)
+        n_frames, natoms = structure[_keys.POSITIONS_KEY].shape[:2]
+        dataset_kwargs = {"compression": compression, "chunks": True} if compression else {}
+
+        if eigenvalue:
+            with stage("get_eigenvalue"):
+                eigstatus = self.get_eigenvalue(idx=idx, band_index_min=band_index_min)
+            self.check_eigenvalue(idx=idx, eigstatus=eigstatus)
+        energy_data = None
+        if energy:
+            if hasattr(self, 'get_etot'):
+                with stage("get_etot"):
+                    energy_data = self.get_etot(idx)
+            else:
+                log.warning(f"Parser does not implement get_etot method")
+
+        path = os.path.join(outroot, "data.{}.h5".format(os.getpid()))
+        with stage("write"), h5py.File(path, 'a') as fid:
+            if str(idx) in fid:
+                raise ValueError(f"Structure {idx} is already written into {fid.filename}.")
+            group = fid.create_group(str(idx))
+            try:
+                group.attrs["formula"] = self.formula(idx=idx)
+                group.attrs["basis"] = str(self.get_basis(idx))
+                group.create_dataset(_keys.ATOMIC_NUMBERS_KEY, data=structure[_keys.ATOMIC_NUMBERS_KEY])
+                group.create_dataset(_keys.PBC_KEY, data=structure[_keys.PBC_KEY])
+                group.create_dataset(_keys.CELL_KEY, data=structure[_keys.CELL_KEY], **dataset_kwargs)
+                group.create_dataset(_keys.POSITIONS_KEY, data=structure[_keys.POSITIONS_KEY], **dataset_kwargs)
+
+                if eigenvalue:
+                    group.create_dataset(_keys.KPOINT_KEY, data=eigstatus[_keys.KPOINT_KEY])
+                    group.create_dataset(_keys.ENERGY_EIGENVALUE_KEY, data=eigstatus[_keys.ENERGY_EIGENVALUE_KEY], **dataset_kwargs)
+
+                if energy_data is not None:
+                    group.create_dataset(_keys.TOTAL_ENERGY_KEY, data=energy_data[_keys.TOTAL_ENERGY_KEY])
+                    if len(energy_data.get(_keys.UNCONVERGED_FRAME_INDICES_KEY, [])) > 0:
+                        group.create_dataset(_keys.UNCONVERGED_FRAME_INDICES_KEY,
+                                             data=np.asarray(energy_data[_keys.UNCONVERGED_FRAME_INDICES_KEY], dtype=np.int64))
+
+                if any([hamiltonian, overlap, density_matrix]):
+                    names = ["hamiltonian", "overlap", "density_matrix"]
+                    frames = profile_iter(self.iter_blocks(idx, hamiltonian, overlap, density_matrix), "get_blocks")
+                    for nf, frame_blocks in enumerate(check_nframes(idx, frames, n_frames)):
+                        for name, blocks in zip(names, frame_blocks):
+                            if blocks is not None:
+                                write_packed_frame(group.require_group(name).create_group(str(nf)), blocks, **dataset_kwargs)
+            except BaseException:
+                # do not leave a partial structure behind
+                del fid[str(idx)]
+                raise
+
+            append_index(fid, [(idx, nf, natoms) for nf in range(n_frames)])
+
+        return path
     
     def write_struct(self, structure, out_dir, fmt='dat'):
         # write structure
@@ -242,11 +358,20 @@ class Parser(ABC):
         else:
             raise NotImplementedError(f"Format: {fmt} is not implemented!")
 
-    def write_dat(self, idx, outroot, fmt='dat', eigenvalue=False, hamiltonian=False, overlap=False, density_matrix=False, band_index_min=0, energy=False):
+    def write_dat(self, idx, outroot, fmt='dat', eigenvalue=False, hamiltonian=False, overlap=False, density_matrix=False, band_index_min=0, energy=False, h5_layout='block'):
+        """Write one structure into the folder {formula}.{idx} under outroot.
+
+        The blocks of each frame are written into a group of hamiltonians.h5, overlaps.h5 and
+        density_matrices.h5, with one dataset per block if h5_layout is "block", or as the
+        index/shape/offsets/data datasets of dftio.io.h5_blocks if it is "packed". Returns the folder.
+        """
+        if h5_layout not in ["block", "packed"]:
+            raise NotImplementedError(f"HDF5 layout: {h5_layout} is not implemented!")
         # write structure
         os.makedirs(outroot, exist_ok=True)
 
-        structure = self.get_structure(idx)
+        with stage("get_structure"):
+            structure = self.get_structure(idx)
 
         out_dir = os.path.join(outroot, self.formula(idx=idx)+".{}".format(idx))
         os.makedirs(out_dir, exist_ok=True)
@@ -257,19 +382,23 @@ class Parser(ABC):
         # np.savetxt(os.path.join(out_dir, "pbc.dat"), structure[_keys.PBC_KEY])
 
         # write structure
-        self.write_struct(structure, out_dir, fmt=fmt)
+        with stage("write"):
+            self.write_struct(structure, out_dir, fmt=fmt)
 
         # write eigenvalue
         if eigenvalue:
-            eigstatus = self.get_eigenvalue(idx=idx, band_index_min=band_index_min)
+            with stage("get_eigenvalue"):
+                eigstatus = self.get_eigenvalue(idx=idx, band_index_min=band_index_min)
             self.check_eigenvalue(idx=idx, eigstatus=eigstatus)
-            np.save(os.path.join(out_dir, "kpoints.npy"), eigstatus[_keys.KPOINT_KEY])
-            np.save(os.path.join(out_dir, "eigenvalues.npy"), eigstatus[_keys.ENERGY_EIGENVALUE_KEY])
+            with stage("write"):
+                np.save(os.path.join(out_dir, "kpoints.npy"), eigstatus[_keys.KPOINT_KEY])
+                np.save(os.path.join(out_dir, "eigenvalues.npy"), eigstatus[_keys.ENERGY_EIGENVALUE_KEY])
 
         # write energy
         if energy:
             if hasattr(self, 'get_etot'):
-                energy_data = self.get_etot(idx)
+                with stage("get_etot"):
+                    energy_data = self.get_etot(idx)
                 if energy_data is not None:
                     np.savetxt(os.path.join(out_dir, "total_energy.dat"), energy_data[_keys.TOTAL_ENERGY_KEY])
 
@@ -291,45 +420,66 @@ class Parser(ABC):
             with open(os.path.join(out_dir, "basis.dat"), 'w') as f:
                f.write(str(self.get_basis(idx)))
 
-            ham, ovp, dm = self.get_blocks(idx, hamiltonian, overlap, density_matrix)
-            if hamiltonian:
-                with h5py.File(os.path.join(out_dir, "hamiltonians.h5"), 'w') as fid:
-                    for i in range(len(ham)):
-                        default_group = fid.create_group(str(i))
-                        for key_str, value in ham[i].items():
-                            default_group.create_dataset(key_str, data=value)
-            del ham
-
-            if overlap:
-                with h5py.File(os.path.join(out_dir, "overlaps.h5"), 'w') as fid:
-                    for i in range(len(ovp)):
-                        default_group = fid.create_group(str(i))
-                        for key_str, value in ovp[i].items():
-                            default_group.create_dataset(key_str, data=value)
-            del ovp
-
-            if density_matrix:
-                with h5py.File(os.path.join(out_dir, "density_matrices.h5"), 'w') as fid:
-                    for i in range(len(dm)):
-                        default_group = fid.create_group(str(i))
-                        for key_str, value in dm[i].items():
-                            default_group.create_dataset(key_str, data=value)
-
-            del dm
-
-        return True
+            outputs = [
+                ("hamiltonians.h5", hamiltonian),
+                ("overlaps.h5", overlap),
+                ("density_matrices.h5", density_matrix)
+            ]
+            fids = [h5py.File(os.path.join(out_dir, name), 'w') if required else None for name, required in outputs]
+            try:
+                frames = profile_iter(self.iter_blocks(idx, hamiltonian, overlap, density_matrix), "get_blocks")
+                for i, frame_blocks in enumerate(check_nframes(idx, frames, structure[_keys.POSITIONS_KEY].shape[0])):
+                    with stage("write"):
+                        for fid, blocks in zip(fids, frame_blocks):
+                            if fid is None:
+                                continue
+                            default_group = fid.create_group(str(i))
+                            if h5_layout == "packed":
+                                write_packed_frame(default_group, blocks)
+                                continue
+                            for key_str, value in blocks.items():
+                                default_group.create_dataset(key_str, data=value)
+            finally:
+                with stage("write"):
+                    for fid in fids:
+                        if fid is not None:
+                            fid.close()
+
+        return out_dir
     
-    def write_lmdb(self, idx, outroot, eigenvalue: bool=False, hamiltonian: bool=False, overlap: bool=False, density_matrix: bool=False,band_index_min=0, energy: bool=False):
+    def write_lmdb(self, idx, outroot, eigenvalue: bool=False, hamiltonian: bool=False, overlap: bool=False, density_matrix: bool=False,band_index_min=0, energy: bool=False, writer=None, batch_size: int=64, lmdb_format: str='pickle'):
+        """Write the frames of one structure into LMDB.
+
+        If writer is None, the frames are committed to the per-process database ``data.{pid}.lmdb``
+        in batches of batch_size frames, otherwise they are handed to the given writer, e.g. the
+        QueueWriter of the single writer mode. See dftio.io.lmdb_writer.
+        Each frame is stored as a pickled dict if lmdb_format is "pickle", or as a binary record
+        if it is "record", see dftio.io.lmdb_record. If the structure fails partway, its frames
+        already committed are removed with writer.discard. Returns the path of the database, None if
+        the writer does not tell it.
+        """
+        if lmdb_format == "pickle":
+            serialize = pickle.dumps
+        elif lmdb_format == "record":
+            serialize = encode_record
+        else:
+            raise NotImplementedError(f"LMDB format: {lmdb_format} is not implemented!")
         os.makedirs(outroot, exist_ok=True)
-        out_dir = os.path.join(outroot, "data.{}.lmdb".format(os.getpid()))
-        structure = self.get_structure(idx)
+        with stage("get_structure"):
+            structure = self.get_structure(idx)
+        n_frames = structure[_keys.POSITIONS_KEY].shape[0]
         if any([hamiltonian, overlap, density_matrix]):
-            ham, ovp, dm = self.get_blocks(idx, hamiltonian, overlap, density_matrix)
+            frames = profile_iter(self.iter_blocks(idx, hamiltonian, overlap, density_matrix), "get_blocks")
+            frame_blocks = check_nframes(idx, frames, n_frames)
+        else:
+            frame_blocks = itertools.repeat((None, None, None), n_frames)
         if eigenvalue:
-            eigstatus = self.get_eigenvalue(idx=idx, band_index_min=band_index_min)
+            with stage("get_eigenvalue"):
+                eigstatus = self.get_eigenvalue(idx=idx, band_index_min=band_index_min)
         if energy:
             if hasattr(self, 'get_etot'):
-                energy_data = self.get_etot(idx)
+                with stage("get_etot"):
+                    energy_data = self.get_etot(idx)
             else:
                 energy_data = None
                 log.warning(f"Parser does not implement get_etot method")
@@ -349,51 +499,61 @@ class Parser(ABC):
                         energy_frame_mapping[frame_idx] = energy_idx
                         energy_idx += 1
 
-        n_frames = structure[_keys.POSITIONS_KEY].shape[0]
-        lmdb_env = lmdb.open(out_dir, map_size=1048576000000, lock=True)
-        for nf in range(n_frames):
-            data_dict = {}
-            data_dict[_keys.ATOMIC_NUMBERS_KEY] = structure[_keys.ATOMIC_NUMBERS_KEY]
-            data_dict[_keys.CELL_KEY] = structure[_keys.CELL_KEY][nf]
-            data_dict[_keys.POSITIONS_KEY] = structure[_keys.POSITIONS_KEY][nf]
-            data_dict[_keys.PBC_KEY] = structure[_keys.PBC_KEY]
-
-            if eigenvalue:
-                data_dict[_keys.ENERGY_EIGENVALUE_KEY] = eigstatus[_keys.ENERGY_EIGENVALUE_KEY][nf]
-                data_dict[_keys.KPOINT_KEY] = eigstatus[_keys.KPOINT_KEY]
-
-            if energy and energy_data is not None:
-                # For single structure (SCF/NSCF), energy_data has shape [1,]
-                # For trajectories (MD/RELAX), energy_data has shape [nframes,] or less if unconverged
-                if energy_data[_keys.TOTAL_ENERGY_KEY].shape[0] == 1:
-                    # Single structure case
-                    data_dict[_keys.TOTAL_ENERGY_KEY] = energy_data[_keys.TOTAL_ENERGY_KEY][0]
-                else:
-                    # Trajectory case - use mapping if unconverged frames exist
-                    if energy_frame_mapping is not None:
-                        if nf in energy_frame_mapping:
-                            energy_idx = energy_frame_mapping[nf]
-                            data_dict[_keys.TOTAL_ENERGY_KEY] = energy_data[_keys.TOTAL_ENERGY_KEY][energy_idx]
-                        # else: skip energy for unconverged frames (don't add to data_dict)
+        if writer is None:
+            writer = LMDBWriter(os.path.join(outroot, "data.{}.lmdb".format(os.getpid())), batch_size=batch_size)
+            own_writer = True
+        else:
+            own_writer = False
+        try:
+            for nf, (ham, ovp, dm) in enumerate(frame_blocks):
+                data_dict = {}
+                data_dict[_keys.ATOMIC_NUMBERS_KEY] = structure[_keys.ATOMIC_NUMBERS_KEY]
+                data_dict[_keys.CELL_KEY] = structure[_keys.CELL_KEY][nf]
+                data_dict[_keys.POSITIONS_KEY] = structure[_keys.POSITIONS_KEY][nf]
+                data_dict[_keys.PBC_KEY] = structure[_keys.PBC_KEY]
+
+                if eigenvalue:
+                    data_dict[_keys.ENERGY_EIGENVALUE_KEY] = eigstatus[_keys.ENERGY_EIGENVALUE_KEY][nf]
+                    data_dict[_keys.KPOINT_KEY] = eigstatus[_keys.KPOINT_KEY]
+
+                if energy and energy_data is not None:
+                    # For single structure (SCF/NSCF), energy_data has shape [1,]
+                    # For trajectories (MD/RELAX), energy_data has shape [nframes,] or less if unconverged
+                    if energy_data[_keys.TOTAL_ENERGY_KEY].shape[0] == 1:
+                        # Single structure case
+                        data_dict[_keys.TOTAL_ENERGY_KEY] = energy_data[_keys.TOTAL_ENERGY_KEY][0]
                     else:
-                        # No unconverged frames, direct indexing
-                        data_dict[_keys.TOTAL_ENERGY_KEY] = energy_data[_keys.TOTAL_ENERGY_KEY][nf]
-
-            if hamiltonian:
-                data_dict["hamiltonian"] = ham[nf]
-            if overlap:
-                data_dict["overlap"] = ovp[nf]
-            if density_matrix:
-                data_dict["density_matrix"] = dm[nf]
-
-            data_dict["idx"] = idx
-            data_dict["nf"] = nf
-
-            data_dict = pickle.dumps(data_dict)
-
-            # write
-            with lmdb_env.begin(write=True) as txn:
-                entries = lmdb_env.stat()["entries"]
-                txn.put(entries.to_bytes(length=4, byteorder='big'), data_dict)
-
-        lmdb_env.close()
+                        # Trajectory case - use mapping if unconverged frames exist
+                        if energy_frame_mapping is not None:
+                            if nf in energy_frame_mapping:
+                                energy_idx = energy_frame_mapping[nf]
+                                data_dict[_keys.TOTAL_ENERGY_KEY] = energy_data[_keys.TOTAL_ENERGY_KEY][energy_idx]
+                            # else: skip energy for unconverged frames (don't add to data_dict)
+                        else:
+                            # No unconverged frames, direct indexing
+                            data_dict[_keys.TOTAL_ENERGY_KEY] = energy_data[_keys.TOTAL_ENERGY_KEY][nf]
+
+                if hamiltonian:
+                    data_dict["hamiltonian"] = ham
+                if overlap:
+                    data_dict["overlap"] = ovp
+                if density_matrix:
+                    data_dict["density_matrix"] = dm
+
+                data_dict["idx"] = idx
+                data_dict["nf"] = nf
+
+                with stage("serialize"):
+                    data = serialize(data_dict)
+                with stage("write"):
+                    writer.put(idx, nf, data)
+        except BaseException:
+            # do not leave the frames of a partial structure behind
+            writer.discard(idx)
+            raise
+        finally:
+            if own_writer:
+                with stage("write"):
+                    writer.close()
+
+        return getattr(writer, "path", None)
@@ -0,0 +1,201 @@
+import os
+import re
+import json
+import hashlib
+import logging
+log = logging.getLogger(__name__)
+
+MANIFEST_NAME = "parse_manifest.jsonl"
+DONE = "done"
+FAILED = "failed"
+# the formats written into one folder {formula}.{idx} per input, which is removed once the input moves to another idx
+FOLDER_FORMATS = ("dat", "ase")
+# the arguments of the parse command that change what is written for an input
+OPTION_KEYS = ("mode", "format", "eigenvalue", "hamiltonian", "overlap", "density_matrix", "band_index_min",
+               "energy", "h5_layout", "lmdb_format", "lmdb_single_writer")
+
+
+def _walk_files(root, top):
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                yield from _walk_files(entry.path, top)
+            else:
+                yield os.path.relpath(entry.path, top), entry.path, entry.stat()
+
+
+def scan_input(path, mode="stat"):
+    """Fingerprint a DFT calculation folder or file and count the bytes of its files, in one walk of its directory entries.
+
+    Parameters
+    ----------
+    path : str
+        The folder or file of the calculation.
+    mode : str or None
+        "stat" hashes the relative path, size and modification time of every file, which only reads
+        the directory entries, "content" hashes the bytes of every file, and None only counts the bytes.
+
+    Returns
+    -------
+    fingerprint : str or None
+        The mode and the sha1 digest, e.g. "stat:3f2a...", None if mode is None.
+    nbytes : int
+        The bytes of the files, see dftio.io.schedule.input_cost.
+    """
+    if mode not in [None, "stat", "content"]:
+        raise NotImplementedError(f"Fingerprint mode: {mode} is not implemented!")
+    if os.path.isdir(path):
+        files = sorted(_walk_files(path, path), key=lambda f: f[0])
+    else:
+        files = [(os.path.basename(path), path, os.stat(path))]
+    nbytes = sum(stat.st_size for _, _, stat in files)
+    if mode is None:
+        return None, nbytes
+
+    digest = hashlib.sha1()
+    for relpath, filepath, stat in files:
+        digest.update(relpath.encode())
+        if mode == "stat":
+            digest.update(f" {stat.st_size} {stat.st_mtime_ns}\n".encode())
+        else:
+            with open(filepath, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+    return f"{mode}:{digest.hexdigest()}", nbytes
+
+
+def input_fingerprint(path, mode: str="stat"):
+    """Fingerprint a DFT calculation folder or file, to tell whether it changed since it was parsed, see scan_input."""
+    return scan_input(path, mode=mode)[0]
+
+
+def read_parse_manifest(path):
+    """Read a parse manifest as an {input: entry} dict, the last entry of an input wins."""
+    entries = {}
+    with open(path, 'r') as f:
+        for n, line in enumerate(f):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # the line being appended when a run was killed
+                log.warning(f"Skipping the incomplete line {n + 1} of {path}.")
+                continue
+            entries[entry["input"]] = entry
+    return entries
+
+
+class ParseManifest:
+    """The record of the DFT calculations parsed into outroot, so that a rerun only parses the new,
+    changed or failed ones.
+
+    Every line of ``parse_manifest.jsonl`` under outroot is the JSON entry of one calculation: its
+    absolute path, its idx, the output it is written into relative to outroot, its fingerprint, the
+    parse options and the status "done" or "failed". The entries are only appended, by the main
+    process once a worker reports the calculation, so the workers of ``-n`` never write the file and
+    a killed run leaves at most one incomplete line.
+
+    Parameters
+    ----------
+    outroot : str
+        The output root directory of the parse command.
+    options : dict
+        The parse options of this run, see OPTION_KEYS. The calculations parsed with other options
+        are parsed again.
+    fingerprint : str
+        The fingerprint mode, see input_fingerprint.
+    """
+
+    def __init__(self, outroot, options: dict, fingerprint: str="stat"):
+        os.makedirs(outroot, exist_ok=True)
+        self.outroot = outroot
+        self.path = os.path.join(outroot, MANIFEST_NAME)
+        self.options = options
+        self.fingerprint = fingerprint
+        self.entries = read_parse_manifest(self.path) if os.path.exists(self.path) else {}
+        self._superseded = set()
+
+    def order(self, inputs):
+        """Order the inputs so that the recorded ones keep their idx and the new ones come after them.
+
+        A recorded input that no longer exists shifts the idx of the inputs after it, which are
+        then parsed again.
+        """
+        recorded, new = [], []
+        for path in inputs:
+            entry = self.entries.get(os.path.abspath(path))
+            if entry is None:
+                new.append(path)
+            else:
+                recorded.append((entry["idx"], path))
+        return [path for _, path in sorted(recorded)] + new
+
+    def is_recorded(self, path):
+        """Whether the input was parsed with the options of this run, so that its fingerprint tells if it is up to date."""
+        entry = self.entries.get(os.path.abspath(path))
+        return entry is not None and entry["status"] == DONE and entry["options"] == self.options
+
+    def pending(self, inputs, fingerprints=None):
+        """Return the idx of the inputs that are new, failed, moved to another idx, parsed with other
+        options or changed since they were parsed.
+
+        The fingerprints of the recorded inputs can be given, e.g. computed by scan_input in the worker
+        pool, otherwise they are computed here.
+        """
+        todo = []
+        for idx, path in enumerate(inputs):
+            entry = self.entries.get(os.path.abspath(path))
+            if not self.is_recorded(path) or entry["idx"] != idx:
+                todo.append(idx)
+                continue
+            fingerprint = fingerprints[idx] if fingerprints is not None else input_fingerprint(path, mode=self.fingerprint)
+            if entry["fingerprint"] != fingerprint:
+                todo.append(idx)
+        return todo
+
+    def record(self, path, idx, output=None, fingerprint=None, error=None):
+        """Append the entry of an input, parsed into output if error is None and failed otherwise."""
+        key = os.path.abspath(path)
+        entry = {
+            "input": key,
+            "idx": idx,
+            "status": DONE if error is None else FAILED,
+            "output": os.path.relpath(output, self.outroot) if output is not None else None,
+            "fingerprint": fingerprint,
+            "format": self.options.get("format"),
+            "options": self.options,
+            "error": error
+        }
+        previous = self.entries.get(key)
+        if error is None and previous is not None and self._is_folder_output(previous) \
+                and previous["output"] != entry["output"]:
+            self._superseded.add(previous["output"])
+        self.entries[key] = entry
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def _is_folder_output(self, entry):
+        """Whether the output of the entry is the folder {formula}.{idx} written by the format of this run."""
+        # the entries of the earlier versions only record the format in their options
+        fmt = entry.get("format", entry["options"].get("format"))
+        return fmt in FOLDER_FORMATS and fmt == self.options.get("format") and entry["output"] is not None \
+            and re.fullmatch(rf"[^/\\]+\.{entry['idx']}", entry["output"]) is not None
+
+    def superseded(self):
+        """Return the folders {formula}.{idx} of the dat or ase format of this run that were replaced,
+        as their input moved to another idx, and that no entry refers to anymore.
+
+        The outputs of the other formats, e.g. the LMDB databases of an earlier ``-f lmdb`` run into
+        the same outroot, are never returned.
+        """
+        current = {entry["output"] for entry in self.entries.values()}
+        return [os.path.join(self.outroot, output) for output in sorted(self._superseded - current)]
+
+    def compact(self, inputs):
+        """Rewrite the manifest with one entry per input, dropping the inputs that no longer exist."""
+        keys = [os.path.abspath(path) for path in inputs]
+        self.entries = {key: self.entries[key] for key in keys if key in self.entries}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,258 @@
+import os
+import csv
+import json
+import time
+import cProfile
+import functools
+import logging
+from contextlib import contextmanager, nullcontext
+log = logging.getLogger(__name__)
+
+RECORD_FIELDS = ("pid", "idx", "stage", "calls", "wall", "read_bytes", "write_bytes", "rss_growth")
+# the stage records of this process, {(idx, stage): record}, None if the profiling is disabled
+_records = None
+# the structure being written, which the stages without idx are recorded for
+_current_idx = None
+# the [wall, read, written, RSS growth] of the inner stages of every running stage, which are not counted in it
+_stack = []
+# the bytes read from /proc/self/io and /proc/self/statm by this module, which are not counted as read by the stages
+_proc_bytes = 0
+# the cProfile.Profile of this process and its pid, so that a forked worker does not reuse the one of its parent
+_cprofile = None
+_cprofile_pid = None
+
+
+def _io_counters():
+    """The bytes read and written by this process so far, zeros where /proc/self/io is not available."""
+    global _proc_bytes
+    try:
+        with open("/proc/self/io", 'rb') as f:
+            content = f.read()
+    except OSError:
+        return 0, 0
+    counters = dict(line.split(b':') for line in content.splitlines() if b':' in line)
+    read_bytes = int(counters[b'rchar']) - _proc_bytes
+    _proc_bytes += len(content)
+    return read_bytes, int(counters[b'wchar'])
+
+
+def _current_rss():
+    """The current resident set size of this process in bytes, 0 where /proc/self/statm is not available."""
+    global _proc_bytes
+    try:
+        with open("/proc/self/statm", 'rb') as f:
+            content = f.read()
+    except OSError:
+        return 0
+    _proc_bytes += len(content)
+    return int(content.split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def enable_profiling(enabled: bool=True):
+    """Enable or disable the stage records of this process, the records are kept if already enabled."""
+    global _records
+    if not enabled:
+        _records = None
+    elif _records is None:
+        _records = {}
+
+
+def profiling_enabled():
+    return _records is not None
+
+
+@contextmanager
+def _stage(name, idx):
+    global _current_idx
+    outer_idx = _current_idx
+    if idx is not None:
+        _current_idx = idx
+    inner = [0., 0, 0, 0]
+    _stack.append(inner)
+    read_start, write_start = _io_counters()
+    rss_start = _current_rss()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - start
+        read_end, write_end = _io_counters()
+        rss_end = _current_rss()
+        _stack.pop()
+        usage = [wall, read_end - read_start, write_end - write_start, rss_end - rss_start]
+        if len(_stack) > 0:
+            _stack[-1][:] = [outer + u for outer, u in zip(_stack[-1], usage)]
+        record = _records.setdefault((_current_idx, name), {
+            "pid": os.getpid(), "idx": _current_idx, "stage": name, "calls": 0,
+            "wall": 0., "read_bytes": 0, "write_bytes": 0, "rss_growth": 0
+        })
+        record["calls"] += 1
+        record["wall"] += usage[0] - inner[0]
+        record["read_bytes"] += usage[1] - inner[1]
+        record["write_bytes"] += usage[2] - inner[2]
+        record["rss_growth"] += usage[3] - inner[3]
+        _current_idx = outer_idx
+
+
+def stage(name, idx=None):
+    """Record the wall time, bytes read and written and RSS growth of the block as the stage name.
+
+    The records are accumulated per (idx, stage), idx defaults to the structure of the enclosing
+    stage, so that the stages of the code that does not know idx, e.g. the orbital transforms,
+    are recorded for the structure being written. The stages can be nested, the usage of the inner
+    stages is not counted in the outer one, so the stages of a structure add up to the usage of its
+    outermost stage. The RSS growth is the change of the resident memory from the start to the end of
+    the block, negative if it freed more than it allocated, not the peak within the block. This is a
+    no-op unless enable_profiling was called in this process.
+
+    Examples
+    --------
+    >>> with stage("get_structure", idx):
+    ...     structure = parser.get_structure(idx)
+    """
+    if _records is None:
+        return nullcontext()
+    return _stage(name, idx)
+
+
+def profile_iter(iterable, name, idx=None):
+    """Iterate over iterable, recording every next() as the stage name, e.g. the frames decoded by iter_blocks."""
+    if _records is None:
+        return iterable
+    return _profile_iter(iter(iterable), name, idx)
+
+
+def _profile_iter(iterator, name, idx):
+    while True:
+        with _stage(name, idx):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def profiled(name):
+    """Decorate a function so that its calls are recorded as the stage name, see stage."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _records is None:
+                return func(*args, **kwargs)
+            with _stage(name, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def pop_records():
+    """Return the stage records of this process and clear them, e.g. to send them from a worker to the main process."""
+    if _records is None:
+        return []
+    records = list(_records.values())
+    _records.clear()
+    return records
+
+
+@contextmanager
+def cprofile_calls(profile_dir=None):
+    """Profile the block with cProfile if profile_dir is given.
+
+    The calls of all the blocks of a process are accumulated and dumped into
+    ``{profile_dir}/parse.{pid}.pstats`` at the end of every block, so the file of a pool worker is
+    complete even though the pool terminates its workers. Read it with pstats.Stats.
+    """
+    global _cprofile, _cprofile_pid
+    if profile_dir is None:
+        yield
+        return
+    if _cprofile is None or _cprofile_pid != os.getpid():
+        _cprofile, _cprofile_pid = cProfile.Profile(), os.getpid()
+    _cprofile.enable()
+    try:
+        yield
+    finally:
+        _cprofile.disable()
+        os.makedirs(profile_dir, exist_ok=True)
+        _cprofile.dump_stats(os.path.join(profile_dir, f"parse.{os.getpid()}.pstats"))
+
+
+def summarize_records(records):
+    """Aggregate the records of all the processes by stage.
+
+    Returns
+    -------
+    list of dict
+        One dict per stage, in order of first appearance, and a last one of all the stages named
+        "total": the number of structures, the calls, the total, mean and max wall time per
+        structure, the bytes read and written and the RSS growth.
+    """
+    stages = {}
+    structure_walls = {}
+    for record in records:
+        structure_walls[(record["pid"], record["idx"])] = structure_walls.get((record["pid"], record["idx"]), 0.) + record["wall"]
+        agg = stages.setdefault(record["stage"], {"walls": [], "calls": 0, "read_bytes": 0, "write_bytes": 0, "rss_growth": 0})
+        agg["walls"].append(record["wall"])
+        agg["calls"] += record["calls"]
+        agg["read_bytes"] += record["read_bytes"]
+        agg["write_bytes"] += record["write_bytes"]
+        agg["rss_growth"] += record["rss_growth"]
+
+    summary = []
+    for name, s in stages.items():
+        summary.append({
+            "stage": name,
+            "structures": len(s["walls"]),
+            "calls": s["calls"],
+            "wall": sum(s["walls"]),
+            "mean_wall": sum(s["walls"]) / len(s["walls"]),
+            "max_wall": max(s["walls"]),
+            "read_bytes": s["read_bytes"],
+            "write_bytes": s["write_bytes"],
+            "rss_growth": s["rss_growth"]
+        })
+    if len(summary) > 0:
+        walls = list(structure_walls.values())
+        summary.append({
+            "stage": "total",
+            "structures": len(walls),
+            "calls": sum(s["calls"] for s in summary),
+            "wall": sum(walls),
+            "mean_wall": sum(walls) / len(walls),
+            "max_wall": max(walls),
+            "read_bytes": sum(s["read_bytes"] for s in summary),
+            "write_bytes": sum(s["write_bytes"] for s in summary),
+            "rss_growth": sum(s["rss_growth"] for s in summary)
+        })
+    return summary
+
+
+def format_summary(summary):
+    """Format the summary of summarize_records as a table."""
+    header = f"{'stage':<16s}{'structures':>11s}{'calls':>9s}{'total (s)':>11s}{'mean (s)':>10s}{'max (s)':>10s}" \
+             f"{'read (MB)':>11s}{'written (MB)':>14s}{'RSS growth (MB)':>17s}"
+    lines = [header]
+    for s in summary:
+        lines.append(f"{s['stage']:<16s}{s['structures']:>11d}{s['calls']:>9d}{s['wall']:>11.3f}{s['mean_wall']:>10.4f}"
+                     f"{s['max_wall']:>10.4f}{s['read_bytes'] / 2**20:>11.1f}{s['write_bytes'] / 2**20:>14.1f}"
+                     f"{s['rss_growth'] / 2**20:>17.1f}")
+    return "\n".join(lines)
+
+
+def write_profile(records, outroot, name: str="profile"):
+    """Write the stage records into {name}.csv and, with their summary by stage, into {name}.json under outroot.
+
+    Returns
+    -------
+    list of dict
+        The summary of summarize_records.
+    """
+    summary = summarize_records(records)
+    os.makedirs(outroot, exist_ok=True)
+    with open(os.path.join(outroot, f"{name}.json"), 'w') as f:
+        json.dump({"summary": summary, "records": records}, f, indent=1)
+    with open(os.path.join(outroot, f"{name}.csv"), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RECORD_FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+    return summary
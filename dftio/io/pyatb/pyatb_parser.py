@@ -4,6 +4,7 @@ import os
 import numpy as np
 from dftio.io.parse import Parser, ParserRegister
 from dftio.register import Register
+from dftio.utils import LazyList
 from dftio.data import _keys
 
 @ParserRegister.register("pyatb")
@@ -36,12 +37,15 @@ class PyatbParser(Parser):
             self,
             root,
             prefix,
+            cache_size: int = 8,
             **kwargs
             ):
-        super(PyatbParser, self).__init__(root, prefix)
-        self.raw_sys = [
-            dpdata.System(os.path.join(self.raw_datas[idx], 'pyatb', "STRU"), fmt="abacus/stru") for
-            idx in range(len(self.raw_datas))]
+        super(PyatbParser, self).__init__(root, prefix, **kwargs)
+        # the systems are read when first needed, and the last cache_size of them are kept.
+        self.raw_sys = LazyList(self._read_sys, len(self.raw_datas), maxsize=cache_size)
+
+    def _read_sys(self, idx):
+        return dpdata.System(os.path.join(self.raw_datas[idx], 'pyatb', "STRU"), fmt="abacus/stru")
 
     # essential
     def get_structure(self, idx):
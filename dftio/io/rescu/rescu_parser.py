@@ -20,7 +20,7 @@ Bohr2Angstrom = 0.52917721067
 @ParserRegister.register("rescu")
 class RescuParser(Parser):
     def __init__(self, root, prefix, **kwargs):
-        super(RescuParser, self).__init__(root, prefix)
+        super(RescuParser, self).__init__(root, prefix, **kwargs)
         # the root + prefix should locate the directory of the output file of each calculation
         # the list of path will be saved in self.raw_datas
 
@@ -0,0 +1,72 @@
+import logging
+from dftio.io.parse_manifest import scan_input
+log = logging.getLogger(__name__)
+
+
+def input_cost(path):
+    """Estimate the cost of parsing a DFT calculation folder or file by the bytes of its files.
+
+    The parse time is dominated by the CSR, TSHS or log files, whose size grows with the
+    number of orbitals and of neighbour blocks, so the size is a good enough proxy to order the work.
+    The parse command counts the bytes with scan_input, in the same walk as the fingerprint.
+    """
+    return scan_input(path, mode=None)[1]
+
+
+def cost_chunks(tasks, costs, num_workers: int, factor: int=2):
+    """Group the tasks into chunks dispatched to the worker pool, largest first.
+
+    The chunks are filled in order of decreasing cost up to remaining_cost / (factor * num_workers),
+    as in guided self-scheduling: a large task is a chunk of its own and starts first, so that no
+    worker is left with a large task at the end, while the small tasks are grouped to save the
+    dispatch overhead, in chunks that get smaller as the work runs out.
+
+    Parameters
+    ----------
+    tasks : list of int
+        The idx of the DFT files to parse.
+    costs : list of float
+        The estimated cost of every task, see input_cost.
+    num_workers : int
+        The number of worker processes.
+    factor : int
+        The number of chunks per worker that the remaining cost is divided into.
+
+    Returns
+    -------
+    list of list of int
+        The chunks, every task being in one of them.
+    """
+    order = sorted(range(len(tasks)), key=lambda i: costs[i], reverse=True)
+    remaining = float(sum(costs))
+    chunks, chunk, chunk_cost = [], [], 0.
+    for i in order:
+        chunk.append(tasks[i])
+        chunk_cost += costs[i]
+        if chunk_cost >= remaining / (factor * num_workers):
+            chunks.append(chunk)
+            remaining -= chunk_cost
+            chunk, chunk_cost = [], 0.
+    if len(chunk) > 0:
+        chunks.append(chunk)
+    return chunks
+
+
+def log_utilization(usage, wall_time, num_workers: int):
+    """Log the tasks, busy time and utilization of every worker.
+
+    Parameters
+    ----------
+    usage : dict
+        The (number of tasks, busy seconds) of every worker, by worker pid.
+    wall_time : float
+        The wall time of the pool in seconds.
+    num_workers : int
+        The number of worker processes, some of which may have got no task.
+    """
+    if len(usage) == 0 or wall_time <= 0:
+        return
+    for pid, (ntasks, busy) in sorted(usage.items()):
+        log.info(f"Worker {pid}: {ntasks} DFT files in {busy:.1f} s, {busy / wall_time:.0%} busy.")
+    total = sum(busy for _, busy in usage.values())
+    log.info(f"{num_workers} workers were {total / (num_workers * wall_time):.0%} busy over {wall_time:.1f} s.")
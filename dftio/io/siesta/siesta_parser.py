@@ -10,7 +10,9 @@ import os
 import numpy as np
 from collections import Counter
 from dftio.io.parse import Parser, ParserRegister, find_target_line
+from dftio.io.csr_blocks import CSRBlockExtractor
 from dftio.data import _keys
+from dftio.utils import LRUCache
 import sisl
 
 
@@ -20,9 +22,14 @@ class SiestaParser(Parser):
             self,
             root,
             prefix,
+            cache_size: int = 8,
             **kwargs
             ):
-        super(SiestaParser, self).__init__(root, prefix)
+        super(SiestaParser, self).__init__(root, prefix, **kwargs)
+        # The fdf contents, parsed metadata and sisl matrices of the recently parsed structures,
+        # so that the getters of one structure touch each of its files once.
+        # cache_size=0 disables the cache.
+        self._cache = LRUCache(maxsize=cache_size)
     
     @staticmethod
     def convert_kpoints_bohr_inv_to_twopi_over_a(kpoints_bohr_inv, lattice_const_a_angstrom):
@@ -51,15 +58,25 @@ class SiestaParser(Parser):
         return kpoints_twopi_over_a
 
     @staticmethod
-    def find_content(path, str_to_find, 
-                     for_system_label=False,
-                     for_Kpt_bands=False):
-        if for_system_label and for_Kpt_bands:
-            raise ValueError("for_system_label and for_Kpt_bands \
-                             cannot both be True at the same time.")
-        file_path = None
-        system_label_content = None
-        targeted_files = []
+    def read_files(path, for_Kpt_bands=False, known=None):
+        """Read the files searched by find_content, in the order of os.walk.
+
+        Parameters
+        ----------
+        path : str
+            The directory of the SIESTA calculation.
+        for_Kpt_bands : bool
+            Read all the text files instead of the fdf files only.
+        known : dict, optional
+            The {file_path: content} already read, which are not opened again.
+
+        Returns
+        -------
+        dict
+            {file_path: content}
+        """
+        known = known or {}
+        contents = {}
         for root, _, files in os.walk(path):
             for file in files:
                     if not for_Kpt_bands and not file.endswith('.fdf'):
@@ -78,21 +95,32 @@ class SiestaParser(Parser):
                             continue
                     
                     file_path = os.path.join(root, file)
+                    if file_path in known:
+                        contents[file_path] = known[file_path]
+                        continue
 
                     try:
                         with open(file_path, 'r') as f:
-                            content = f.read()
-                            # Search for the string in the content with case insensitivity
-                            # because SIESTA input files are case-insensitive.
-                            match = re.search(r'\b'+str_to_find+r'\b\s*(\S+)', content, re.IGNORECASE)
-                            if match:
-                                targeted_files.append(file_path)
-                                if for_system_label:
-                                    system_label_content = match.group(1)
+                            contents[file_path] = f.read()
                     except Exception as e:
                         print(f"Skipping file {file_path} due to error: {e}")
                         continue
-                                
+        return contents
+
+    @staticmethod
+    def search_content(contents, path, str_to_find, for_system_label=False):
+        """Search str_to_find in the {file_path: content} returned by read_files, see find_content."""
+        file_path = next(reversed(contents), None)
+        system_label_content = None
+        targeted_files = []
+        for candidate, content in contents.items():
+            # Search for the string in the content with case insensitivity
+            # because SIESTA input files are case-insensitive.
+            match = re.search(r'\b'+str_to_find+r'\b\s*(\S+)', content, re.IGNORECASE)
+            if match:
+                targeted_files.append(candidate)
+                if for_system_label:
+                    system_label_content = match.group(1)
         
         if for_system_label and system_label_content is None:
             print(f"Warning: Don't find {str_to_find} in {file_path}.\
@@ -110,52 +138,97 @@ class SiestaParser(Parser):
         
         return file_path, system_label_content   
 
+    @staticmethod
+    def find_content(path, str_to_find, 
+                     for_system_label=False,
+                     for_Kpt_bands=False):
+        if for_system_label and for_Kpt_bands:
+            raise ValueError("for_system_label and for_Kpt_bands \
+                             cannot both be True at the same time.")
+        contents = SiestaParser.read_files(path, for_Kpt_bands=for_Kpt_bands)
+        return SiestaParser.search_content(contents, path, str_to_find, for_system_label=for_system_label)
 
-    # essential
-    def get_structure(self,idx):
-        path = self.raw_datas[idx]
-        lattice_vectors,_ = SiestaParser.find_content(path= path,str_to_find='LatticeVectors')
-        struct,_ = SiestaParser.find_content(path= path,str_to_find='AtomicCoordinatesAndAtomicSpecies')
-        chemspecis,_ = SiestaParser.find_content(path= path,str_to_find='ChemicalSpeciesLabel')
-
-        with open(lattice_vectors, 'r') as file:
-            lines = file.readlines()
-        counter_start_end = []
-        for i in range(len(lines)):
-            if 'LatticeVectors' in lines[i].split():
-                counter_start_end.append(i)
-        assert len(counter_start_end) == 2, "LatticeVectors section not found or malformed."
-        # Extract lattice vectors
-        lattice_vec = np.array([lines[i].split()[0:3] for i in range(counter_start_end[0]+1, counter_start_end[1])], dtype=np.float32)
-
-        with open(struct, 'r') as file:
-            lines = file.readlines()
-        counter_start_end = []
-        for i in range(len(lines)):
-            if 'AtomicCoordinatesAndAtomicSpecies' in lines[i].split():
-                counter_start_end.append(i)
-        struct_xyz = np.array([lines[i].split()[0:3] for i in range(counter_start_end[0]+1, counter_start_end[1])], dtype=np.float32)
-        element_type = [lines[i].split()[3] for i in range(counter_start_end[0]+1, counter_start_end[1])]
-
-        with open(chemspecis, 'r') as file:
-            lines = file.readlines()
+    @staticmethod
+    def fdf_block(content, name):
+        """Split the lines of the %block name ... %endblock name section of an fdf file."""
+        lines = content.splitlines()
         counter_start_end = []
         for i in range(len(lines)):
-            if 'ChemicalSpeciesLabel' in lines[i].split():
+            if name in lines[i].split():
                 counter_start_end.append(i)
-        element_index = {}
-        for i in range(counter_start_end[0]+1, counter_start_end[1]):
-            element_index[int(lines[i].split()[0])] = lines[i].split()[1]
-        element_index_all = [element_index[int(e)] for e in element_type]
+        assert len(counter_start_end) >= 2, f"{name} section not found or malformed."
+        return [lines[i].split() for i in range(counter_start_end[0]+1, counter_start_end[1])]
+
+    def _cached(self, idx, name, load):
+        """Return the item name of structure idx, calling load() on the first access."""
+        entry = self._cache.get_or_set(idx, dict)
+        if name not in entry:
+            entry[name] = load()
+        return entry[name]
+
+    def _fdf_files(self, idx):
+        return self._cached(idx, "fdf", lambda: SiestaParser.read_files(self.raw_datas[idx]))
+
+    def _text_files(self, idx):
+        # the fdf files are a subset of the text files, and are not read twice
+        return self._cached(idx, "text", lambda: SiestaParser.read_files(
+            self.raw_datas[idx], for_Kpt_bands=True, known=self._fdf_files(idx)))
+
+    def _find_fdf(self, idx, str_to_find):
+        contents = self._fdf_files(idx)
+        file_path, _ = SiestaParser.search_content(contents, self.raw_datas[idx], str_to_find)
+        return contents[file_path]
+
+    def _system_label(self, idx):
+        def load():
+            _, system_label = SiestaParser.search_content(
+                self._fdf_files(idx), self.raw_datas[idx], 'SystemLabel', for_system_label=True)
+            return system_label
+        return self._cached(idx, "system_label", load)
+
+    def _structure_info(self, idx):
+        def load():
+            lattice_vec = np.array([line[0:3] for line in SiestaParser.fdf_block(
+                self._find_fdf(idx, 'LatticeVectors'), 'LatticeVectors')], dtype=np.float32)
+            atoms = SiestaParser.fdf_block(
+                self._find_fdf(idx, 'AtomicCoordinatesAndAtomicSpecies'), 'AtomicCoordinatesAndAtomicSpecies')
+            struct_xyz = np.array([line[0:3] for line in atoms], dtype=np.float32)
+            element_type = [int(line[3]) for line in atoms]
+            # species index -> (atomic number, symbol)
+            species = {int(line[0]): (line[1], line[2]) for line in SiestaParser.fdf_block(
+                self._find_fdf(idx, 'ChemicalSpeciesLabel'), 'ChemicalSpeciesLabel')}
+            return {"cell": lattice_vec, "pos": struct_xyz, "element_type": element_type, "species": species}
+        return self._cached(idx, "structure", load)
+
+    def _tshs(self, idx):
+        def load():
+            tshs = os.path.join(self.raw_datas[idx], self._system_label(idx) + ".TSHS")
+            if not os.path.exists(tshs):
+                raise FileNotFoundError("Hamiltonian file not found.")
+            # the Hamiltonian read from TSHS carries the overlap as well
+            return sisl.Hamiltonian.read(tshs)
+        return self._cached(idx, "tshs", load)
+
+    def _density_matrix(self, idx):
+        def load():
+            DM_path = os.path.join(self.raw_datas[idx], self._system_label(idx) + ".DM")
+            if not os.path.exists(DM_path):
+                raise FileNotFoundError("Density Matrix file not found.")
+            return sisl.DensityMatrix.read(DM_path)
+        return self._cached(idx, "density_matrix", load)
 
+    # essential
+    def get_structure(self,idx):
+        info = self._structure_info(idx)
+        element_index_all = [info["species"][e][0] for e in info["element_type"]]
 
         # struct = sisl.get_sile(struct).read_geometry()
         structure = {
             _keys.ATOMIC_NUMBERS_KEY: np.array(element_index_all, dtype=np.int32),
             _keys.PBC_KEY: np.array([True, True, True]) # abacus does not allow non-pbc structure
         }
-        structure[_keys.POSITIONS_KEY] = struct_xyz.astype(np.float32)[np.newaxis, :, :]
-        structure[_keys.CELL_KEY] = lattice_vec.astype(np.float32)[np.newaxis, :, :]
+        structure[_keys.POSITIONS_KEY] = info["pos"].astype(np.float32)[np.newaxis, :, :]
+        structure[_keys.CELL_KEY] = info["cell"].astype(np.float32)[np.newaxis, :, :]
 
         return structure
     
@@ -176,11 +249,7 @@ class SiestaParser(Parser):
         """
         
         # Check if WriteKbands is set to true in the SIESTA input file
-        RUN_file, _ = SiestaParser.find_content(path=self.raw_datas[idx],
-                                       str_to_find='WriteKbands',
-                                       for_Kpt_bands=False)
-        with open(RUN_file, 'r') as file:
-            lines = file.readlines()
+        lines = self._find_fdf(idx, 'WriteKbands').splitlines()
         for line in lines:
             if 'WriteKbands' in line.split():
                 if 'true' not in line.lower() or "t" not in line.lower():
@@ -188,21 +257,17 @@ class SiestaParser(Parser):
                                       Cannot extract k-points and eigenvalues.")
 
         # Determine log_file, system_label, and eigs_file(.bands)
-        log_file,_ = SiestaParser.find_content(path=self.raw_datas[idx], 
-                                       str_to_find='WELCOME',
-                                       for_Kpt_bands=True)
+        text_files = self._text_files(idx)
+        log_file,_ = SiestaParser.search_content(text_files, self.raw_datas[idx], 'WELCOME')
         assert os.path.exists(log_file), f"Log file {log_file} does not exist."
-        _,system_label = SiestaParser.find_content(path=self.raw_datas[idx], 
-                                           str_to_find='SystemLabel', 
-                                           for_system_label=True)
+        system_label = self._system_label(idx)
         assert system_label is not None, "SystemLabel not defined."
         eigs_file = os.path.join(self.raw_datas[idx], system_label + ".bands")
         assert os.path.exists(eigs_file), f"Eigenvalue file {eigs_file} does not exist."
 
         # Extract k-points from the log file
         kpts = []
-        with open(log_file, 'r') as file:
-            lines = file.readlines()
+        lines = text_files[log_file].splitlines(keepends=True)
         for i, line in enumerate(lines):
             if 'siesta: Band k vectors' in line:
                 for data_line in lines[i+2:]:
@@ -220,22 +285,18 @@ class SiestaParser(Parser):
         kpts = np.array(kpts) # in units of Bohr^-1
 
         # unit from Bohr^-1 to 2π/a
-        lattice_vec_path,_ = SiestaParser.find_content(path=self.raw_datas[idx],str_to_find='LatticeVectors')
-        with open(lattice_vec_path, 'r') as file:
-            lines = file.readlines()
-        counter_start_end = []
-        for i in range(len(lines)):
-            if 'LatticeVectors' in lines[i].split():
-                counter_start_end.append(i)
-        lattice_vec = np.array([lines[i].split()[0:3] for i in range(counter_start_end[0]+1, counter_start_end[1])], dtype=np.float32)
+        lattice_vec = self._structure_info(idx)["cell"]
         kpts = SiestaParser.convert_kpoints_bohr_inv_to_twopi_over_a(kpts, lattice_vec) # in units of 2π/a
         
 
         # Extract eigenvalues from the eigs_file(.bands)
         eigs = []
         eigs_k = [] # eigenvalues for each k-point
-        with open(eigs_file, 'r') as file:
-            lines = file.readlines()
+        if eigs_file in text_files:
+            lines = text_files[eigs_file].splitlines(keepends=True)
+        else:
+            with open(eigs_file, 'r') as file:
+                lines = file.readlines()
         ## Determine the Gamma-only case or band case
         isGamma :bool = None
         start_line : int = None
@@ -284,13 +345,11 @@ class SiestaParser(Parser):
     # essential
     def get_basis(self,idx):
         # {"Si": "2s2p1d"}
-        path = self.raw_datas[idx]
-        _,system_label = SiestaParser.find_content(path=path,str_to_find='SystemLabel',for_system_label=True)
-        if system_label is None:
-            system_label = "siesta"
+        return dict(self._cached(idx, "basis", lambda: self._read_basis(idx)))
+
+    def _read_basis(self, idx):
+        system_label = self._system_label(idx)
 
-        # tshs = self.raw_datas[idx]+ "/"+system_label+".TSHS"
-        # hamil =  sisl.Hamiltonian.read(tshs)
         ORB_INDX = self.raw_datas[idx]+ "/"+system_label+".ORB_INDX"
 
         with open(ORB_INDX , 'r') as file:
@@ -334,46 +393,12 @@ class SiestaParser(Parser):
 
     # essential
     def get_blocks(self, idx, hamiltonian: bool = False, overlap: bool = False, density_matrix: bool = False):
-        path = self.raw_datas[idx]
-        _,system_label = SiestaParser.find_content(path=self.raw_datas[idx],
-                                           str_to_find='SystemLabel', 
-                                           for_system_label=True)
-        if system_label is None:
-            system_label = "siesta"
         hamiltonian_dict, overlap_dict, density_matrix_dict = None, None, None
-        struct,_ = SiestaParser.find_content(path= path,
-                                     str_to_find='AtomicCoordinatesAndAtomicSpecies')
-        chemspecis,_ = SiestaParser.find_content(path= path,
-                                         str_to_find='ChemicalSpeciesLabel')
+        info = self._structure_info(idx)
+        element = [info["species"][e][1] for e in info["element_type"]]
         
-        with open(struct, 'r') as file:
-            lines = file.readlines()
-        counter_start_end = []
-        for i in range(len(lines)):
-            line = lines[i].split()
-            if 'AtomicCoordinatesAndAtomicSpecies' in line:
-                counter_start_end.append(i)
-        element_type = [lines[i].split()[3] for i in range(counter_start_end[0]+1, counter_start_end[1])]
-        na = len(element_type)
-
-        with open(chemspecis, 'r') as file:
-            lines = file.readlines()
-        counter_start_end = []
-        for i in range(len(lines)):
-            if 'ChemicalSpeciesLabel' in lines[i].split():
-                counter_start_end.append(i)
-        element_symbol = {}
-        for i in range(counter_start_end[0]+1, counter_start_end[1]):
-            element_symbol[int(lines[i].split()[0])] = lines[i].split()[2]
-        element = [element_symbol[int(e)] for e in element_type]
-        
-        tshs = path+ "/"+system_label+".TSHS"
-        if os.path.exists(tshs):
-            hamil =  sisl.Hamiltonian.read(tshs)
-        else:
-            raise FileNotFoundError("Hamiltonian file not found.")        
+        hamil = self._tshs(idx)
         site_norbits = np.array([hamil.atoms[i].no for i in range(hamil.na)])
-        site_norbits_cumsum = site_norbits.cumsum()
 
         basis = self.get_basis(idx)      
         spinful = False #TODO: add support for spinful
@@ -388,11 +413,6 @@ class SiestaParser(Parser):
         Rvec = np.array(Rvec_list)
 
 
-        hamiltonian_dict = {}
-        overlap_dict = {}
-        density_matrix_dict = {}
-
-
         l_dict = {}
         # count norbs
         count = {}
@@ -404,139 +424,51 @@ class SiestaParser(Parser):
                 count[at] += n * (2*anglrMId[o]+1)
                 l_dict[at] += [anglrMId[o]] * n
 
-        cut_tol_ham = 1e-5
-        cut_tol_ovp = 1e-5
-        cut_tol_dm = 1e-5
-
+        cut_tol = 1e-5
+        species_index = {symbol: k for k, symbol in enumerate(l_dict.keys())}
+        extractor = CSRBlockExtractor(
+            site_norbits=site_norbits,
+            element=[species_index[e] for e in element],
+            orbital_types_dict={species_index[symbol]: l for symbol, l in l_dict.items()},
+            orbital_transform=SIESTA2DFTIO,
+            spinful=spinful,
+            threshold=cut_tol
+            )
 
         if hamiltonian:
-           
-            hamil_csr = hamil.tocsr()
-            hamil_blocks = []
-            hamil_mask = []
-            for i in range(Rvec.shape[0]):
-                off = hamil.geometry.sc_index(Rvec[i]) * hamil.geometry.no
-                if np.abs(hamil_csr[:,off:off+hamil.geometry.no].toarray()).max() > cut_tol_ham:
-                    hamil_mask.append(True)
-                    hamil_blocks.append(hamil_csr[:,off:off+hamil.geometry.no].toarray())
-                else:
-                    hamil_mask.append(False)
-
-            hamil_mask = np.array(hamil_mask)
-            hamil_Rvec = Rvec[hamil_mask]
-            hamil_blocks = np.stack(hamil_blocks).astype(np.float32)
-
-            for i in range(na):
-                si = element[i]
-                for j in range(na):
-                    sj = element[j]
-                    keys = map(lambda x: "_".join([str(i),str(j),str(x[0].astype(np.int32)),\
-                                str(x[1].astype(np.int32)),str(x[2].astype(np.int32))]), hamil_Rvec)
-                    i_norbs = site_norbits[i]
-                    i_orbs_start =site_norbits_cumsum[i] - i_norbs
-                    j_norbs = site_norbits[j]
-                    j_orbs_start =site_norbits_cumsum[j] - j_norbs
-                    block = self.transform(hamil_blocks[:,i_orbs_start:i_orbs_start+i_norbs,j_orbs_start:j_orbs_start+j_norbs],\
-                                            l_dict[si], l_dict[sj])
-                    # block = hamil_blocks[:,i_orbs_start:i_orbs_start+i_norbs,j_orbs_start:j_orbs_start+j_norbs]
-                    block_mask = np.abs(block).max(axis=(1,2)) > cut_tol_ham
-
-                    if np.any(block_mask):
-                        keys = list(keys)
-                        keys = [keys[k] for k,t in enumerate(block_mask) if t]
-                        hamiltonian_dict.update(dict(zip(keys, block[block_mask])))
+            hamiltonian_dict = self._extract_blocks(hamil, extractor, Rvec)
             
         if overlap:
-            if os.path.exists(tshs):
-                ovp =  sisl.Overlap.read(tshs)
-            else:
-                raise FileNotFoundError("Overlap file not found.")
-            
-            ovp_csr = ovp.tocsr()
-            ovp_blocks = []
-            ovp_mask = []
-            for i in range(Rvec.shape[0]):
-                off = ovp.geometry.sc_index(Rvec[i]) * ovp.geometry.no
-                if np.abs(ovp_csr[:,off:off+ovp.geometry.no].toarray()).max() > cut_tol_ovp:
-                    ovp_mask.append(True)
-                    ovp_blocks.append(ovp_csr[:,off:off+ovp.geometry.no].toarray())
-                else:
-                    ovp_mask.append(False)
-                
-            ovp_blocks = np.stack(ovp_blocks).astype(np.float32)
-            ovp_mask = np.array(ovp_mask)
-            ovp_Rvec = Rvec[ovp_mask]
-
-            for i in range(na):
-                si = element[i]
-                for j in range(na):
-                    sj = element[j]
-                    keys = map(lambda x: "_".join([str(i),str(j),str(x[0].astype(np.int32)),\
-                                str(x[1].astype(np.int32)),str(x[2].astype(np.int32))]), ovp_Rvec)
-                    i_norbs = site_norbits[i]
-                    i_orbs_start =site_norbits_cumsum[i] - i_norbs
-                    j_norbs = site_norbits[j]
-                    j_orbs_start =site_norbits_cumsum[j] - j_norbs
-                    block = self.transform(ovp_blocks[:,i_orbs_start:i_orbs_start+i_norbs,j_orbs_start:j_orbs_start+j_norbs],\
-                                             l_dict[si], l_dict[sj])
-                    # block = ovp_blocks[:,i_orbs_start:i_orbs_start+i_norbs,j_orbs_start:j_orbs_start+j_norbs]
-                    block_mask = np.abs(block).max(axis=(1,2)) > cut_tol_ovp
-
-                    if np.any(block_mask):
-                        keys = list(keys)
-                        keys = [keys[k] for k,t in enumerate(block_mask) if t]
-                        overlap_dict.update(dict(zip(keys, block[block_mask])))
+            overlap_dict = self._extract_blocks(hamil, extractor, Rvec, dim=hamil.S_idx)
 
         if density_matrix:
-            _,system_label = SiestaParser.find_content(path=self.raw_datas[idx],
-                                               str_to_find='SystemLabel', 
-                                               for_system_label=True)
-            if system_label is None:
-                system_label = "siesta"
-            DM_path = self.raw_datas[idx]+ "/"+system_label+".DM"
-            if os.path.exists(DM_path):
-                DM =  sisl.DensityMatrix.read(DM_path)
-            else:
-                raise FileNotFoundError("Density Matrix file not found.")
-            
-            DM_csr = DM.tocsr()
-            DM_blocks = []
-            DM_mask = []
-            for i in range(Rvec.shape[0]):
-                off = DM.geometry.sc_index(Rvec[i]) * DM.no
-                if np.abs(DM_csr[:,off:off+DM.geometry.no].toarray()).max() > cut_tol_dm:
-                    DM_mask.append(True)
-                    DM_blocks.append(DM_csr[:,off:off+DM.geometry.no].toarray())
-                else:
-                    DM_mask.append(False)
-                
-            DM_blocks = np.stack(DM_blocks).astype(np.float32)
-            DM_mask = np.array(DM_mask)
-            DM_Rvec = Rvec[DM_mask]
-
-            for i in range(na):
-                si = element[i]
-                for j in range(na):
-                    sj = element[j]
-                    keys = map(lambda x: "_".join([str(i),str(j),str(x[0].astype(np.int32)),\
-                                str(x[1].astype(np.int32)),str(x[2].astype(np.int32))]), DM_Rvec)
-                    i_norbs = site_norbits[i]
-                    i_orbs_start =site_norbits_cumsum[i] - i_norbs
-                    j_norbs = site_norbits[j]
-                    j_orbs_start =site_norbits_cumsum[j] - j_norbs
-                    block = self.transform(DM_blocks[:,i_orbs_start:i_orbs_start+i_norbs,j_orbs_start:j_orbs_start+j_norbs],\
-                                            l_dict[si], l_dict[sj])
-                    
-                    block_mask = np.abs(block).max(axis=(1,2)) > cut_tol_dm
+            density_matrix_dict = self._extract_blocks(self._density_matrix(idx), extractor, Rvec)
 
-                    if np.any(block_mask):
-                        keys = list(keys)
-                        keys = [keys[k] for k,t in enumerate(block_mask) if t]
-                        density_matrix_dict.update(dict(zip(keys, block)))
-
-            
-        
         return [hamiltonian_dict], [overlap_dict], [density_matrix_dict]
+
+    def _extract_blocks(self, matrix, extractor, Rvec, dim=0):
+        """Extract the atomic blocks of a sisl sparse orbital matrix at the lattice vectors Rvec.
+
+        The nonzeros of the (no, no * n_s) supercell CSR matrix are assigned to their R vector and
+        handed to the extractor in one pass, without densifying the matrix of any R.
+        dim selects the component of the matrix, e.g. matrix.S_idx for the overlap.
+        """
+        csr = matrix.tocsr(dim)
+        no = matrix.geometry.no
+        # supercell index -> position in Rvec, -1 for the supercells that are not parsed
+        cell_position = -np.ones(matrix.geometry.n_s, dtype=np.int64)
+        cell_position[[matrix.geometry.sc_index(R) for R in Rvec]] = np.arange(len(Rvec))
+
+        rows = np.repeat(np.arange(csr.shape[0]), np.diff(csr.indptr))
+        cells = cell_position[csr.indices // no]
+        mask = cells >= 0
+        return extractor.extract_coo(
+            data=csr.data[mask].astype(np.float32),
+            rows=rows[mask],
+            cols=csr.indices[mask] % no,
+            cells=cells[mask],
+            R_list=Rvec
+            )
     
 
     
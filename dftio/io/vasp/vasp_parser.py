@@ -11,6 +11,7 @@ import numpy as np
 from dftio.io.parse import Parser, ParserRegister, find_target_line
 from dftio.data import _keys
 from dftio.register import Register
+from dftio.utils import LazyList
 import logging
 
 log = logging.getLogger(__name__)
@@ -20,12 +21,17 @@ class VASPParser(Parser):
             self,
             root,
             prefix,
+            cache_size: int = 8,
             **kwargs
             ):
-        super(VASPParser, self).__init__(root, prefix)
+        super(VASPParser, self).__init__(root, prefix, **kwargs)
 
-        self.raw_sys = [read(self.raw_datas[idx]+'/POSCAR') for idx in range(len(self.raw_datas))]
+        # the POSCAR are read when first needed, and the last cache_size of them are kept.
+        self.raw_sys = LazyList(self._read_sys, len(self.raw_datas), maxsize=cache_size)
         log.warning("VASP parser only supports the static (SCF or NSCF) calculations. MD and RELAX is not supported yet.")
+
+    def _read_sys(self, idx):
+        return read(self.raw_datas[idx]+'/POSCAR')
     
     # essential
     def get_structure(self, idx):
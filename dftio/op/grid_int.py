@@ -1,13 +1,25 @@
 from ..datastruct import PrimitiveFieldsNeighborList
+import hashlib
+import os
 import torch
 import ase.data as data
-from torch_scatter import scatter_sum
 import numpy as np
 
 atomic_numbers_r = dict(zip(data.atomic_numbers.values(), data.atomic_numbers.keys()))
 
 class SingleGridIntegrator:
-    def __init__(self, atomic_numbers, pbc, cell, coordinates, grids, atomic_basis, skin=0.0, sorted=False, use_scaled_positions=False, dtype=torch.float32) -> None:
+    """Integrate the atomic basis functions, optionally weighted, on a set of grid points.
+
+    The grid points are processed in tiles of ``chunk_size`` points: the basis functions are only
+    evaluated for the (grid, atom) pairs of one tile at a time, and summed into the preallocated
+    result. ``chunk_size=None`` processes all the grid points at once.
+
+    With ``precompute=True`` the basis functions are tabulated on the grid once, as a sparse
+    [ngrid, norb] operator kept in memory, and every integration is a sparse matrix product. With a
+    ``cache_dir`` the operator is also saved to, and loaded from, a file named by the hash of the
+    structure, the grid and the basis.
+    """
+    def __init__(self, atomic_numbers, pbc, cell, coordinates, grids, atomic_basis, skin=0.0, sorted=False, use_scaled_positions=False, dtype=torch.float32, chunk_size=16384, precompute=False, cache_dir=None) -> None:
         self.atomic_basis = atomic_basis
         cutoffs = [self.atomic_basis[atomic_numbers_r[i]].rcut for i in atomic_numbers]
         self.nblist = PrimitiveFieldsNeighborList(cutoffs=cutoffs, sorted=sorted, skin=skin, use_scaled_positions=use_scaled_positions)
@@ -16,63 +28,150 @@ class SingleGridIntegrator:
         self.cell = torch.as_tensor(cell, dtype=dtype)
         self.coordinates = torch.as_tensor(coordinates, dtype=dtype)
         self.grids = torch.as_tensor(grids, dtype=dtype)
-        # generate index, (grid, atom)
-        self.index = [[],[]]
         self.dtype = dtype
-        self.cell_shift = []
+        self.chunk_size = chunk_size
 
         self.nblist.update(pbc, cell, coordinates, grids)
 
-        for i in range(len(self.nblist.neighbors)):
-            self.index[0] += [i]*len(self.nblist.neighbors[i])
-            self.index[1] += self.nblist.neighbors[i].tolist()
-            self.cell_shift.append(self.nblist.displacements[i])
+        # generate index, (grid, atom), from the CSR arrays of the neighbor list
+        grid_index, atom_index, cell_shift = self.nblist.get_pairs()
+        self.index = torch.from_numpy(np.stack([grid_index, atom_index]).astype(np.int64))
+        self.cell_shift = torch.from_numpy(cell_shift.astype(np.int32))
+        # the pairs of the grid points g0:g1 are the pairs indptr[g0]:indptr[g1]
+        self.indptr = self.nblist.indptr
 
-        self.index = torch.tensor(self.index, dtype=torch.long)
-        self.cell_shift = torch.from_numpy(np.concatenate(self.cell_shift, axis=0, dtype=np.int32))
+        # the position of the orbitals of each atom in the weights, ordered by (atom index, angular momentum, magnetic momentum)
+        self.norbs = [self.atomic_basis[atomic_numbers_r[int(i)]].irreps.dim for i in self.atomic_numbers]
+        self.orbital_offsets = torch.cumsum(torch.tensor([0]+self.norbs), dim=0)[:-1]
 
-    def integrate(self, weights=None):
-        
+        self.use_scaled_positions = use_scaled_positions
+        self.tables = None
+        if precompute or cache_dir is not None:
+            self.tabulate(cache_dir=cache_dir)
+
+    def _chunks(self):
+        """Yield the grid points g0:g1 of each tile."""
         ngrid = len(self.grids)
-        dtype = weights.dtype if weights is not None else self.dtype
-        results = torch.zeros(ngrid, dtype=dtype)
-        norbs = [self.atomic_basis[atomic_numbers_r[int(i)]].irreps.dim for i in self.atomic_numbers]
-        cnorbs = torch.cumsum(torch.tensor([0]+norbs), dim=0)[:-1]
+        chunk_size = self.chunk_size or max(ngrid, 1)
+        for g0 in range(0, ngrid, chunk_size):
+            yield g0, min(g0 + chunk_size, ngrid)
+
+    def _basis_chunk(self, g0, g1):
+        """Evaluate the basis functions on the (grid, atom) pairs of the grid points g0:g1.
+
+        Yields, element by element, the grid index relative to g0 and the atom index of the pairs,
+        and the values of the basis functions of the atoms, shaped [npairs, norb].
+        """
+        p0, p1 = int(self.indptr[g0]), int(self.indptr[g1])
+        grid_index, atom_index = self.index[0][p0:p1], self.index[1][p0:p1]
+        cell_shift = self.cell_shift[p0:p1]
+        pair_numbers = self.atomic_numbers[atom_index]
         for element in self.atomic_basis:
-            # integrate over element i
-            mask = self.atomic_numbers[self.index[1]].eq(data.atomic_numbers[element])
-            rel_pos = self.coordinates[self.index[1][mask]] - self.grids[self.index[0][mask]] + self.cell_shift[mask].to(self.dtype) @ self.cell
-            if weights is not None:
-                
-                assert len(weights) == sum(norbs) and len(weights.shape) == 1
-                # here we assume that weights are arranged in one dimensional array, where the orders prioritize (atom index, angular momentum, magnetic momentum)
-                weights_mask = torch.zeros(len(weights), dtype=torch.bool)
-                
-                for i in cnorbs[self.atomic_numbers.eq(data.atomic_numbers[element])]:
-                    weights_mask[i:i+self.atomic_basis[element].irreps.dim] = True
-                
-                # turn the index of one element into the element order index
-                n_eatoms = self.atomic_numbers.eq(data.atomic_numbers[element]).sum()
-                convert_mask = -torch.ones_like(self.atomic_numbers)
-                convert_mask[self.atomic_numbers.eq(data.atomic_numbers[element])] = torch.arange(n_eatoms)
-
-                results += scatter_sum(
-                    self.atomic_basis[element](rel_pos) * weights[weights_mask].reshape(-1, self.atomic_basis[element].irreps.dim)[convert_mask[self.index[1][mask]]], # the first term shaped [nrel_pos, norb]
-                    self.index[0][mask],
-                    dim=0,
-                    dim_size=ngrid
-                ).sum(-1)
-            else:
-
-                results += scatter_sum(
-                    self.atomic_basis[element](rel_pos),
-                    self.index[0][mask],
-                    dim=0,
-                    dim_size=ngrid
-                ).sum(-1)
-        
+            mask = pair_numbers.eq(data.atomic_numbers[element])
+            if not mask.any():
+                continue
+            e_grid, e_atom = grid_index[mask], atom_index[mask]
+            rel_pos = self.coordinates[e_atom] - self.grids[e_grid] + cell_shift[mask].to(self.dtype) @ self.cell
+            yield e_grid - g0, e_atom, self.atomic_basis[element](rel_pos)
+
+    def _tabulate_chunk(self, g0, g1):
+        """The values of all the orbitals on the grid points g0:g1, as a sparse CSR [g1-g0, norb] matrix.
+
+        The orbitals are ordered as the weights, the images of an atom around a grid point add up on
+        the columns of its orbitals.
+        """
+        rows, cols, vals = [], [], []
+        for local_grid, atom_index, values in self._basis_chunk(g0, g1):
+            orbitals = self.orbital_offsets[atom_index].unsqueeze(-1) + torch.arange(values.shape[-1])
+            rows.append(local_grid.unsqueeze(-1).expand_as(orbitals).reshape(-1))
+            cols.append(orbitals.reshape(-1))
+            vals.append(values.reshape(-1))
+        if not vals:
+            return torch.sparse_coo_tensor(torch.zeros((2, 0), dtype=torch.long), torch.zeros(0, dtype=self.dtype),
+                                           (g1 - g0, sum(self.norbs))).to_sparse_csr()
+        return torch.sparse_coo_tensor(torch.stack([torch.cat(rows), torch.cat(cols)]), torch.cat(vals),
+                                       (g1 - g0, sum(self.norbs))).coalesce().to_sparse_csr()
+
+    def fingerprint(self):
+        """A hash of the structure, the grid, the tiles and the basis, the key of the cached operator.
+
+        The basis functions are identified by their values at a few fixed points.
+        """
+        sha = hashlib.sha256()
+        for array in [self.atomic_numbers, self.cell, self.coordinates, self.grids]:
+            sha.update(array.numpy().tobytes())
+        sha.update(repr((np.asarray(self.pbc).tolist(), self.use_scaled_positions, self.chunk_size, str(self.dtype))).encode())
+        probe = torch.linspace(-1.0, 1.0, 24, dtype=self.dtype).reshape(8, 3) * 2.0
+        for element in sorted(self.atomic_basis):
+            sha.update(element.encode())
+            sha.update(repr(self.atomic_basis[element].rcut).encode())
+            sha.update(torch.as_tensor(self.atomic_basis[element](probe)).detach().numpy().tobytes())
+        return sha.hexdigest()
+
+    def tabulate(self, cache_dir=None):
+        """Tabulate the basis functions on the grid, tile by tile, for the following integrations.
+
+        Parameters
+        ----------
+        cache_dir : str, optional
+            The directory of the cached operators, the operator is loaded from it when it was
+            tabulated before for the same structure, grid and basis, and saved to it otherwise.
+
+        Returns
+        -------
+        list of torch.Tensor
+            The sparse tables of the tiles of grid points.
+        """
+        path = None
+        if cache_dir is not None:
+            path = os.path.join(cache_dir, f"grid_basis_{self.fingerprint()}.pt")
+            if os.path.exists(path):
+                self.tables = torch.load(path, weights_only=True)
+                return self.tables
+
+        self.tables = [self._tabulate_chunk(g0, g1) for g0, g1 in self._chunks()]
+        if path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            torch.save(self.tables, path + ".tmp")
+            os.replace(path + ".tmp", path)
+        return self.tables
+
+    def integrate_batch(self, weights):
+        """Integrate the basis functions weighted by the coefficients of several states.
+
+        The basis functions are tabulated once per tile of grid points, or taken from the tables of
+        ``tabulate``, and contracted with all the states by a single sparse matrix product.
+
+        Parameters
+        ----------
+        weights : torch.Tensor
+            The coefficients of the states, shaped [nstates, norb], the orbitals ordered by (atom index,
+            angular momentum, magnetic momentum).
+
+        Returns
+        -------
+        torch.Tensor
+            The weighted sums of the basis functions on the grid, shaped [nstates, ngrid].
+        """
+        assert len(weights.shape) == 2 and weights.shape[1] == sum(self.norbs)
+        results = torch.zeros(weights.shape[0], len(self.grids), dtype=weights.dtype)
+        weights_t = weights.T
+        for i, (g0, g1) in enumerate(self._chunks()):
+            table = self.tables[i] if self.tables is not None else self._tabulate_chunk(g0, g1)
+            dtype = torch.promote_types(table.dtype, weights.dtype)
+            results[:, g0:g1] = (table.to(dtype) @ weights_t.to(dtype)).T
         return results
 
+    def integrate(self, weights=None):
+        
+        dtype = weights.dtype if weights is not None else self.dtype
+        if weights is not None:
+            assert len(weights) == sum(self.norbs) and len(weights.shape) == 1
+        else:
+            weights = torch.ones(sum(self.norbs), dtype=dtype)
+
+        return self.integrate_batch(weights.unsqueeze(0))[0]
+
 
 
 class DoubleGridIntegrator:
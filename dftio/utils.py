@@ -1,7 +1,10 @@
 from typing import (
+    Callable,
     Dict,
     List
 )
+from collections import OrderedDict
+from collections.abc import Sequence
 import logging
 
 log = logging.getLogger(__name__)
@@ -30,4 +33,56 @@ def j_must_have(
         else:
             raise RuntimeError(f"json database must provide key {key}")
     else:
-        return jdata[key]
\ No newline at end of file
+        return jdata[key]
+
+
+class LRUCache(OrderedDict):
+    """A dict holding at most maxsize items, the least recently used item is evicted first.
+
+    maxsize=None keeps every item and maxsize=0 disables the cache.
+    """
+
+    def __init__(self, maxsize: int = 8):
+        super(LRUCache, self).__init__()
+        self.maxsize = maxsize
+
+    def get_or_set(self, key, factory):
+        """Return the item of key, calling factory() to create it on a miss."""
+        if key in self:
+            self.move_to_end(key)
+            return self[key]
+        value = factory()
+        if self.maxsize != 0:
+            self[key] = value
+            if self.maxsize is not None and len(self) > self.maxsize:
+                self.popitem(last=False)
+        return value
+
+    def __reduce__(self):
+        # the cached items are not shipped to the worker processes
+        return (self.__class__, (self.maxsize,))
+
+
+class LazyList(Sequence):
+    """A read-only list whose items are created by loader(idx) on first access.
+
+    The items are kept in an LRUCache of maxsize items, so creating the list costs nothing and only
+    the items that are accessed are loaded, e.g. in the worker process they are assigned to.
+    """
+
+    def __init__(self, loader: Callable, length: int, maxsize: int = 8):
+        self.loader = loader
+        self.length = length
+        self._cache = LRUCache(maxsize=maxsize)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self.length))]
+        if idx < 0:
+            idx += self.length
+        if not 0 <= idx < self.length:
+            raise IndexError(f"index {idx} is out of range for {self.length} items.")
+        return self._cache.get_or_set(idx, lambda: self.loader(idx))
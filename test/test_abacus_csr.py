@@ -0,0 +1,137 @@
+import warnings
+import pytest
+import numpy as np
+from scipy.sparse import csr_matrix, random as sparse_random
+from dftio.io.abacus.abacus_parser import AbacusParser
+from dftio.io.abacus.abacus_csr import CSRFileReader
+from dftio.io.csr_blocks import CSRBlockExtractor
+from dftio.constants import ABACUS2DFTIO
+
+
+def dense_reference(mat, site_norbits, orbital_types_dict, element, factor, spinful):
+    """The per-site-pair loop used by AbacusParser.parse_matrix before vectorization."""
+    site_norbits_cumsum = np.cumsum(site_norbits)
+    out = {}
+    for i in range(len(site_norbits)):
+        for j in range(len(site_norbits)):
+            block = mat[(site_norbits_cumsum[i] - site_norbits[i]) * (1 + spinful):site_norbits_cumsum[i] * (1 + spinful),
+                        (site_norbits_cumsum[j] - site_norbits[j]) * (1 + spinful):site_norbits_cumsum[j] * (1 + spinful)]
+            if abs(block).max() < 1e-10:
+                continue
+            if not spinful:
+                block = AbacusParser.transform(None, block, orbital_types_dict[element[i]], orbital_types_dict[element[j]])
+            else:
+                block = block.reshape((site_norbits[i], 2, site_norbits[j], 2))
+                block = block.transpose((1, 0, 3, 2)).reshape((2 * site_norbits[i], 2 * site_norbits[j]))
+                block = AbacusParser.transform(None, block, orbital_types_dict[element[i]] * 2,
+                                               orbital_types_dict[element[j]] * 2)
+            out[f"{i}_{j}_0_0_1"] = block * factor
+    return out
+
+
+@pytest.mark.parametrize("spinful", [False, True])
+def test_csr_block_extractor_matches_dense(spinful):
+    orbital_types_dict = {14: [0, 0, 1, 1, 2], 1: [0, 1]}
+    element = np.array([14, 1, 14, 1, 1])
+    site_norbits = np.array([13 if e == 14 else 4 for e in element])
+    norbits = int(site_norbits.sum()) * (1 + spinful)
+
+    mat = sparse_random(norbits, norbits, density=0.05, format="csr", random_state=0, dtype=np.float32)
+    if spinful:
+        mat = (mat + 1j * sparse_random(norbits, norbits, density=0.05, format="csr", random_state=1)).astype(np.complex64)
+    mat = mat.tocsr()
+    mat.sort_indices()
+
+    extractor = CSRBlockExtractor(site_norbits=site_norbits, element=element,
+                                  orbital_types_dict=orbital_types_dict, orbital_transform=ABACUS2DFTIO,
+                                  spinful=spinful)
+    blocks = extractor.extract(mat.data, mat.indices, mat.indptr, R=[0, 0, 1], factor=13.605698)
+    reference = dense_reference(mat.toarray(), site_norbits, orbital_types_dict, element, 13.605698, spinful)
+
+    assert list(blocks.keys()) == list(reference.keys())
+    for key in reference:
+        assert blocks[key].dtype == reference[key].dtype
+        assert np.allclose(blocks[key], reference[key], atol=1e-6)
+
+
+def write_csr_file(path, steps, norbits, spinful=False, with_step_header=True):
+    """Write matrices in the ABACUS data-*R-sparse_SPIN0.csr layout, steps is a list of {R: csr_matrix}."""
+    with open(path, "w") as f:
+        for step, matrices in enumerate(steps):
+            if with_step_header:
+                f.write(f"STEP: {step}\n")
+            f.write(f"Matrix Dimension of H(R): {norbits}\n")
+            f.write(f"Matrix number of H(R): {len(matrices)}\n")
+            for R, mat in matrices.items():
+                f.write(f"{R[0]} {R[1]} {R[2]} {mat.nnz}\n")
+                if mat.nnz == 0:
+                    continue
+                if spinful:
+                    f.write(" " + " ".join(f"({v.real:.8e},{v.imag:.8e})" for v in mat.data) + "\n")
+                else:
+                    f.write(" " + " ".join(f"{v:.8e}" for v in mat.data) + "\n")
+                f.write(" " + " ".join(map(str, mat.indices)) + "\n")
+                f.write(" " + " ".join(map(str, mat.indptr)) + "\n")
+
+
+@pytest.mark.parametrize("spinful", [False, True])
+def test_csr_file_reader_random_access(tmp_path, spinful):
+    norbits = 12
+    dtype = np.complex64 if spinful else np.float32
+    steps = []
+    for step in range(3):
+        matrices = {}
+        for k, R in enumerate([(0, 0, 0), (1, 0, -1), (0, 1, 0)]):
+            mat = sparse_random(norbits, norbits, density=0.3, format="csr", random_state=10 * step + k)
+            if spinful:
+                mat = mat - 1j * sparse_random(norbits, norbits, density=0.3, format="csr", random_state=10 * step + k)
+            if R == (0, 1, 0):
+                mat = csr_matrix((norbits, norbits))
+            matrices[R] = mat.astype(dtype).tocsr()
+        steps.append(matrices)
+
+    path = tmp_path / "data-HR-sparse_SPIN0.csr"
+    write_csr_file(path, steps, norbits, spinful=spinful)
+
+    with CSRFileReader(str(path), spinful=spinful) as reader:
+        assert reader.steps == [0, 1, 2]
+        for step in [2, 0, 1]:
+            dim, matrices = reader.read_step(step)
+            assert dim == norbits
+            assert [tuple(R) for R, _, _, _ in matrices] == [(0, 0, 0), (1, 0, -1)]
+            for R, data, indices, indptr in matrices:
+                ref = steps[step][tuple(R)]
+                assert data.dtype == dtype
+                assert np.allclose(csr_matrix((data, indices, indptr), shape=(dim, dim)).toarray(), ref.toarray(), atol=1e-6)
+        with pytest.raises(ValueError):
+            reader.read_step(3)
+
+
+def test_csr_file_reader_without_step_header(tmp_path):
+    mat = sparse_random(6, 6, density=0.5, format="csr", random_state=0, dtype=np.float32)
+    path = tmp_path / "data-SR-sparse_SPIN0.csr"
+    write_csr_file(path, [{(0, 0, 0): mat}], 6, with_step_header=False)
+
+    with CSRFileReader(str(path)) as reader:
+        assert reader.steps == [0]
+        _, matrices = reader.read_step(0)
+        assert np.allclose(matrices[0][1], mat.data)
+
+
+def test_csr_file_reader_corrupted(tmp_path):
+    mat = sparse_random(6, 6, density=0.5, format="csr", random_state=0, dtype=np.float32)
+    path = tmp_path / "data-SR-sparse_SPIN0.csr"
+    write_csr_file(path, [{(0, 0, 0): mat}], 6)
+    content = path.read_bytes()
+
+    # the row pointer line is cut by a killed run
+    path.write_bytes(content[:content.rstrip().rfind(b" ")] + b"\n")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        with CSRFileReader(str(path)) as reader, pytest.raises(ValueError, match="Corrupted CSR record"):
+            reader.read_step(0)
+
+    # a value that is not a number
+    path.write_bytes(content.replace(b"e-0", b"x-0", 1))
+    with CSRFileReader(str(path)) as reader, pytest.raises(ValueError, match="could not convert"):
+        reader.read_step(0)
@@ -1,6 +1,8 @@
 import os
 import pytest
 import shutil
+import numpy as np
+from scipy.sparse import random as sparse_random
 from dftio.io.abacus.abacus_parser import AbacusParser
 from dftio.data import _keys
 
@@ -64,6 +66,22 @@ def test_get_structure(abacus_parser):
     assert structure[_keys.POSITIONS_KEY].shape == (1, 1, 3)
     assert structure[_keys.CELL_KEY].shape == (1, 3, 3)
 
+def test_structures_loaded_lazily(abacus_parser):
+    """The systems are only read when first accessed, kept in the cache, and not pickled with the parser."""
+    import pickle
+    assert len(abacus_parser.raw_sys) == 1 and len(abacus_parser.raw_sys._cache) == 0
+    sys = abacus_parser.raw_sys[0]
+    assert abacus_parser.raw_sys[-1] is sys
+    abacus_parser.get_structure(0)
+    assert len(abacus_parser.raw_sys._cache) == 1
+    with pytest.raises(IndexError):
+        abacus_parser.raw_sys[1]
+
+    copy = pickle.loads(pickle.dumps(abacus_parser))
+    assert len(copy.raw_sys._cache) == 0
+    assert np.array_equal(copy.get_structure(0)[_keys.POSITIONS_KEY],
+                          abacus_parser.get_structure(0)[_keys.POSITIONS_KEY])
+
 def test_get_eigenvalue(abacus_parser):
     """Test parsing of eigenvalues."""
     eigenvalues = abacus_parser.get_eigenvalue(0)
@@ -105,3 +123,49 @@ def test_get_blocks(abacus_parser):
     assert isinstance(ovp, list)
     assert len(ovp) > 0
     assert isinstance(ovp[0], dict)
+
+
+def write_md_csr_file(path, steps, norbits):
+    """Write real matrices in the multi-STEP layout of ABACUS MD runs, steps is a list of {R: csr_matrix}."""
+    with open(path, "w") as f:
+        for step, matrices in enumerate(steps):
+            f.write(f"STEP: {step}\n")
+            f.write(f"Matrix Dimension of H(R): {norbits}\n")
+            f.write(f"Matrix number of H(R): {len(matrices)}\n")
+            for R, mat in matrices.items():
+                f.write(f"{R[0]} {R[1]} {R[2]} {mat.nnz}\n")
+                f.write(" " + " ".join(f"{v:.8e}" for v in mat.data) + "\n")
+                f.write(" " + " ".join(map(str, mat.indices)) + "\n")
+                f.write(" " + " ".join(map(str, mat.indptr)) + "\n")
+
+
+def test_iter_blocks_md(tmp_path):
+    """Frames of a multi-step CSR file are yielded in order and match parse_matrix of each step."""
+    shutil.copytree("test/data/abacus_md", tmp_path / "calculation")
+    parser = AbacusParser(root=str(tmp_path), prefix='calculation')
+    nframes = parser.raw_sys[0].get_nframes()
+    norbits = 8 * 13
+    out_dir = parser._get_output_dir(0)
+    for k, name in enumerate(["HR", "SR"]):
+        steps = [
+            {R: sparse_random(norbits, norbits, density=0.05, format="csr", random_state=100 * k + 10 * step + n, dtype=np.float32)
+             for n, R in enumerate([(0, 0, 0), (0, 0, 1), (0, 0, -1)])}
+            for step in range(nframes)
+        ]
+        write_md_csr_file(os.path.join(out_dir, f"data-{name}-sparse_SPIN0.csr"), steps, norbits)
+
+    frames = list(parser.iter_blocks(0, hamiltonian=True, overlap=True, density_matrix=False))
+    assert len(frames) == nframes
+
+    site_norbits, orbital_types_dict, element, spinful = parser._get_site_orbitals(0)
+    for step, (ham, ovp, dm) in enumerate(frames):
+        assert dm is None
+        for blocks, name, factor in [(ham, "HR", 13.605698), (ovp, "SR", 1)]:
+            reference, _ = parser.parse_matrix(
+                matrix_path=os.path.join(out_dir, f"data-{name}-sparse_SPIN0.csr"),
+                nsites=len(site_norbits), site_norbits=site_norbits, orbital_types_dict=orbital_types_dict,
+                element=element, factor=factor, spinful=spinful, step=step
+            )
+            assert list(blocks.keys()) == list(reference.keys())
+            for key in reference:
+                assert np.array_equal(blocks[key], reference[key])
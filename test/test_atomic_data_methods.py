@@ -63,3 +63,86 @@ def test_atomic_data_to_ase():
     assert isinstance(atoms, ase.Atoms)
     assert len(atoms) == 1
     assert atoms.get_atomic_numbers()[0] == 1
+
+def test_periodic_self_edges_deduplicated():
+    """Each i i shift / i i -shift pair of periodic images is kept once, in its first direction."""
+    from dftio.data.AtomicData import neighbor_list_and_relative_vec
+    rng = np.random.default_rng(0)
+    cell = np.diag([2.5, 3.0, 2.0]) + rng.random((3, 3)) * 0.2
+    pos = rng.random((3, 3)) @ cell
+    i, j, S = ase.neighborlist.primitive_neighbor_list("ijS", (True,) * 3, cell, pos, cutoff=6.0)
+    edge_index, shifts, _ = neighbor_list_and_relative_vec(
+        pos, 6.0, atomic_numbers=np.array([1, 1, 1]), cell=cell, pbc=True)
+
+    self_edges = edge_index[0] == edge_index[1]
+    assert self_edges.any() and (edge_index[0] <= edge_index[1]).all()
+    # i != j bonds with i < j are all kept
+    assert (~self_edges).sum() == (i < j).sum()
+    seen = set()
+    for a, s in zip(edge_index[0][self_edges], shifts[self_edges]):
+        assert s.any() and (a, tuple(-s)) not in seen
+        seen.add((a, tuple(s)))
+    assert 2 * len(seen) == (i == j).sum()
+    # the first of each pair in the ase order is the one kept
+    first = {}
+    for a, b, s in zip(i, j, S):
+        if a == b:
+            first.setdefault((a, frozenset([tuple(s), tuple(-s)])), tuple(s))
+    assert seen == {(a, s) for (a, _), s in first.items()}
+
+
+def test_from_points_shared_neighbor_search():
+    """The env and onsite env edges selected from the single search match a search at their own cutoff."""
+    from dftio.data.AtomicData import neighbor_list_and_relative_vec
+    rng = np.random.default_rng(1)
+    cell = np.diag([6.0, 6.5, 7.0]) + rng.random((3, 3)) * 0.3
+    pos = rng.random((12, 3)) @ cell
+    numbers = rng.choice([6, 14], 12)
+    data = AtomicData.from_points(pos=pos, r_max={"C": 3.5, "Si": 5.0}, er_max=6.0, oer_max=3.0,
+                                  cell=cell, pbc=True, atomic_numbers=numbers)
+
+    def edge_set(edge_index, shifts):
+        return set(zip(*np.asarray(edge_index).tolist(), map(tuple, np.asarray(shifts).tolist())))
+
+    for r_max, index_key, shift_key in [({"C": 3.5, "Si": 5.0}, _keys.EDGE_INDEX_KEY, _keys.EDGE_CELL_SHIFT_KEY),
+                                        (6.0, _keys.ENV_INDEX_KEY, _keys.ENV_CELL_SHIFT_KEY),
+                                        (3.0, _keys.ONSITENV_INDEX_KEY, _keys.ONSITENV_CELL_SHIFT_KEY)]:
+        edge_index, shifts, _ = neighbor_list_and_relative_vec(
+            pos, r_max, reduce=False, atomic_numbers=numbers, cell=cell, pbc=True)
+        assert len(edge_set(edge_index, shifts)) == edge_index.shape[1] > 0
+        assert edge_set(data[index_key], data[shift_key]) == edge_set(edge_index, shifts)
+
+
+@pytest.mark.parametrize("backend", ["cell_list", "kdtree"])
+def test_neighbor_backends_match_ase(backend):
+    """The native backends find the bonds of ase, for triclinic, partially periodic and per-species cutoffs."""
+    from dftio.data.AtomicData import neighbor_list_and_relative_vec
+    from dftio.data.neighbor_list import get_neighbor_backend
+    rng = np.random.default_rng(2)
+
+    def edge_set(edge_index, shifts):
+        return set(zip(*np.asarray(edge_index).tolist(), map(tuple, np.asarray(shifts).tolist())))
+
+    for natoms, r_max, pbc in [(1, 6.0, True), (7, 4.0, True), (20, 5.0, (True, False, True)),
+                               (15, 3.0, False), (25, {"C": 3.5, "Si": 5.0}, True)]:
+        cell = np.diag([4.0, 5.0, 6.0]) + rng.random((3, 3)) * 1.5
+        pos = rng.random((natoms, 3)) @ cell + rng.normal(scale=0.5, size=(natoms, 3))
+        numbers = rng.choice([6, 14], natoms)
+        if not isinstance(r_max, dict):
+            ref = get_neighbor_backend("ase")(np.broadcast_to(pbc, 3), cell, pos, r_max)
+            res = get_neighbor_backend(backend)(np.broadcast_to(pbc, 3), cell, pos, r_max)
+            assert edge_set(ref[:2], ref[2]) == edge_set(res[:2], res[2])
+            assert len(res[0]) == len(ref[0])
+        ref_index, ref_shifts, _ = neighbor_list_and_relative_vec(
+            pos, r_max, reduce=False, atomic_numbers=numbers, cell=cell, pbc=pbc)
+        edge_index, shifts, _ = neighbor_list_and_relative_vec(
+            pos, r_max, reduce=False, atomic_numbers=numbers, cell=cell, pbc=pbc, backend=backend)
+        assert edge_set(edge_index, shifts) == edge_set(ref_index, ref_shifts)
+
+    data = AtomicData.from_points(pos=pos, r_max={"C": 3.5, "Si": 5.0}, er_max=6.0, cell=cell, pbc=True,
+                                  atomic_numbers=numbers, neighbor_backend=backend)
+    ref = AtomicData.from_points(pos=pos, r_max={"C": 3.5, "Si": 5.0}, er_max=6.0, cell=cell, pbc=True,
+                                 atomic_numbers=numbers)
+    for index_key, shift_key in [(_keys.EDGE_INDEX_KEY, _keys.EDGE_CELL_SHIFT_KEY),
+                                 (_keys.ENV_INDEX_KEY, _keys.ENV_CELL_SHIFT_KEY)]:
+        assert edge_set(data[index_key], data[shift_key]) == edge_set(ref[index_key], ref[shift_key])
@@ -0,0 +1,50 @@
+import os
+import glob
+import pytest
+from dftio.io.discovery import scan_inputs, read_file_list, discover_inputs
+from dftio.io.vasp.vasp_parser import VASPParser
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """root/frame_2, root/frame_1, root/.frame_hidden, root/other/frame_3, root/other/deeper/frame_4"""
+    for name in ["frame_2", "frame_1", ".frame_hidden", "other/frame_3", "other/deeper/frame_4", "frame_1/frame_nested"]:
+        (tmp_path / name).mkdir(parents=True)
+    (tmp_path / "notes.txt").write_text("not a frame")
+    return tmp_path
+
+
+def test_scan_inputs_matches_glob(tree):
+    """At depth 0 the scan finds what glob finds, deeper levels search the non-matching directories only."""
+    root = str(tree)
+    assert sorted(scan_inputs(root, "frame")) == sorted(glob.glob(os.path.join(root, "*frame*")))
+    assert sorted(scan_inputs(root, "frame", max_depth=1)) == [
+        os.path.join(root, name) for name in ["frame_1", "frame_2", "other/frame_3"]]
+    assert sorted(scan_inputs(root, "frame", max_depth=2)) == [
+        os.path.join(root, name) for name in ["frame_1", "frame_2", "other/deeper/frame_4", "other/frame_3"]]
+
+
+def test_discover_inputs_index(tree):
+    """The inputs are sorted, written to the index and read back from it by later runs."""
+    root = str(tree)
+    index_path = str(tree / "index.txt")
+    paths = discover_inputs(root, "frame", index_path=index_path)
+    assert paths == [os.path.join(root, "frame_1"), os.path.join(root, "frame_2")]
+    assert read_file_list(index_path) == paths
+
+    # a later run reuses the index instead of searching root
+    (tree / "frame_0").mkdir()
+    assert discover_inputs(root, "frame", index_path=index_path) == paths
+    assert discover_inputs(root, "frame")[0] == os.path.join(root, "frame_0")
+
+
+def test_parser_file_list(tmp_path):
+    """A file listing the calculations, relative to the file, is taken as root in its order."""
+    for name in ["b", "a"]:
+        os.makedirs(tmp_path / name)
+        with open("test/data/vasp_scf/POSCAR") as src, open(tmp_path / name / "POSCAR", "w") as dst:
+            dst.write(src.read())
+    (tmp_path / "inputs.txt").write_text("# calculations\nb\n\n" + str(tmp_path / "a") + "\n")
+    parser = VASPParser(root=str(tmp_path / "inputs.txt"), prefix="")
+    assert parser.raw_datas == [str(tmp_path / "b"), str(tmp_path / "a")]
+    assert parser.get_structure(1) is not None
@@ -1,4 +1,6 @@
 import os
+import json
+import warnings
 import pytest
 import numpy as np
 from dftio.io.gaussian.gaussian_parser import GaussianParser
@@ -141,3 +143,73 @@ def test_get_structure(gaussian_parser):
     # But wait, I don't have 'valid_gaussian_logs.txt' in the file list.
     # I should probably create one in the fixture.
     pass
+
+def test_read_lower_triangular(tmp_path):
+    from dftio.io.gaussian.gaussian_tools import index_gau_log, read_fock_from_gau_log, read_int1e_from_gau_log
+    nbf = 12
+    rng = np.random.default_rng(0)
+    mat = rng.random((nbf, nbf)) - 0.5
+    mat = mat + mat.T
+
+    def dump(header, m):
+        lines = [header]
+        for k in range(0, nbf, 5):
+            lines.append("".join(f"{c + 1:14d}" for c in range(k, min(k + 5, nbf))))
+            for j in range(k, nbf):
+                values = "".join(f"{m[j, c]:14.6E}".replace("E", "D") for c in range(k, min(j + 1, k + 5)))
+                lines.append(f"{j + 1:7d}{values}")
+        return lines
+
+    log = tmp_path / "gau.log"
+    log.write_text("\n".join([" *** Overlap *** "] + dump(" Fock matrix (alpha):", 2 * mat)[1:]
+                             + dump(" Fock matrix (alpha):", mat) + [" Normal termination of Gaussian 16"]) + "\n")
+    index = index_gau_log(str(log))
+    assert len(index["fock"]) == 1 and len(index["overlap"]) == 1 and len(index["termination"]) == 1
+    assert index["overlap"] == [0]
+    assert np.allclose(read_fock_from_gau_log(str(log), nbf, index=index), mat, atol=1e-6)
+    assert np.allclose(read_int1e_from_gau_log(str(log), 0, nbf), 2 * mat, atol=1e-6)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        with pytest.raises(ValueError, match="Expect"):
+            read_fock_from_gau_log(str(log), nbf + 1, index=index)
+        log.write_text(log.read_text().replace("D", "X", 1))
+        with pytest.raises(ValueError, match="Invalid number"):
+            read_int1e_from_gau_log(str(log), 0, nbf)
+
+def test_chk_valid_gau_logs(tmp_path, monkeypatch):
+    from dftio.io.gaussian import gaussian_tools
+    source = "test/data/gaussian/example_folder/id_1/gau.log"
+    with open(source, "rb") as f:
+        content = f.read()
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "mol_0.log").write_bytes(content)
+    (logs / "mol_1.log").write_bytes(content[:content.index(b"Normal termination")])
+    (logs / "mol_2.log").write_bytes(content.replace(b" Fock matrix", b" Fock"))
+    valid, invalid = tmp_path / "valid.txt", tmp_path / "invalid.txt"
+    kwargs = dict(hamiltonian=True, overlap=True, density_matrix=True,
+                  valid_gau_info_path=str(valid), invalid_gau_info_path=str(invalid))
+
+    # no cache unless asked for
+    gaussian_tools.chk_valid_gau_logs(str(logs), "mol", num_workers=2, **kwargs)
+    assert valid.read_text() == f"{logs / 'mol_0.log'}\n"
+    assert sorted(invalid.read_text().split()) == [str(logs / "mol_1.log"), str(logs / "mol_2.log")]
+    assert sorted(os.listdir(tmp_path)) == ["invalid.txt", "logs", "valid.txt"]
+
+    cache = tmp_path / "checked.json"
+    kwargs["cache_path"] = str(cache)
+    gaussian_tools.chk_valid_gau_logs(str(logs), "mol", num_workers=2, **kwargs)
+    assert sorted(json.loads(cache.read_text())) == [str(logs / f"mol_{i}.log") for i in range(3)]
+
+    # a rerun only checks the changed logs, the cache is keyed by the absolute paths
+    monkeypatch.chdir(tmp_path)
+    (logs / "mol_2.log").write_bytes(content)
+    checked = []
+    screen = gaussian_tools._screen_gau_log
+    monkeypatch.setattr(gaussian_tools, "_screen_gau_log", lambda args: checked.append(args[0]) or screen(args))
+    valid.unlink()
+    invalid.unlink()
+    gaussian_tools.chk_valid_gau_logs("logs", "mol", num_workers=1, **kwargs)
+    assert checked == [os.path.join("logs", "mol_2.log")]
+    assert sorted(valid.read_text().split()) == [os.path.join("logs", "mol_0.log"), os.path.join("logs", "mol_2.log")]
+    assert invalid.read_text() == f"{os.path.join('logs', 'mol_1.log')}\n"
@@ -69,3 +69,59 @@ def test_integrate(mock_atomic_basis):
     weights = torch.tensor([1.0])
     result_w = sgi.integrate(weights=weights)
     assert result_w.shape == (1,)
+
+def test_integrate_chunked(mock_atomic_basis):
+    """The tiles of grid points sum to the integration of all the grid points at once."""
+    rng = np.random.default_rng(0)
+    cell = np.eye(3) * 4.0
+    coordinates = rng.random((3, 3)) @ cell
+    grids = rng.random((50, 3)) @ cell
+    kwargs = dict(atomic_numbers=[1, 1, 1], pbc=[True, True, True], cell=cell, coordinates=coordinates,
+                  grids=grids, atomic_basis={'H': mock_atomic_basis})
+    full = SingleGridIntegrator(chunk_size=None, **kwargs)
+    chunked = SingleGridIntegrator(chunk_size=7, **kwargs)
+
+    # the mock basis is 1 on every (grid, atom) pair
+    counts = torch.from_numpy(np.diff(full.nblist.indptr)).float()
+    assert torch.allclose(full.integrate(), counts)
+    assert torch.allclose(chunked.integrate(), counts)
+    weights = torch.tensor([1.0, 2.0, 3.0])
+    assert torch.allclose(chunked.integrate(weights=weights), full.integrate(weights=weights))
+
+def test_integrate_batch(mock_atomic_basis):
+    """Each row of integrate_batch is the integration with the weights of that state."""
+    rng = np.random.default_rng(1)
+    cell = np.eye(3) * 4.0
+    coordinates = rng.random((3, 3)) @ cell
+    grids = rng.random((40, 3)) @ cell
+    sgi = SingleGridIntegrator(atomic_numbers=[1, 1, 1], pbc=[True, True, True], cell=cell,
+                               coordinates=coordinates, grids=grids, atomic_basis={'H': mock_atomic_basis},
+                               chunk_size=16)
+    weights = torch.randn(5, 3, dtype=torch.complex64)
+    results = sgi.integrate_batch(weights)
+    assert results.shape == (5, 40) and results.dtype == torch.complex64
+    for state, row in zip(weights, results):
+        assert torch.allclose(row, sgi.integrate(weights=state))
+
+def test_tabulated_operator_cache(mock_atomic_basis, tmp_path):
+    """The tabulated operator gives the same integrations, and is reloaded from the cache for the same inputs."""
+    rng = np.random.default_rng(2)
+    cell = np.eye(3) * 4.0
+    coordinates = rng.random((3, 3)) @ cell
+    grids = rng.random((30, 3)) @ cell
+    kwargs = dict(atomic_numbers=[1, 1, 1], pbc=[True, True, True], cell=cell, coordinates=coordinates,
+                  grids=grids, atomic_basis={'H': mock_atomic_basis}, chunk_size=8)
+    reference = SingleGridIntegrator(**kwargs)
+    assert reference.tables is None
+    tabulated = SingleGridIntegrator(cache_dir=str(tmp_path), **kwargs)
+    assert len(tabulated.tables) == 4
+    assert [p.name for p in tmp_path.iterdir()] == [f"grid_basis_{reference.fingerprint()}.pt"]
+
+    cached = SingleGridIntegrator(cache_dir=str(tmp_path), **kwargs)
+    weights = torch.randn(4, 3)
+    for sgi in [tabulated, cached]:
+        assert torch.allclose(sgi.integrate_batch(weights), reference.integrate_batch(weights))
+
+    moved = SingleGridIntegrator(cache_dir=str(tmp_path), **dict(kwargs, coordinates=coordinates + 0.1))
+    assert moved.fingerprint() != reference.fingerprint()
+    assert len(list(tmp_path.iterdir())) == 2
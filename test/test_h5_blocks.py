@@ -0,0 +1,78 @@
+import os
+import shutil
+import h5py
+import numpy as np
+import pytest
+from dftio.io.abacus.abacus_parser import AbacusParser
+from dftio.io.h5_blocks import is_packed, migrate_h5_blocks, open_blocks, read_packed_frame
+from dftio.io.packed_blocks import PackedBlocks
+from dftio.data import AtomicData, _keys, block_to_feature
+from dftio.data.transforms import OrbitalMapper
+
+
+@pytest.fixture
+def abacus_parser(tmp_path):
+    shutil.copytree("test/data/abacus_scf/OUT.ABACUS", tmp_path / "calculation" / "OUT.ABACUS")
+    return AbacusParser(root=str(tmp_path), prefix="calculation")
+
+
+def write_layout(parser, outroot, h5_layout):
+    parser.write_dat(0, outroot=str(outroot), eigenvalue=False, hamiltonian=True, overlap=True,
+                     density_matrix=False, h5_layout=h5_layout)
+    return os.path.join(str(outroot), parser.formula(idx=0) + ".0")
+
+
+def features(parser, out_dir):
+    structure = parser.get_structure(0)
+    idp = OrbitalMapper(basis=parser.get_basis(0), method="e3tb")
+    data = AtomicData.from_points(
+        pos=structure[_keys.POSITIONS_KEY][0].astype(np.float64),
+        cell=structure[_keys.CELL_KEY][0].astype(np.float64),
+        atomic_numbers=structure[_keys.ATOMIC_NUMBERS_KEY].astype(np.int64),
+        r_max=8.0, pbc=True
+    )
+    data = idp(data)
+    with h5py.File(os.path.join(out_dir, "hamiltonians.h5"), "r") as fh, \
+         h5py.File(os.path.join(out_dir, "overlaps.h5"), "r") as fo:
+        block_to_feature(data, idp, open_blocks(fh["0"]), open_blocks(fo["0"]))
+    return data
+
+
+def test_packed_layout_matches_block_layout(abacus_parser, tmp_path):
+    block_dir = write_layout(abacus_parser, tmp_path / "block", "block")
+    packed_dir = write_layout(abacus_parser, tmp_path / "packed", "packed")
+
+    with h5py.File(os.path.join(block_dir, "hamiltonians.h5"), "r") as fb, \
+         h5py.File(os.path.join(packed_dir, "hamiltonians.h5"), "r") as fp:
+        assert not is_packed(fb["0"]) and is_packed(fp["0"])
+        assert set(fp["0"].keys()) == {"index", "shape", "offsets", "data"}
+        for lazy in [False, True]:
+            packed = read_packed_frame(fp["0"], lazy=lazy)
+            assert isinstance(packed, PackedBlocks)
+            assert set(packed.keys()) == set(fb["0"].keys())
+            for key in fb["0"]:
+                assert np.array_equal(packed[key], fb["0"][key][:])
+
+    ref = features(abacus_parser, block_dir)
+    data = features(abacus_parser, packed_dir)
+    for key in [_keys.NODE_FEATURES_KEY, _keys.EDGE_FEATURES_KEY, _keys.NODE_OVERLAP_KEY, _keys.EDGE_OVERLAP_KEY]:
+        assert np.array_equal(data[key], ref[key])
+
+
+def test_migrate_h5_blocks(abacus_parser, tmp_path):
+    block_dir = write_layout(abacus_parser, tmp_path / "block", "block")
+    src = os.path.join(block_dir, "overlaps.h5")
+    dst = str(tmp_path / "overlaps.packed.h5")
+    assert migrate_h5_blocks(src, dst) == 1
+
+    with h5py.File(src, "r") as fs, h5py.File(dst, "r") as fd:
+        packed = open_blocks(fd["0"])
+        assert list(packed.keys()) == list(fs["0"].keys())
+        for key in fs["0"]:
+            assert np.array_equal(packed[key], fs["0"][key][:])
+
+    # in place, and idempotent on packed files
+    assert migrate_h5_blocks(src) == 1
+    assert migrate_h5_blocks(src) == 1
+    with h5py.File(src, "r") as fs:
+        assert is_packed(fs["0"])
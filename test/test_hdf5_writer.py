@@ -0,0 +1,80 @@
+import os
+import shutil
+import h5py
+import numpy as np
+import pytest
+from dftio.io.abacus.abacus_parser import AbacusParser
+from dftio.io.h5_blocks import open_blocks
+from dftio.io.hdf5_writer import merge_hdf5
+from dftio.io.lmdb_writer import read_manifest
+from dftio.data import _keys
+
+
+@pytest.fixture
+def abacus_parser(tmp_path):
+    for name in ["calculation_0", "calculation_1"]:
+        shutil.copytree("test/data/abacus_scf/OUT.ABACUS", tmp_path / "raw" / name / "OUT.ABACUS")
+    return AbacusParser(root=str(tmp_path / "raw"), prefix="calculation")
+
+
+def test_write_hdf5_and_merge(abacus_parser, tmp_path):
+    outroot = str(tmp_path / "out")
+    kwargs = dict(outroot=outroot, format="hdf5", eigenvalue=False, hamiltonian=True, overlap=True,
+                  density_matrix=False, band_index_min=0, energy=False)
+    worker_file = os.path.join(outroot, "data.{}.h5".format(os.getpid()))
+
+    # emulate two workers, each writing its own file
+    abacus_parser.write(idx=0, **kwargs)
+    with pytest.raises(ValueError):
+        abacus_parser.write(idx=0, **kwargs)
+    os.rename(worker_file, os.path.join(outroot, "data.0.h5"))
+    abacus_parser.write(idx=1, **kwargs)
+
+    assert merge_hdf5(outroot) == 2
+    ham, ovp, _ = abacus_parser.get_blocks(0, hamiltonian=True, overlap=True)
+    structure = abacus_parser.get_structure(0)
+    with h5py.File(os.path.join(outroot, "data.h5"), "r") as f:
+        assert f["index"].is_virtual
+        assert sorted(f["index"][:].tolist()) == [[0, 0, 1], [1, 0, 1]]
+        for idx in ["0", "1"]:
+            group = f[idx]
+            assert group[_keys.POSITIONS_KEY].compression == "gzip"
+            assert np.array_equal(group[_keys.POSITIONS_KEY][:], structure[_keys.POSITIONS_KEY])
+            assert np.array_equal(group[_keys.ATOMIC_NUMBERS_KEY][:], structure[_keys.ATOMIC_NUMBERS_KEY])
+            for name, ref in [("hamiltonian", ham[0]), ("overlap", ovp[0])]:
+                blocks = open_blocks(group[name]["0"])
+                assert list(blocks.keys()) == list(ref.keys())
+                for key in ref:
+                    assert np.array_equal(blocks[key], ref[key])
+
+    # a structure in two files can not be merged
+    shutil.copy(os.path.join(outroot, "data.0.h5"), os.path.join(outroot, "data.1.h5"))
+    with pytest.raises(ValueError):
+        merge_hdf5(outroot)
+
+
+@pytest.mark.parametrize("fmt", ["hdf5", "dat", "lmdb"])
+def test_write_truncated_blocks(abacus_parser, tmp_path, monkeypatch, fmt):
+    """A structure whose blocks miss frames, e.g. a truncated CSR trajectory, is not written as a shorter one."""
+    monkeypatch.setattr(abacus_parser, "iter_blocks", lambda *args, **kwargs: iter([]))
+    with pytest.raises(ValueError):
+        abacus_parser.write(idx=0, outroot=str(tmp_path / "out"), format=fmt, eigenvalue=False, hamiltonian=True,
+                            overlap=False, density_matrix=False, band_index_min=0)
+
+
+def test_write_lmdb_failed_structure(abacus_parser, tmp_path, monkeypatch):
+    """The frames of a structure that fails after some of them are committed are removed."""
+    ham, _, _ = abacus_parser.get_blocks(0, hamiltonian=True)
+
+    def failing_blocks(*args, **kwargs):
+        yield ham[0], None, None
+        raise RuntimeError("truncated file")
+
+    kwargs = dict(outroot=str(tmp_path / "out"), format="lmdb", eigenvalue=False, hamiltonian=True, overlap=False,
+                  density_matrix=False, band_index_min=0, lmdb_batch_size=1)
+    abacus_parser.write(idx=1, **kwargs)
+    monkeypatch.setattr(abacus_parser, "iter_blocks", failing_blocks)
+    with pytest.raises(RuntimeError):
+        abacus_parser.write(idx=0, **kwargs)
+    path = os.path.join(str(tmp_path / "out"), "data.{}.lmdb".format(os.getpid()))
+    assert read_manifest(path) == {(1, 0): 0}
@@ -67,3 +67,60 @@ def test_ldos_get(mock_atomic_basis):
     result = ldos.get(E=0.0, coefficients=coefficients, eigenvalues=eigenvalues)
     
     assert result.shape == (1,)
+
+def test_ldos_get_many(mock_atomic_basis):
+    """get_many stacks the LDOS of each energy, and get_wbias leaves the eigenvalues untouched."""
+    rng = np.random.default_rng(0)
+    cell = np.eye(3) * 4.0
+    ldos = LDOS(
+        atomicbasis={'H': mock_atomic_basis},
+        atomic_numbers=[1, 1],
+        pbc=[True, True, True],
+        cell=cell,
+        coordinates=rng.random((2, 3)) @ cell,
+        grids=rng.random((20, 3)) @ cell,
+        z_valence={'H': 1},
+        state_batch_size=3,
+    )
+    coefficients = torch.randn(3, 2, 2, dtype=torch.float64)
+    eigenvalues = torch.tensor([[-1.0, -0.2], [-0.8, 0.0], [-0.5, 0.3]], dtype=torch.float64)
+    energies = [-1.0, -0.1, 0.4]
+
+    stack = ldos.get_many(energies, coefficients, eigenvalues, sigma=0.2)
+    assert stack.shape == (3, 20)
+    for E, row in zip(energies, stack):
+        assert torch.allclose(row, ldos.get(E, coefficients, eigenvalues, sigma=0.2))
+
+    reference = eigenvalues.clone()
+    ldos.get_wbias(coefficients, eigenvalues, bias=1.0)
+    assert torch.equal(eigenvalues, reference)
+
+def test_ldos_bias_sweep(mock_atomic_basis):
+    """bias_sweep gives get_wbias at every bias, reshaped into the images taken by scan."""
+    rng = np.random.default_rng(1)
+    cell = np.eye(3) * 4.0
+    ldos = LDOS(
+        atomicbasis={'H': mock_atomic_basis},
+        atomic_numbers=[1, 1, 1],
+        pbc=[True, True, True],
+        cell=cell,
+        coordinates=rng.random((3, 3)) @ cell,
+        grids=rng.random((24, 3)) @ cell,
+        state_batch_size=2,
+    )
+    coefficients = torch.randn(2, 3, 3, dtype=torch.complex128)
+    eigenvalues = torch.tensor([[-1.5, -0.4, 0.6], [-0.7, 0.2, 1.3]], dtype=torch.float64)
+    biases = [-2.0, -1.0, -0.5, 0.0, 0.3, 1.0, 2.0]
+
+    sweep = ldos.bias_sweep(coefficients, eigenvalues, biases)
+    assert sweep.shape == (7, 24)
+    for bias, row in zip(biases, sweep):
+        assert torch.allclose(row, ldos.get_wbias(coefficients, eigenvalues, bias=bias), atol=1e-6)
+    assert torch.equal(sweep[3], torch.zeros(24))
+    assert ldos.bias_sweep(coefficients, eigenvalues, biases, shape=(2, 3, 4)).shape == (7, 2, 3, 4)
+
+    # scan takes the stack of images of a sweep, one height map per bias
+    images = torch.arange(6.0).expand(2, 3, 6) * torch.tensor([1.0, 2.0]).reshape(2, 1, 1, 1)
+    heights = ldos.scan(images.clone(), current=2.5)
+    assert heights.shape == (2, 2, 3)
+    assert torch.allclose(heights[1], ldos.scan(images[1].clone(), current=2.5))
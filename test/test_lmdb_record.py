@@ -0,0 +1,87 @@
+import pickle
+import lmdb
+import numpy as np
+import pytest
+from dftio.data import _keys
+from dftio.io.lmdb_writer import LMDBWriter
+from dftio.io.lmdb_record import RecordReader, convert_pickle_lmdb, decode_record, encode_record
+from dftio.io.packed_blocks import PackedBlocks
+
+
+def make_frame(nf):
+    rng = np.random.default_rng(nf)
+    return {
+        _keys.ATOMIC_NUMBERS_KEY: np.array([14, 1], dtype=np.int32),
+        _keys.CELL_KEY: rng.random((3, 3), dtype=np.float32),
+        _keys.POSITIONS_KEY: rng.random((2, 3), dtype=np.float32),
+        _keys.PBC_KEY: np.array([True, True, False]),
+        _keys.TOTAL_ENERGY_KEY: np.float64(-10.5 - nf),
+        "hamiltonian": {
+            "0_0_0_0_0": rng.random((13, 13), dtype=np.float32),
+            "0_1_-1_0_2": rng.random((13, 4), dtype=np.float32),
+            "1_0_1_0_-2": rng.random((4, 13), dtype=np.float32),
+        },
+        "overlap": {"1_1_0_0_0": (rng.random((8, 8)) + 1j * rng.random((8, 8))).astype(np.complex64)},
+        "idx": 3,
+        "nf": nf,
+    }
+
+
+def assert_frame_equal(frame, ref):
+    assert set(frame.keys()) == set(ref.keys())
+    for name, value in ref.items():
+        if isinstance(value, dict):
+            assert list(frame[name].keys()) == list(value.keys())
+            for key, block in value.items():
+                assert frame[name][key].dtype == block.dtype
+                assert np.array_equal(frame[name][key], block)
+        else:
+            assert np.array_equal(frame[name], value)
+            assert type(frame[name]) == type(value)
+
+
+def test_record_roundtrip():
+    frame = make_frame(0)
+    record = encode_record(frame)
+    decoded = decode_record(record)
+    assert_frame_equal(decoded, frame)
+
+    ham = decoded["hamiltonian"]
+    assert isinstance(ham, PackedBlocks)
+    assert ham.index.dtype == np.int32
+    assert ham.index.tolist() == [[0, 0, 0, 0, 0], [0, 1, -1, 0, 2], [1, 0, 1, 0, -2]]
+    assert ham.data.shape == (13 * 13 + 2 * 13 * 4,)
+    # zero-copy views into the record
+    assert not ham.data.flags.writeable
+    assert "0_0_0_0_1" not in ham and ham.get("0_0_0_0_1") is None
+
+
+def test_record_reader_and_converter(tmp_path):
+    src, dst = str(tmp_path / "pickle.lmdb"), str(tmp_path / "record.lmdb")
+    frames = [make_frame(nf) for nf in range(5)]
+    with LMDBWriter(src, batch_size=2) as writer:
+        for frame in frames:
+            writer.put(frame["idx"], frame["nf"], pickle.dumps(frame))
+
+    assert convert_pickle_lmdb(src, dst) == 5
+    env = lmdb.open(dst, readonly=True, lock=False)
+    with env.begin() as txn:
+        assert all(value.startswith(b"DFTIOREC") for _, value in txn.cursor())
+    env.close()
+
+    for path in [src, dst]:
+        with RecordReader(path) as reader:
+            assert len(reader) == 5
+            assert_frame_equal(reader[4], frames[4])
+            for frame, ref in zip(reader.iter_frames(), frames):
+                assert_frame_equal(frame, ref)
+            with pytest.raises(KeyError):
+                reader[5]
+
+    with pytest.raises(ValueError):
+        convert_pickle_lmdb(src, dst)
+
+
+def test_encode_record_rejects_objects():
+    with pytest.raises(TypeError):
+        encode_record({"structure": object()})
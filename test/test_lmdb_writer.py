@@ -0,0 +1,108 @@
+import os
+import pickle
+import multiprocessing
+import lmdb
+import pytest
+from multiprocessing.pool import Pool
+from dftio.io.lmdb_writer import LMDBWriter, QueueWriter, encode_key, read_manifest, init_worker, get_worker_writer, \
+    watch_writer, stop_writer
+
+
+def read_all(path):
+    env = lmdb.open(path, readonly=True, lock=False)
+    with env.begin() as txn:
+        entries = env.stat()["entries"]
+        values = [txn.get(encode_key(k)) for k in range(entries)]
+    env.close()
+    return values
+
+
+def test_lmdb_writer_batches_and_manifest(tmp_path):
+    path = str(tmp_path / "data.lmdb")
+    with LMDBWriter(path, batch_size=3) as writer:
+        for nf in range(7):
+            writer.put(0, nf, pickle.dumps({"nf": nf}))
+        # two full batches are committed, the last frame is still buffered
+        assert writer.next_key == 6
+    assert [pickle.loads(v)["nf"] for v in read_all(path)] == list(range(7))
+
+    # reopening appends after the existing entries
+    with LMDBWriter(path, batch_size=3) as writer:
+        writer.put(1, 0, pickle.dumps({"nf": 0}))
+    assert len(read_all(path)) == 8
+
+    manifest = read_manifest(path)
+    assert manifest == {**{(0, nf): nf for nf in range(7)}, (1, 0): 7}
+
+
+def _send_frames(queue, idx):
+    writer = QueueWriter(queue)
+    for nf in range(5):
+        writer.put(idx, nf, pickle.dumps({"idx": idx, "nf": nf}))
+
+
+def test_lmdb_single_writer(tmp_path):
+    path = str(tmp_path / "data.lmdb")
+    queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=LMDBWriter.serve, args=(queue, path, 4))
+    server.start()
+    workers = [multiprocessing.Process(target=_send_frames, args=(queue, idx)) for idx in range(3)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    queue.put(None)
+    server.join()
+    assert server.exitcode == 0
+
+    values = [pickle.loads(v) for v in read_all(path)]
+    assert len(values) == 15
+    manifest = read_manifest(path)
+    assert sorted(manifest.values()) == list(range(15))
+    for (idx, nf), key in manifest.items():
+        assert values[key] == {"idx": idx, "nf": nf}
+
+
+def _send_worker_frames(idx):
+    writer = get_worker_writer()
+    for nf in range(8):
+        writer.put(idx, nf, pickle.dumps({"idx": idx, "nf": nf}))
+    return idx
+
+
+def test_lmdb_single_writer_died(tmp_path):
+    """The workers blocked on the queue of a dead writer do not hang the pool."""
+    # not a directory, the writer fails to open it
+    path = tmp_path / "data.lmdb"
+    path.write_text("")
+    queue = multiprocessing.Queue(maxsize=2)
+    server = multiprocessing.Process(target=LMDBWriter.serve, args=(queue, str(path), 4))
+    with Pool(2, initializer=init_worker, initargs=(queue,)) as p:
+        server.start()
+        with pytest.raises(RuntimeError, match="exited with code 1"):
+            list(watch_writer(p.imap_unordered(_send_worker_frames, range(4)), server, timeout=0.1))
+    assert stop_writer(queue, server, timeout=0.1) == 1
+
+
+def test_lmdb_writer_invalid_batch_size(tmp_path):
+    with pytest.raises(ValueError):
+        LMDBWriter(str(tmp_path / "data.lmdb"), batch_size=0)
+
+
+def test_lmdb_writer_discard(tmp_path):
+    """The frames of a discarded structure are removed, the last frames fill their keys."""
+    path = str(tmp_path / "data.lmdb")
+    with LMDBWriter(path, batch_size=2) as writer:
+        for idx, nframes in [(0, 2), (1, 3), (2, 2)]:
+            for nf in range(nframes):
+                writer.put(idx, nf, pickle.dumps({"idx": idx, "nf": nf}))
+        # frames of idx 1 are committed and buffered
+        writer.discard(1)
+        writer.put(3, 0, pickle.dumps({"idx": 3, "nf": 0}))
+
+    values = [pickle.loads(v) for v in read_all(path)]
+    manifest = read_manifest(path)
+    assert sorted(manifest) == [(0, 0), (0, 1), (2, 0), (2, 1), (3, 0)]
+    assert sorted(manifest.values()) == list(range(5))
+    for (idx, nf), key in manifest.items():
+        assert values[key] == {"idx": idx, "nf": nf}
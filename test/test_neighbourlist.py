@@ -45,3 +45,29 @@ def test_neighbourlist_update(neighbourlist_data):
     updated = nl.update(pbc, cell, new_coordinates, grids)
     assert updated is True
     assert nl.nupdates == 2
+
+def test_neighbourlist_csr_matches_search():
+    """The CSR arrays hold, grid by grid, the atom images within the cutoff of each grid point."""
+    rng = np.random.default_rng(0)
+    cell = np.diag([4.0, 5.0, 6.0]) + rng.random((3, 3))
+    coordinates = rng.random((4, 3)) @ cell
+    grids = rng.random((50, 3)) @ cell
+    cutoffs = rng.uniform(2.0, 4.0, 4)
+    nl = PrimitiveFieldsNeighborList(cutoffs=cutoffs, sorted=True)
+    nl.build(np.array([True, True, False]), cell, coordinates, grids)
+    assert nl.indptr[-1] == len(nl.indices) == len(nl.offsets) == nl.nneighbors
+
+    grid_index, atom_index, displacements = nl.get_pairs()
+    assert np.all(np.diff(grid_index) >= 0)
+    distances = np.linalg.norm(coordinates[atom_index] + displacements @ cell - grids[grid_index], axis=1)
+    assert np.all(distances < cutoffs[atom_index])
+
+    images = np.array([[n1, n2, 0] for n1 in range(-3, 4) for n2 in range(-3, 4)])
+    assert len(nl.neighbors) == len(nl.displacements) == len(grids)
+    for g in range(len(grids)):
+        rel = coordinates[None, :, :] + (images @ cell)[:, None, :] - grids[g]
+        n_in = (np.linalg.norm(rel, axis=-1) < cutoffs).sum()
+        neighbors, offsets = nl.get_neighbors(g)
+        assert len(neighbors) == len(offsets) == n_in
+        # the per-grid lists of the earlier versions
+        assert np.array_equal(nl.neighbors[g], neighbors) and np.array_equal(nl.displacements[g], offsets)
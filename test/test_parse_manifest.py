@@ -0,0 +1,155 @@
+import os
+import sys
+import glob
+import pickle
+import shutil
+import h5py
+import lmdb
+import pytest
+from dftio.__main__ import main
+from dftio.io.lmdb_writer import LMDBWriter, encode_key, read_manifest
+from dftio.io.parse_manifest import ParseManifest, input_fingerprint, read_parse_manifest, scan_input
+
+
+def run_parse(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["dftio", "parse", "-m", "abacus", "-p", "calc", "-ham", *args])
+    main()
+
+
+def test_input_fingerprint(tmp_path):
+    folder = tmp_path / "calc"
+    (folder / "OUT").mkdir(parents=True)
+    (folder / "OUT" / "data.csr").write_text("1 2 3")
+    stat, content = input_fingerprint(str(folder)), input_fingerprint(str(folder), mode="content")
+    assert stat.startswith("stat:") and content.startswith("content:")
+
+    # the same size and content written later changes the stat fingerprint only
+    os.utime(folder / "OUT" / "data.csr", ns=(0, 0))
+    assert input_fingerprint(str(folder)) != stat
+    assert input_fingerprint(str(folder), mode="content") == content
+    (folder / "OUT" / "data.csr").write_text("1 2 4")
+    assert input_fingerprint(str(folder), mode="content") != content
+
+
+def test_scan_input(tmp_path):
+    folder = tmp_path / "calc"
+    (folder / "OUT").mkdir(parents=True)
+    (folder / "OUT" / "data.csr").write_text("1 2 3")
+    (folder / "INPUT").write_text("ecutwfc 100")
+    assert scan_input(str(folder)) == (input_fingerprint(str(folder)), 16)
+    assert scan_input(str(folder), mode="content") == (input_fingerprint(str(folder), mode="content"), 16)
+    assert scan_input(str(folder / "INPUT"), mode=None) == (None, 11)
+
+
+def test_parse_manifest_entries(tmp_path):
+    inputs = []
+    for name in ["a", "b"]:
+        (tmp_path / name).mkdir()
+        inputs.append(str(tmp_path / name))
+    outroot = str(tmp_path / "out")
+    manifest = ParseManifest(outroot, {"format": "dat"})
+    assert manifest.pending(inputs) == [0, 1]
+    manifest.record(inputs[0], 0, output=os.path.join(outroot, "Si.0"), fingerprint=input_fingerprint(inputs[0]))
+    manifest.record(inputs[1], 1, error="ValueError: broken")
+    with open(manifest.path, 'a') as f:
+        f.write('{"input": "cut by a crash')
+
+    manifest = ParseManifest(outroot, {"format": "dat"})
+    assert manifest.entries[inputs[0]]["output"] == "Si.0"
+    assert manifest.pending(inputs) == [1]
+    # a new input comes after the recorded ones, whose idx do not change
+    assert manifest.order([str(tmp_path / "0")] + inputs) == inputs + [str(tmp_path / "0")]
+    # other options parse everything again
+    assert ParseManifest(outroot, {"format": "lmdb"}).pending(inputs) == [0, 1]
+
+    manifest.compact(inputs[:1])
+    assert list(read_parse_manifest(manifest.path)) == inputs[:1]
+
+
+def test_parse_manifest_superseded(tmp_path):
+    """Only the dat folders of an input that moved to another idx are superseded, not the outputs of other formats."""
+    inputs = []
+    for name in ["a", "b"]:
+        (tmp_path / name).mkdir()
+        inputs.append(str(tmp_path / name))
+    outroot = str(tmp_path / "out")
+    manifest = ParseManifest(outroot, {"format": "lmdb"})
+    manifest.record(inputs[0], 0, output=os.path.join(outroot, "data.lmdb"))
+    manifest = ParseManifest(outroot, {"format": "dat"})
+    manifest.record(inputs[0], 0, output=os.path.join(outroot, "Si.0"))
+    assert manifest.entries[inputs[0]]["format"] == "dat"
+    assert manifest.superseded() == []
+
+    manifest = ParseManifest(outroot, {"format": "dat"})
+    manifest.record(inputs[0], 1, output=os.path.join(outroot, "Si.1"))
+    manifest.record(inputs[1], 0, output=os.path.join(outroot, "C.0"))
+    assert manifest.superseded() == [os.path.join(outroot, "Si.0")]
+    manifest = ParseManifest(outroot, {"format": "dat"})
+    manifest.record(inputs[1], 2, output=os.path.join(outroot, "C.2"))
+    assert manifest.superseded() == [os.path.join(outroot, "C.0")]
+
+
+@pytest.mark.parametrize("num_workers", ["1", "2"])
+def test_parse_resume_hdf5(tmp_path, monkeypatch, capfd, num_workers):
+    raw, out = tmp_path / "raw", tmp_path / "out"
+    for name in ["calc_0", "calc_1"]:
+        shutil.copytree("test/data/abacus_scf/OUT.ABACUS", raw / name / "OUT.ABACUS")
+    # this one can not be parsed
+    (raw / "calc_2" / "OUT.ABACUS").mkdir(parents=True)
+    with pytest.raises(RuntimeError):
+        run_parse(monkeypatch, "-r", str(raw), "-o", str(out), "-f", "hdf5", "-n", num_workers)
+    entries = read_parse_manifest(str(out / "parse_manifest.jsonl"))
+    assert [entries[str(raw / name)]["status"] for name in ["calc_0", "calc_1", "calc_2"]] == ["done", "done", "failed"]
+
+    # the failed one is fixed, calc_0 is changed and calc_00 is new: calc_1 is not parsed again
+    shutil.rmtree(raw / "calc_2")
+    shutil.copytree("test/data/abacus_scf/OUT.ABACUS", raw / "calc_2" / "OUT.ABACUS")
+    shutil.copytree("test/data/abacus_scf/OUT.ABACUS", raw / "calc_00" / "OUT.ABACUS")
+    os.utime(raw / "calc_0" / "OUT.ABACUS" / "STRU.cif", ns=(0, 0))
+    capfd.readouterr()
+    run_parse(monkeypatch, "-r", str(raw), "-o", str(out), "-f", "hdf5", "-n", num_workers)
+    assert "3 of 4 DFT files are parsed" in capfd.readouterr().err
+    entries = read_parse_manifest(str(out / "parse_manifest.jsonl"))
+    assert {name: entries[str(raw / name)]["idx"] for name in ["calc_0", "calc_1", "calc_2", "calc_00"]} == \
+        {"calc_0": 0, "calc_1": 1, "calc_2": 2, "calc_00": 3}
+    assert all(entry["status"] == "done" for entry in entries.values())
+    with h5py.File(out / "data.h5", "r") as f:
+        assert sorted(f["index"][:, 0].tolist()) == [0, 1, 2, 3]
+
+
+def test_parse_resume_lmdb(tmp_path, monkeypatch):
+    """A changed calculation is parsed again without leaving its earlier frames in the databases."""
+    raw, out = tmp_path / "raw", tmp_path / "out"
+    for name in ["calc_0", "calc_1"]:
+        shutil.copytree("test/data/abacus_scf/OUT.ABACUS", raw / name / "OUT.ABACUS")
+    run_parse(monkeypatch, "-r", str(raw), "-o", str(out), "-f", "lmdb")
+    # the second run writes into another database, as a new worker process would
+    first = glob.glob(str(out / "data.*.lmdb"))[0]
+    os.rename(first, str(out / "data.0.lmdb"))
+
+    os.utime(raw / "calc_0" / "OUT.ABACUS" / "STRU.cif", ns=(0, 0))
+    run_parse(monkeypatch, "-r", str(raw), "-o", str(out), "-f", "lmdb")
+    frames = []
+    for path in sorted(glob.glob(str(out / "data.*.lmdb"))):
+        env = lmdb.open(path, readonly=True, lock=False)
+        with env.begin() as txn:
+            frames += [pickle.loads(txn.get(encode_key(key)))["idx"] for key in range(env.stat()["entries"])]
+        env.close()
+        assert sorted(read_manifest(path).values()) == list(range(len(read_manifest(path))))
+    assert sorted(frames) == [0, 1]
+
+
+def test_parse_single_writer_died(tmp_path, monkeypatch):
+    """The DFT files whose frames the single writer process failed to commit are recorded as failed."""
+    raw, out = tmp_path / "raw", tmp_path / "out"
+    for name in ["calc_0", "calc_1"]:
+        shutil.copytree("test/data/abacus_scf/OUT.ABACUS", raw / name / "OUT.ABACUS")
+
+    def flush(self):
+        raise OSError("No space left on device")
+    # inherited by the writer process
+    monkeypatch.setattr(LMDBWriter, "flush", flush)
+    with pytest.raises(RuntimeError, match="2 of 2 DFT files failed"):
+        run_parse(monkeypatch, "-r", str(raw), "-o", str(out), "-f", "lmdb", "--lmdb_single_writer", "-n", "2")
+    entries = read_parse_manifest(str(out / "parse_manifest.jsonl"))
+    assert all(entry["status"] == "failed" and "exited with code 1" in entry["error"] for entry in entries.values())
@@ -0,0 +1,74 @@
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import pytest
+from dftio.__main__ import main
+from dftio.io import profiling
+from dftio.io.profiling import stage, profile_iter, enable_profiling, pop_records, summarize_records
+
+
+@pytest.fixture
+def profile():
+    enable_profiling()
+    yield
+    enable_profiling(False)
+
+
+def test_stages_disabled():
+    assert not profiling.profiling_enabled()
+    with stage("write", 0):
+        pass
+    items = [1, 2]
+    assert profile_iter(items, "get_blocks") is items
+    assert pop_records() == []
+
+
+def test_nested_stages(profile, tmp_path):
+    """The inner stages are recorded for the idx of the outer one and are not counted in it."""
+    with stage("other", 3):
+        with stage("write"):
+            (tmp_path / "out.dat").write_bytes(b"x" * 4096)
+            time.sleep(0.02)
+            # kept until the end of the outer stage, touched so that it is resident
+            buffer = bytearray(b"x" * 2**25)
+        for _ in profile_iter(range(2), "get_blocks"):
+            pass
+    records = {r["stage"]: r for r in pop_records()}
+    assert pop_records() == []
+    assert set(records) == {"other", "write", "get_blocks"}
+    assert all(r["idx"] == 3 for r in records.values())
+    assert records["write"]["wall"] >= 0.02 > records["other"]["wall"]
+    assert records["get_blocks"]["calls"] == 3
+    if os.path.exists("/proc/self/io"):
+        assert records["write"]["write_bytes"] >= 4096 > records["other"]["write_bytes"]
+        assert records["other"]["read_bytes"] == 0
+    if os.path.exists("/proc/self/statm"):
+        assert records["write"]["rss_growth"] >= 2**24 > records["other"]["rss_growth"]
+    del buffer
+
+    summary = {s["stage"]: s for s in summarize_records(list(records.values()))}
+    assert summary["total"]["structures"] == 1
+    assert summary["total"]["wall"] == pytest.approx(sum(r["wall"] for r in records.values()))
+
+
+def test_parse_profile(tmp_path, monkeypatch):
+    raw, out = tmp_path / "raw", tmp_path / "out"
+    for name in ["calc_0", "calc_1"]:
+        shutil.copytree("test/data/abacus_scf/OUT.ABACUS", raw / name / "OUT.ABACUS")
+    monkeypatch.setattr(sys, "argv", ["dftio", "parse", "-m", "abacus", "-r", str(raw), "-p", "calc", "-o", str(out),
+                                      "-f", "lmdb", "-ham", "-prof", "-pd", str(out / "pstats")])
+    try:
+        main()
+    finally:
+        enable_profiling(False)
+
+    with open(out / "profile.csv", newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert {(int(r["idx"]), r["stage"]) for r in rows} >= {
+        (idx, name) for idx in [0, 1] for name in ["other", "get_structure", "get_blocks", "transform", "serialize", "write"]}
+    with open(out / "profile.json") as f:
+        assert json.load(f)["summary"][-1]["structures"] == 2
+    assert os.listdir(out / "pstats") == [f"parse.{os.getpid()}.pstats"]
@@ -0,0 +1,25 @@
+import os
+from dftio.io.schedule import input_cost, cost_chunks
+
+
+def test_input_cost(tmp_path):
+    (tmp_path / "calc" / "OUT").mkdir(parents=True)
+    (tmp_path / "calc" / "INPUT").write_bytes(b"x" * 10)
+    (tmp_path / "calc" / "OUT" / "data-HR-sparse_SPIN0.csr").write_bytes(b"x" * 100)
+    assert input_cost(str(tmp_path / "calc")) == 110
+    assert input_cost(str(tmp_path / "calc" / "INPUT")) == 10
+
+
+def test_cost_chunks():
+    """The large tasks are dispatched first and alone, the small ones are grouped in shrinking chunks."""
+    tasks = list(range(100))
+    costs = [1.] * 98 + [100., 200.]
+    chunks = cost_chunks(tasks, costs, num_workers=4)
+    assert sorted(t for chunk in chunks for t in chunk) == tasks
+    assert chunks[:2] == [[99], [98]]
+    sizes = [len(chunk) for chunk in chunks[2:]]
+    assert sizes[0] > 1 and sizes == sorted(sizes, reverse=True)
+    assert len(chunks) < 50
+
+    # without costs every task is a chunk of its own
+    assert cost_chunks([3, 5], [0, 0], num_workers=2) == [[3], [5]]
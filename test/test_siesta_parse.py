@@ -6,6 +6,9 @@ sys.path.insert(0, PROJECT_ROOT)
 
 import pytest
 import numpy as np
+import sisl
+from scipy.linalg import block_diag
+from dftio.constants import SIESTA2DFTIO
 from dftio.io.siesta.siesta_parser import SiestaParser
 
 @pytest.fixture(scope='session', autouse=True)
@@ -130,6 +133,60 @@ def test_parse_siesta_output(root_directory):
     assert type(parser.get_blocks(idx=0, hamiltonian=False, overlap=False, density_matrix=True)[2][0]) == dict
     assert parser.get_blocks(idx=0, hamiltonian=False, overlap=False, density_matrix=True)[2][0]['0_0_0_0_0'].shape == (15, 15)
     assert parser.get_blocks(idx=0, hamiltonian=False, overlap=False, density_matrix=True)[2][0]['2_3_0_-1_0'].shape == (15, 15)
-    assert parser.get_blocks(idx=0, hamiltonian=False, overlap=False, density_matrix=True)[2][0]['0_0_0_0_0'][0,0] == pytest.approx(0.007212014)
-    assert parser.get_blocks(idx=0, hamiltonian=False, overlap=False, density_matrix=True)[2][0]['0_0_0_0_0'][0,1] == pytest.approx(0.00013299382)
-    assert parser.get_blocks(idx=0, hamiltonian=False, overlap=False, density_matrix=True)[2][0]['1_2_0_1_0'][1,0] == pytest.approx(0.000278148)
+    assert parser.get_blocks(idx=0, hamiltonian=False, overlap=False, density_matrix=True)[2][0]['0_0_0_0_0'][0,0] == pytest.approx(0.34809086)
+    assert parser.get_blocks(idx=0, hamiltonian=False, overlap=False, density_matrix=True)[2][0]['0_0_0_0_0'][0,1] == pytest.approx(0.04244733)
+    assert parser.get_blocks(idx=0, hamiltonian=False, overlap=False, density_matrix=True)[2][0]['1_2_0_1_0'][1,0] == pytest.approx(0.009578753)
+
+
+def test_siesta_blocks_match_dense(root_directory):
+    path = os.path.join(root_directory, "test", "data", "siesta", "siesta_out_simple")
+    parser = SiestaParser(root=os.path.dirname(path), prefix="siesta_out_simple")
+    ham, ovp, dm = parser.get_blocks(idx=0, hamiltonian=True, overlap=True, density_matrix=True)
+    rot = block_diag(*[SIESTA2DFTIO[l] for l in [0, 0, 1, 2, 2]]) # Au 2s1p2d
+
+    hamil = sisl.Hamiltonian.read(os.path.join(path, "Au_cell.TSHS"))
+    matrices = [
+        (hamil.tocsr(), ham[0]),
+        (sisl.Overlap.read(os.path.join(path, "Au_cell.TSHS")).tocsr(), ovp[0]),
+        (sisl.DensityMatrix.read(os.path.join(path, "Au_cell.DM")).tocsr(), dm[0])
+    ]
+    no = hamil.no
+    for csr, blocks in matrices:
+        for key, block in blocks.items():
+            i, j, rx, ry, rz = map(int, key.split("_"))
+            off = hamil.geometry.sc_index([rx, ry, rz]) * no
+            dense = csr[i * 15:(i + 1) * 15, off + j * 15:off + (j + 1) * 15].toarray().astype(np.float32)
+            assert block.dtype == np.float32
+            assert np.allclose(block, rot @ dense @ rot.T)
+
+
+def test_siesta_cache_opens_files_once(root_directory, monkeypatch):
+    import builtins
+    import pickle
+    from collections import Counter
+
+    opened = Counter()
+    _open = builtins.open
+    def counting_open(file, *args, **kwargs):
+        opened[os.path.basename(str(file))] += 1
+        return _open(file, *args, **kwargs)
+    _read = sisl.Hamiltonian.read
+    def counting_read(sile, *args, **kwargs):
+        opened[os.path.basename(str(sile))] += 1
+        return _read(sile, *args, **kwargs)
+
+    parser = SiestaParser(root=os.path.join(root_directory, "test", "data", "siesta"), prefix="siesta_out_withband")
+    monkeypatch.setattr(builtins, "open", counting_open)
+    monkeypatch.setattr(sisl.Hamiltonian, "read", counting_read)
+    for _ in range(2):
+        parser.get_structure(0)
+        parser.get_basis(0)
+        parser.get_eigenvalue(0)
+        parser.get_blocks(idx=0, hamiltonian=True, overlap=True)
+    monkeypatch.undo()
+    assert set(opened.values()) == {1}
+    assert "Au_cell.TSHS" in opened and "STRUCT.fdf" in opened
+
+    # the cache is bounded and is not shipped to the workers
+    assert len(parser._cache) == 1
+    assert len(pickle.loads(pickle.dumps(parser))._cache) == 0